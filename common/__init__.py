@@ -0,0 +1,6 @@
+"""
+dns-manager 与 sms-forwarder 共用的模块
+
+两个服务的镜像都以仓库根目录为构建上下文，将本包复制到 /app/common。
+本地运行服务或基准测试时需将仓库根目录加入 PYTHONPATH。
+"""
@@ -0,0 +1,181 @@
+"""
+运行时诊断端点（默认关闭）
+
+DEBUG_ENDPOINTS=true 时在 Flask 应用上注册:
+  GET  /debug/profile?seconds=10&hz=100  限时采样 CPU 栈，返回 collapsed stacks
+                                         （可直接输入 flamegraph.pl / speedscope 生成火焰图）
+  GET  /debug/tracemalloc/snapshot       开始追踪（如未开始）并返回内存分配排行
+  GET  /debug/tracemalloc/diff           与上一次快照比较的分配增量
+  POST /debug/tracemalloc/stop           停止追踪，释放追踪开销
+  GET  /debug/threads                    所有线程当前栈
+
+未启用时不注册路由、不启动 tracemalloc，没有任何运行时开销。
+请求需携带与 DEBUG_ENDPOINTS_TOKEN 一致的 X-Debug-Token 头；未设置令牌时所有诊断端点返回 403。
+"""
+
+import os
+import sys
+import hmac
+import math
+import time
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+
+from flask import Response, abort, jsonify, request
+
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_HZ = 1000
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds: float, hz: float) -> Counter:
+    """
+    在调用线程中按 hz 频率采样其他所有线程的栈
+
+    Returns:
+        Counter: "线程名;外层帧;...;内层帧" -> 采样次数
+    """
+    me = threading.get_ident()
+    interval = 1.0 / hz
+    deadline = time.monotonic() + seconds
+    stacks = Counter()
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[';'.join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+
+def dump_threads() -> str:
+    """返回所有线程当前栈的文本"""
+    names = {t.ident: (t.name, t.daemon) for t in threading.enumerate()}
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        name, daemon = names.get(ident, (str(ident), False))
+        lines.append(f"Thread {name} (id={ident}{', daemon' if daemon else ''}):")
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frame))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def _stat_to_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    data = {
+        'location': f"{frame.filename}:{frame.lineno}",
+        'size_kb': round(stat.size / 1024, 1),
+        'count': stat.count
+    }
+    if hasattr(stat, 'size_diff'):
+        data['size_diff_kb'] = round(stat.size_diff / 1024, 1)
+        data['count_diff'] = stat.count_diff
+    return data
+
+
+def _number_arg(name: str, default, cast=float):
+    """读取数值查询参数，无法解析时以 400 结束请求"""
+    try:
+        value = cast(request.args.get(name, default))
+    except (TypeError, ValueError):
+        abort(400, description=f"invalid {name}")
+    if not math.isfinite(value):
+        abort(400, description=f"invalid {name}")
+    return value
+
+
+def register_debug_routes(app):
+    """在 Flask 应用上注册诊断端点"""
+    token = os.getenv('DEBUG_ENDPOINTS_TOKEN')
+    profile_lock = threading.Lock()
+    state = {'snapshot': None}
+
+    @app.before_request
+    def _check_debug_token():
+        if not request.path.startswith('/debug/'):
+            return
+        # 未配置令牌时端点不可访问，避免开启后无鉴权暴露栈和内存信息
+        supplied = request.headers.get('X-Debug-Token', '')
+        if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(403)
+
+    @app.route('/debug/profile')
+    def debug_profile():
+        seconds = _number_arg('seconds', 10)
+        if seconds <= 0:
+            abort(400, description="seconds must be positive")
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        hz = max(1.0, min(_number_arg('hz', 100), MAX_PROFILE_HZ))
+
+        # 同一时间只允许一个采样任务
+        if not profile_lock.acquire(blocking=False):
+            return jsonify({'error': 'profile already running'}), 409
+        try:
+            stacks = sample_stacks(seconds, hz)
+        finally:
+            profile_lock.release()
+
+        body = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return Response(body + '\n', mimetype='text/plain')
+
+    @app.route('/debug/tracemalloc/snapshot')
+    def debug_tracemalloc_snapshot():
+        limit = max(1, _number_arg('limit', 25, int))
+        frames = max(1, _number_arg('frames', 1, int))
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+
+        snapshot = tracemalloc.take_snapshot()
+        state['snapshot'] = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+
+        return jsonify({
+            'tracing_started': started,
+            'traced_kb': round(current / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'top': [_stat_to_dict(s) for s in snapshot.statistics('lineno')[:limit]]
+        })
+
+    @app.route('/debug/tracemalloc/diff')
+    def debug_tracemalloc_diff():
+        limit = max(1, _number_arg('limit', 25, int))
+        previous = state['snapshot']
+        if previous is None or not tracemalloc.is_tracing():
+            return jsonify({'error': 'take a snapshot first'}), 409
+
+        snapshot = tracemalloc.take_snapshot()
+        state['snapshot'] = snapshot
+        diff = snapshot.compare_to(previous, 'lineno')
+
+        return jsonify({
+            'top': [_stat_to_dict(s) for s in diff[:limit]]
+        })
+
+    @app.route('/debug/tracemalloc/stop', methods=['POST'])
+    def debug_tracemalloc_stop():
+        state['snapshot'] = None
+        was_tracing = tracemalloc.is_tracing()
+        tracemalloc.stop()
+        return jsonify({'stopped': was_tracing})
+
+    @app.route('/debug/threads')
+    def debug_threads():
+        return Response(dump_threads(), mimetype='text/plain')
+
+    return app
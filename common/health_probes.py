@@ -0,0 +1,164 @@
+"""
+后台依赖探测
+
+探测函数在后台线程中按固定间隔执行，结果缓存在内存中；/health、/ready
+只读取缓存，编排系统的频繁探测不会转化为对 Docker、Cloudflare 或短信服务商的真实请求。
+缓存结果附带检查时间，超过 stale_after 未刷新的结果视为失败（探测线程卡死或退出）。
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+
+class Probe:
+    """单个探测项及其最近一次结果"""
+
+    def __init__(self, name: str, fn: Callable[[], object], critical: bool = True):
+        self.name = name
+        self.fn = fn
+        self.critical = critical
+        self.ok = None
+        self.detail = None
+        self.error = None
+        self.checked_at = None
+        self.duration = None
+
+
+class BackgroundProber:
+    """
+    按间隔并发执行所有探测并缓存结果
+
+    探测函数无参数，正常返回视为成功（返回值作为 detail），抛出异常视为失败
+    """
+
+    def __init__(
+        self,
+        interval: float = 15.0,
+        timeout: float = 5.0,
+        stale_after: Optional[float] = None,
+        on_result: Optional[Callable[[str, bool], None]] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Args:
+            interval: 探测间隔（秒）
+            timeout: 单个探测的超时（秒），超时视为失败
+            stale_after: 结果过期时间（秒），默认 3 倍间隔
+            on_result: 每次探测后的回调 (name, ok)，用于导出指标
+            logger: 状态变化日志输出的 logger，默认使用本模块的 logger
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after or interval * 3
+        self.on_result = on_result
+        self.logger = logger or logging.getLogger(__name__)
+        self._probes: Dict[str, Probe] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._first_round = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def add(self, name: str, fn: Callable[[], object], critical: bool = True):
+        """
+        添加探测项
+
+        Args:
+            name: 名称
+            fn: 探测函数
+            critical: 失败时是否影响整体健康状态
+        """
+        self._probes[name] = Probe(name, fn, critical)
+        return self
+
+    def _run_probe(self, probe: Probe):
+        started = time.monotonic()
+        try:
+            detail, error = probe.fn(), None
+        except Exception as e:
+            detail, error = None, str(e) or type(e).__name__
+        self._record(probe, detail, error, time.monotonic() - started)
+
+    def _record(self, probe: Probe, detail, error: Optional[str], duration: float):
+        ok = error is None
+        with self._lock:
+            changed = probe.ok is not None and probe.ok != ok
+            probe.ok = ok
+            probe.detail = detail
+            probe.error = error
+            probe.checked_at = time.time()
+            probe.duration = duration
+
+        if changed:
+            if ok:
+                self.logger.info(f"Probe {probe.name} recovered")
+            else:
+                self.logger.warning(f"Probe {probe.name} failing: {error}")
+        if self.on_result:
+            self.on_result(probe.name, ok)
+
+    def run_once(self):
+        """并发执行一轮探测并等待完成"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._probes)), thread_name_prefix="probe")
+
+        futures = [(probe, self._executor.submit(self._run_probe, probe)) for probe in self._probes.values()]
+        deadline = time.monotonic() + self.timeout
+        for probe, future in futures:
+            try:
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # 卡住的探测继续在线程池中执行，完成后会覆盖此结果
+                self._record(probe, None, f"timed out after {self.timeout}s", self.timeout)
+        self._first_round.set()
+
+    def started(self) -> bool:
+        """是否已完成首轮探测，之前所有结果都是 'not checked yet'"""
+        return self._first_round.is_set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"Probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """启动后台探测线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-probes", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """所有探测项的缓存结果（不执行任何探测）"""
+        now = time.time()
+        with self._lock:
+            results = {}
+            for probe in self._probes.values():
+                age = now - probe.checked_at if probe.checked_at is not None else None
+                stale = age is None or age > self.stale_after
+                results[probe.name] = {
+                    'ok': bool(probe.ok) and not stale,
+                    'critical': probe.critical,
+                    'detail': probe.detail,
+                    'error': probe.error if probe.checked_at is not None else 'not checked yet',
+                    'age_seconds': round(age, 3) if age is not None else None,
+                    'duration_ms': round(probe.duration * 1000, 1) if probe.duration is not None else None,
+                    'stale': stale
+                }
+            return results
+
+    def healthy(self, snapshot: Optional[Dict[str, dict]] = None) -> bool:
+        """所有关键探测项都成功且未过期"""
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        return all(result['ok'] for result in snapshot.values() if result['critical'])
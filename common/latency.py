@@ -0,0 +1,16 @@
+"""
+延迟统计
+
+dns-manager 基准测试和 sms-forwarder 压测工具共用同一实现，保证两边报告的 p50/p99 口径一致
+"""
+
+import math
+
+
+def percentile(values, pct):
+    """最近秩百分位: 排序后第 ceil(pct/100 * n) 个值，values 为空时返回 0.0"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
@@ -0,0 +1,202 @@
+"""
+结构化 JSON 日志
+
+- JSONFormatter: 使用 json 编码,消息中的引号、换行不会破坏 Loki 解析
+- QueueHandler/QueueListener: 业务线程只入队,stderr 写入在后台线程完成
+- log_context: 为当前线程/协程绑定上下文字段(subdomain、container、fingerprint 等)
+- SamplingFilter: 对重复的 DEBUG 日志按调用位置限流
+"""
+
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+
+_context = contextvars.ContextVar('log_context', default={})
+
+# LogRecord 自带的属性,其余属性视为 extra 字段输出
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'context'}
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    在 with 块内为日志附加上下文字段
+
+    Example:
+        with log_context(subdomain='app', container='app-1'):
+            logger.info("Creating DNS record")
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def get_log_context() -> dict:
+    """返回当前上下文字段"""
+    return dict(_context.get())
+
+
+class ContextFilter(logging.Filter):
+    """在调用线程中捕获上下文字段,之后记录才会进入队列"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _context.get()
+        if ctx:
+            record.context = ctx
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    对 DEBUG 日志按调用位置采样
+
+    每个 (文件, 行号) 在 interval 秒内最多输出 burst 条,
+    被丢弃的条数附加在下一条输出记录的 sampled_out 字段中。
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.burst <= 0:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = record.created
+
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.sampled_out = dropped
+                return True
+
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+
+            window[2] += 1
+            return False
+
+
+class JSONFormatter(logging.Formatter):
+    """将日志记录编码为单行 JSON"""
+
+    def __init__(self, datefmt: str = '%Y-%m-%dT%H:%M:%SZ'):
+        super().__init__(datefmt=datefmt)
+        self.converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'timestamp': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+
+        context = getattr(record, 'context', None)
+        if context:
+            data.update(context)
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                data[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    入队前只合并消息参数、渲染异常栈,保留 extra 和上下文字段,
+    由后台线程的 JSONFormatter 完成编码和写入
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listeners = {}
+_setup_lock = threading.Lock()
+
+
+def setup_logging(
+    name: Optional[str] = None,
+    level: str = 'INFO',
+    stream=None,
+    sample_burst: int = 10,
+    sample_interval: float = 60.0
+) -> logging.Logger:
+    """
+    配置结构化日志,重复调用只更新日志级别,不会重复添加处理器
+
+    Args:
+        name: logger 名称,None 表示根 logger
+        level: 日志级别
+        stream: 输出流,默认 stderr
+        sample_burst: 每个调用位置每个周期最多输出的 DEBUG 条数,0 表示不采样
+        sample_interval: 采样周期(秒)
+
+    Returns:
+        配置好的 logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, level.upper()))
+
+    with _setup_lock:
+        if name in _listeners:
+            return logger
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JSONFormatter())
+
+        log_queue = queue.SimpleQueue()
+        handler = StructuredQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(sample_burst, sample_interval))
+        handler.addFilter(ContextFilter())
+
+        listener = QueueListener(log_queue, output, respect_handler_level=False)
+        listener.start()
+        atexit.register(listener.stop)
+
+        logger.addHandler(handler)
+        _listeners[name] = listener
+
+    return logger
+
+
+def flush_logging(name: Optional[str] = None):
+    """停止并重启后台监听线程,确保已入队的日志全部写出(用于测试和退出前)"""
+    listener = _listeners.get(name)
+    if listener is not None:
+        listener.stop()
+        listener.start()
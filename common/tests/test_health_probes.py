@@ -0,0 +1,69 @@
+import time
+import threading
+from unittest.mock import MagicMock
+from common.health_probes import BackgroundProber
+
+
+def test_snapshot_before_first_round():
+    prober = BackgroundProber().add('docker', lambda: True)
+
+    result = prober.snapshot()['docker']
+    assert result['ok'] is False
+    assert result['stale'] is True
+    assert not prober.healthy()
+    assert not prober.started()
+
+    prober.run_once()
+    assert prober.started()
+
+
+def test_run_once_caches_results():
+    calls = []
+    prober = BackgroundProber()
+    prober.add('docker', lambda: calls.append(1) or 'pong')
+    prober.add('cloudflare', MagicMock(side_effect=RuntimeError("invalid token")), critical=False)
+
+    prober.run_once()
+    # 读取快照不会再次执行探测
+    for _ in range(100):
+        snapshot = prober.snapshot()
+
+    assert calls == [1]
+    assert snapshot['docker']['ok'] is True
+    assert snapshot['docker']['detail'] == 'pong'
+    assert snapshot['cloudflare']['ok'] is False
+    assert snapshot['cloudflare']['error'] == 'invalid token'
+    # 非关键探测项失败不影响整体健康
+    assert prober.healthy(snapshot)
+
+
+def test_results_become_stale():
+    prober = BackgroundProber(interval=0.01, stale_after=0.05).add('docker', lambda: True)
+
+    prober.run_once()
+    assert prober.healthy()
+
+    time.sleep(0.1)
+    assert prober.snapshot()['docker']['stale'] is True
+    assert not prober.healthy()
+
+
+def test_hung_probe_times_out():
+    release = threading.Event()
+    prober = BackgroundProber(timeout=0.1).add('docker', release.wait)
+
+    started = time.monotonic()
+    prober.run_once()
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert 'timed out' in prober.snapshot()['docker']['error']
+
+
+def test_on_result_callback():
+    on_result = MagicMock()
+    prober = BackgroundProber(on_result=on_result).add('docker', lambda: True)
+
+    prober.run_once()
+
+    on_result.assert_called_once_with('docker', True)
@@ -0,0 +1,22 @@
+import pytest
+from common.latency import percentile
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    (range(1, 101), 50, 50),
+    (range(1, 101), 99, 99),
+    (range(1, 101), 100, 100),
+    (range(1, 11), 50, 5),
+    (range(1, 11), 90, 9),
+    (range(1, 11), 95, 10),
+    (range(1, 5), 25, 1),
+    ([3.0, 1.0, 2.0], 50, 2.0),
+    ([7], 99, 7),
+    ([], 99, 0.0),
+])
+def test_nearest_rank(values, pct, expected):
+    assert percentile(list(values), pct) == expected
+
+
+def test_pct_zero_returns_minimum():
+    assert percentile([5, 1, 9], 0) == 1
@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+from common.structured_logging import (
+    JSONFormatter, SamplingFilter, flush_logging, get_log_context, log_context, setup_logging
+)
+
+
+def _record(msg, level=logging.INFO, lineno=1, created=None, **extra):
+    record = logging.LogRecord("test", level, "test.py", lineno, msg, (), None)
+    if created is not None:
+        record.created = created
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_formatter_escapes_quotes_and_newlines():
+    line = JSONFormatter().format(_record('bad "quote"\nnext line'))
+    data = json.loads(line)
+    assert data['message'] == 'bad "quote"\nnext line'
+    assert data['level'] == 'INFO'
+    assert '\n' not in line
+
+
+def test_json_formatter_includes_context_and_extra():
+    record = _record("hello", context={'subdomain': 'app'}, container='app-1')
+    data = json.loads(JSONFormatter().format(record))
+    assert data['subdomain'] == 'app'
+    assert data['container'] == 'app-1'
+
+
+def test_log_context_nesting():
+    with log_context(subdomain='app'):
+        with log_context(container='app-1'):
+            assert get_log_context() == {'subdomain': 'app', 'container': 'app-1'}
+        assert get_log_context() == {'subdomain': 'app'}
+    assert get_log_context() == {}
+
+
+def test_sampling_filter_limits_debug():
+    sampler = SamplingFilter(burst=2, interval=10)
+    passed = [sampler.filter(_record("x", logging.DEBUG, created=100.0)) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+
+    # 新周期的第一条记录附带被丢弃的条数
+    record = _record("x", logging.DEBUG, created=111.0)
+    assert sampler.filter(record)
+    assert record.sampled_out == 3
+
+
+def test_sampling_filter_ignores_info():
+    sampler = SamplingFilter(burst=1, interval=10)
+    assert all(sampler.filter(_record("x", created=100.0)) for _ in range(5))
+
+
+def test_setup_logging_is_idempotent_and_async():
+    stream = io.StringIO()
+    logger = setup_logging("structured-test", "DEBUG", stream=stream)
+    setup_logging("structured-test", "INFO", stream=stream)
+    assert len(logger.handlers) == 1
+    assert logger.level == logging.INFO
+
+    with log_context(fingerprint="abc"):
+        logger.info('line with "quotes"')
+    flush_logging("structured-test")
+
+    data = json.loads(stream.getvalue().strip())
+    assert data['message'] == 'line with "quotes"'
+    assert data['fingerprint'] == 'abc'
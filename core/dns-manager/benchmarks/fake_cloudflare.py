@@ -0,0 +1,220 @@
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeCloudflareAPI(ThreadingHTTPServer):
+    """
+    进程内模拟 Cloudflare v4 API
+
+    支持 zones 查询和 dns_records 的列表/创建/更新/删除，可注入固定延迟
+    和按比例返回的 429，用于基准测试和集成测试
+    """
+
+    daemon_threads = True
+
+    def __init__(self, zone_name: str, latency: float = 0.0, rate_429: float = 0.0, seed: int = 0, port: int = 0):
+        super().__init__(("127.0.0.1", port), _CloudflareHandler)
+        self.zone_name = zone_name
+        self.zone_id = "zone-" + uuid.uuid5(uuid.NAMESPACE_DNS, zone_name).hex[:12]
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.records = {}
+        self.created_at = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.calls_by_route = {}
+        self.throttled = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/client/v4"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-cloudflare", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def add_record(self, name: str, content: str, ttl: int = 300, proxied: bool = False) -> dict:
+        record = {
+            "id": uuid.uuid4().hex,
+            "type": "A",
+            "name": name,
+            "content": content,
+            "ttl": ttl,
+            "proxied": proxied,
+            "zone_id": self.zone_id,
+            "zone_name": self.zone_name
+        }
+        with self.lock:
+            self.records[record["id"]] = record
+        return record
+
+    def records_named(self, name: str) -> list:
+        with self.lock:
+            return [r for r in self.records.values() if r["name"] == name]
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = 0
+            self.calls_by_route = {}
+            self.throttled = 0
+            self.created_at = {}
+
+
+class _CloudflareHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, result=None, errors=None, result_info=None):
+        body = {"success": status < 400, "errors": errors or [], "messages": [], "result": result}
+        if result_info is not None:
+            body["result_info"] = result_info
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method: str):
+        api = self.server
+        url = urlsplit(self.path)
+        path = url.path
+        prefix = "/client/v4"
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        parts = [p for p in path.split("/") if p]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self._body() if method in ("POST", "PUT", "PATCH") else {}
+
+        route = f"{method} /" + "/".join("{id}" if i % 2 else p for i, p in enumerate(parts))
+        with api.lock:
+            api.calls += 1
+            api.calls_by_route[route] = api.calls_by_route.get(route, 0) + 1
+            throttle = api.rate_429 > 0 and api.random.random() < api.rate_429
+            if throttle:
+                api.throttled += 1
+
+        if api.latency:
+            time.sleep(api.latency)
+        if throttle:
+            return self._reply(429, errors=[{"code": 10000, "message": "Rate limited"}])
+
+        if parts == ["zones"]:
+            zones = [{"id": api.zone_id, "name": api.zone_name}] if query.get("name", api.zone_name) == api.zone_name else []
+            return self._reply(200, zones, result_info={"page": 1, "per_page": 50, "count": len(zones), "total_count": len(zones), "total_pages": 1})
+
+        if parts == ["user", "tokens", "verify"]:
+            return self._reply(200, {"id": "token", "status": "active"})
+
+        if len(parts) >= 3 and parts[0] == "zones" and parts[2] == "dns_records":
+            if parts[1] != api.zone_id:
+                return self._reply(404, errors=[{"code": 7003, "message": "Could not route"}])
+            if len(parts) == 3:
+                if method == "GET":
+                    return self._list(query)
+                if method == "POST":
+                    return self._create(body)
+            elif len(parts) == 4 and method in ("PUT", "PATCH", "DELETE"):
+                return self._modify(method, parts[3], body)
+            elif len(parts) == 4 and parts[3] == "batch" and method == "POST":
+                return self._batch(body)
+
+        self._reply(404, errors=[{"code": 7000, "message": "No route for that URI"}])
+
+    def _list(self, query: dict):
+        api = self.server
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 100))
+        with api.lock:
+            records = [
+                r for r in api.records.values()
+                if ("type" not in query or r["type"] == query["type"])
+                and ("name" not in query or r["name"] == query["name"])
+            ]
+        total_pages = max(1, (len(records) + per_page - 1) // per_page)
+        chunk = records[(page - 1) * per_page:page * per_page]
+        return self._reply(200, chunk, result_info={
+            "page": page, "per_page": per_page, "count": len(chunk),
+            "total_count": len(records), "total_pages": total_pages
+        })
+
+    def _create(self, body: dict):
+        api = self.server
+        with api.lock:
+            duplicate = any(
+                r["name"] == body["name"] and r["content"] == body["content"] for r in api.records.values()
+            )
+        if duplicate:
+            return self._reply(400, errors=[{"code": 81058, "message": "An identical record already exists."}])
+        record = api.add_record(body["name"], body["content"], body.get("ttl", 300), body.get("proxied", False))
+        with api.lock:
+            api.created_at.setdefault(record["name"], time.time())
+        return self._reply(200, record)
+
+    def _modify(self, method: str, record_id: str, body: dict):
+        api = self.server
+        with api.lock:
+            record = api.records.get(record_id)
+            if record is None:
+                result = None
+            elif method == "DELETE":
+                del api.records[record_id]
+                result = {"id": record_id}
+            else:
+                record.update({k: v for k, v in body.items() if k in ("type", "name", "content", "ttl", "proxied")})
+                result = dict(record)
+        if result is None:
+            return self._reply(404, errors=[{"code": 81044, "message": "Record does not exist."}])
+        return self._reply(200, result)
+
+    def _batch(self, body: dict):
+        api = self.server
+        result = {"deletes": [], "patches": [], "puts": [], "posts": []}
+        for item in body.get("deletes", []):
+            with api.lock:
+                if api.records.pop(item["id"], None) is not None:
+                    result["deletes"].append({"id": item["id"]})
+        for key in ("patches", "puts"):
+            for item in body.get(key, []):
+                with api.lock:
+                    record = api.records.get(item["id"])
+                    if record is not None:
+                        record.update({k: v for k, v in item.items() if k != "id"})
+                        result[key].append(dict(record))
+        for item in body.get("posts", []):
+            result["posts"].append(api.add_record(item["name"], item["content"], item.get("ttl", 300), item.get("proxied", False)))
+        return self._reply(200, result)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
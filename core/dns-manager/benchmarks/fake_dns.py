@@ -0,0 +1,71 @@
+import socket
+import struct
+import threading
+from socketserver import BaseRequestHandler, ThreadingUDPServer
+
+
+class FakeDNSServer(ThreadingUDPServer):
+    """
+    进程内模拟递归解析器
+
+    只应答 A 查询，records 中不存在的名称返回 NXDOMAIN，
+    用于验证 DNS 传播检查而不依赖公共解析器
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _DNSHandler)
+        self.records = {}
+        self.lock = threading.Lock()
+        self.queries = 0
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server_address
+
+    def set_record(self, name: str, ip: str):
+        with self.lock:
+            self.records[name.rstrip(".").lower()] = ip
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-dns", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _DNSHandler(BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        server = self.server
+        txid, _, qdcount = struct.unpack(">HHH", data[:6])
+
+        labels, offset = [], 12
+        while data[offset]:
+            length = data[offset]
+            labels.append(data[offset + 1:offset + 1 + length].decode("ascii"))
+            offset += 1 + length
+        question = data[12:offset + 5]
+        qtype = struct.unpack(">H", data[offset + 1:offset + 3])[0]
+        name = ".".join(labels).lower()
+
+        with server.lock:
+            server.queries += 1
+            ip = server.records.get(name)
+
+        if ip is None:
+            header = struct.pack(">HHHHHH", txid, 0x8183, qdcount, 0, 0, 0)
+            sock.sendto(header + question, self.client_address)
+            return
+
+        answers = []
+        if qtype == 1:
+            # 名称使用指向问题区的压缩指针
+            answers.append(struct.pack(">HHHIH", 0xC00C, 1, 1, 60, 4) + socket.inet_aton(ip))
+        header = struct.pack(">HHHHHH", txid, 0x8180, qdcount, len(answers), 0, 0)
+        sock.sendto(header + question + b"".join(answers), self.client_address)
@@ -0,0 +1,214 @@
+import json
+import time
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+API_VERSION = "1.41"
+
+
+class FakeDockerDaemon(ThreadingHTTPServer):
+    """
+    进程内模拟 Docker Engine API
+
+    实现 dns-manager 用到的接口: /version、/containers/json、
+    /containers/{id}/json 和流式 /events，通过 tcp://127.0.0.1:<port> 访问
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _DockerHandler)
+        self.containers = {}
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.emitted_at = {}
+        self._subscribers = []
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"tcp://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-docker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.close_events()
+        self.shutdown()
+        self.server_close()
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def add_container(self, container_id: str, name: str, labels: dict, running: bool = True):
+        with self.lock:
+            self.containers[container_id] = {"name": name, "labels": dict(labels), "running": running}
+
+    def emit(self, action: str, container_id: str):
+        """向所有事件订阅者推送容器事件"""
+        with self.lock:
+            container = self.containers[container_id]
+            if action == "start":
+                container["running"] = True
+            elif action in ("die", "stop", "destroy"):
+                container["running"] = False
+            subscribers = list(self._subscribers)
+
+        now = time.time()
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container_id,
+            "Actor": {
+                "ID": container_id,
+                "Attributes": dict(container["labels"], name=container["name"])
+            },
+            "time": int(now),
+            "timeNano": int(now * 1e9)
+        }
+        self.emitted_at.setdefault(container["name"], now)
+        for q in subscribers:
+            q.put(event)
+
+    def wait_for_subscribers(self, count: int = 1, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self._subscribers) >= count:
+                    return
+            time.sleep(0.01)
+        raise TimeoutError("event stream was not opened")
+
+    def close_events(self):
+        with self.lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            q.put(None)
+
+    def subscribe(self) -> "queue.Queue":
+        q = queue.Queue()
+        with self.lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+
+class _DockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._json(200, {})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path.startswith(f"/v{API_VERSION}"):
+            path = path[len(API_VERSION) + 2:]
+        query = parse_qs(url.query)
+        daemon = self.server
+
+        if path in ("/version", "/_ping"):
+            daemon.count(path)
+            if path == "/_ping":
+                return self._json(200, "OK")
+            return self._json(200, {"ApiVersion": API_VERSION, "Version": "24.0.0", "MinAPIVersion": "1.12"})
+
+        if path == "/containers/json":
+            daemon.count("list")
+            return self._json(200, self._list(query))
+
+        if path.startswith("/containers/") and path.endswith("/json"):
+            daemon.count("inspect")
+            container_id = path[len("/containers/"):-len("/json")]
+            with daemon.lock:
+                container = daemon.containers.get(container_id)
+            if container is None:
+                return self._json(404, {"message": f"No such container: {container_id}"})
+            return self._json(200, self._inspect(container_id, container))
+
+        if path == "/events":
+            daemon.count("events")
+            return self._events()
+
+        self._json(404, {"message": "page not found"})
+
+    def _label_filters(self, query) -> list:
+        filters = json.loads(query.get("filters", ["{}"])[0])
+        labels = filters.get("label", [])
+        if isinstance(labels, dict):
+            labels = [k for k, v in labels.items() if v]
+        return labels
+
+    def _list(self, query) -> list:
+        wanted = self._label_filters(query)
+        result = []
+        with self.server.lock:
+            items = list(self.server.containers.items())
+        for container_id, c in items:
+            if not c["running"]:
+                continue
+            if not all(self._label_matches(c["labels"], f) for f in wanted):
+                continue
+            result.append({"Id": container_id, "Names": [f"/{c['name']}"], "Labels": c["labels"], "State": "running"})
+        return result
+
+    @staticmethod
+    def _label_matches(labels: dict, label_filter: str) -> bool:
+        key, has_value, value = label_filter.partition("=")
+        if key not in labels:
+            return False
+        return not has_value or labels[key] == value
+
+    def _inspect(self, container_id: str, c: dict) -> dict:
+        return {
+            "Id": container_id,
+            "Name": f"/{c['name']}",
+            "Config": {"Labels": c["labels"]},
+            "State": {"Running": c["running"]}
+        }
+
+    def _events(self):
+        q = self.server.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.flush()
+        try:
+            while True:
+                event = q.get()
+                if event is None:
+                    break
+                data = json.dumps(event).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.unsubscribe(q)
+            self.close_connection = True
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import resource
+import threading
+from contextlib import contextmanager
+
+# 基准测试从 core/dns-manager 目录运行，被测模块位于上级目录，共享的 common 包位于仓库根目录
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(SERVICE_DIR)))
+sys.path.insert(0, SERVICE_DIR)
+
+from benchmarks.fake_cloudflare import FakeCloudflareAPI  # noqa: E402
+from benchmarks.fake_docker import FakeDockerDaemon  # noqa: E402
+
+
+DOMAIN = "bench.example.com"
+HOST_IP = "203.0.113.10"
+
+
+def traefik_labels(subdomain: str) -> dict:
+    return {
+        "traefik.enable": "true",
+        f"traefik.http.routers.{subdomain}.rule": f"Host(`{subdomain}.{DOMAIN}`)"
+    }
+
+
+def rss_mb() -> float:
+    """当前进程常驻内存（MB），非 Linux 平台退化为峰值 RSS"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def patched_env(**values):
+    old = {k: os.environ.get(k) for k in values}
+    os.environ.update({k: str(v) for k, v in values.items()})
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+class Harness:
+    """
+    一次场景运行所需的模拟 Docker daemon、模拟 Cloudflare API 和 DNSManager
+
+    DNSManager 通过 DOCKER_HOSTS / CF_API_BASE_URL 连接模拟服务，
+    走完整的 docker-py 与 Cloudflare HTTP 调用链路
+    """
+
+    def __init__(self, cf_latency: float = 0.0, rate_429: float = 0.0, cf_rate_limit: float = 0.0):
+        self.docker = FakeDockerDaemon().start()
+        self.cf = FakeCloudflareAPI(DOMAIN, latency=cf_latency, rate_429=rate_429).start()
+        self.cf_rate_limit = cf_rate_limit
+        self.manager = None
+        self._listener = None
+
+    def create_manager(self):
+        from dns_manager import DNSManager
+
+        with patched_env(
+            DOMAIN=DOMAIN,
+            CF_DNS_API_TOKEN="bench-token",
+            CF_API_BASE_URL=self.cf.base_url,
+            CF_RATE_LIMIT=self.cf_rate_limit,
+            DOCKER_HOSTS=f"bench={self.docker.base_url}={HOST_IP}",
+            LEADER_ELECTION="none",
+            LOG_LEVEL=os.getenv("BENCH_LOG_LEVEL", "WARNING")
+        ):
+            self.manager = DNSManager()
+        return self.manager
+
+    def start_listener(self):
+        """在后台线程中消费事件流，返回前确保事件流已建立"""
+        monitor = self.manager.docker_monitor
+        self._listener = threading.Thread(target=monitor.listen, name="bench-listener", daemon=True)
+        self._listener.start()
+        self.docker.wait_for_subscribers(1)
+
+    def wait_for_records(self, names: list, timeout: float = 120.0) -> bool:
+        deadline = time.monotonic() + timeout
+        pending = set(names)
+        while pending and time.monotonic() < deadline:
+            with self.cf.lock:
+                existing = {r["name"] for r in self.cf.records.values()}
+            pending -= existing
+            if pending:
+                time.sleep(0.002)
+        return not pending
+
+    def close(self):
+        self.docker.close_events()
+        if self._listener:
+            self._listener.join(timeout=5)
+        self.docker.stop()
+        self.cf.stop()
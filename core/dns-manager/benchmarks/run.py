@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+dns-manager 端到端基准测试
+
+使用进程内模拟 Docker events API 和模拟 Cloudflare API 驱动 DNSManager，
+统计 events/sec、每事件 API 调用数、事件到记录创建的 p99 延迟和 RSS。
+
+使用方法（在 core/dns-manager 目录下）:
+    python -m benchmarks.run                         # 运行全部场景
+    python -m benchmarks.run --scenario event_burst  # 运行单个场景
+    python -m benchmarks.run --save-baseline         # 保存基线
+    python -m benchmarks.run --check                 # 与基线比较，退化时返回非零
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from benchmarks.harness import DOMAIN, HOST_IP, Harness, rss_mb, traefik_labels
+from common.latency import percentile
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _report(events: int, elapsed: float, api_calls: int, latencies: list, extra: dict = None) -> dict:
+    report = {
+        "events": events,
+        "elapsed_s": round(elapsed, 3),
+        "events_per_sec": round(events / elapsed, 1) if elapsed else 0.0,
+        "api_calls": api_calls,
+        "api_calls_per_event": round(api_calls / events, 3) if events else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "rss_mb": round(rss_mb(), 1)
+    }
+    report.update(extra or {})
+    return report
+
+
+def cold_start(containers: int = 200, cf_latency: float = 0.0) -> dict:
+    """启动时已有 N 个容器、Cloudflare 中没有记录: 预热索引 + 全量扫描"""
+    h = Harness(cf_latency=cf_latency)
+    try:
+        names = []
+        for i in range(containers):
+            h.docker.add_container(f"c{i}", f"app{i}", traefik_labels(f"app{i}"))
+            names.append(f"app{i}.{DOMAIN}")
+
+        manager = h.create_manager()
+        h.cf.reset_counters()
+
+        started = time.time()
+        manager.cf_client.warm_record_index()
+        manager.docker_monitor.scan_existing_containers()
+        if not h.wait_for_records(names):
+            raise RuntimeError("cold_start: records were not created")
+        elapsed = time.time() - started
+
+        latencies = [h.cf.created_at[n] - started for n in names]
+        return _report(containers, elapsed, h.cf.calls, latencies,
+                       {"docker_calls": sum(h.docker.calls.get(k, 0) for k in ("list", "inspect"))})
+    finally:
+        h.close()
+
+
+def event_burst(events: int = 200, cf_latency: float = 0.0, rate_429: float = 0.0) -> dict:
+    """事件流已建立后，短时间内有 N 个新容器启动"""
+    h = Harness(cf_latency=cf_latency, rate_429=rate_429)
+    try:
+        manager = h.create_manager()
+        manager.cf_client.warm_record_index()
+        h.start_listener()
+        h.cf.reset_counters()
+
+        names, emitted = [], {}
+        for i in range(events):
+            h.docker.add_container(f"c{i}", f"svc{i}", traefik_labels(f"svc{i}"))
+        started = time.time()
+        for i in range(events):
+            name = f"svc{i}.{DOMAIN}"
+            emitted[name] = time.time()
+            h.docker.emit("start", f"c{i}")
+            names.append(name)
+
+        if not h.wait_for_records(names):
+            raise RuntimeError("event_burst: records were not created")
+        elapsed = time.time() - started
+
+        latencies = [h.cf.created_at[n] - emitted[n] for n in names]
+        return _report(events, elapsed, h.cf.calls, latencies, {"throttled": h.cf.throttled})
+    finally:
+        h.close()
+
+
+def crash_loop(restarts: int = 200) -> dict:
+    """同一个容器反复重启，理想情况下只产生一次记录创建"""
+    h = Harness()
+    try:
+        manager = h.create_manager()
+        manager.cf_client.warm_record_index()
+        h.start_listener()
+
+        h.docker.add_container("loop", "crashy", traefik_labels("crashy"))
+        h.docker.add_container("sentinel", "sentinel", traefik_labels("sentinel"))
+        h.cf.reset_counters()
+
+        started = time.time()
+        first = None
+        for _ in range(restarts):
+            h.docker.emit("die", "loop")
+            h.docker.emit("start", "loop")
+            first = first or time.time()
+        # 事件按顺序处理，哨兵记录出现说明之前的事件都已处理完
+        h.docker.emit("start", "sentinel")
+        if not h.wait_for_records([f"crashy.{DOMAIN}", f"sentinel.{DOMAIN}"]):
+            raise RuntimeError("crash_loop: records were not created")
+        elapsed = time.time() - started
+
+        latencies = [h.cf.created_at[f"crashy.{DOMAIN}"] - first]
+        return _report(restarts + 1, elapsed, h.cf.calls, latencies,
+                       {"records_for_name": len(h.cf.records_named(f"crashy.{DOMAIN}"))})
+    finally:
+        h.close()
+
+
+def ip_drift(containers: int = 100) -> dict:
+    """记录已存在但指向旧 IP（如主机迁移后），统计扫描后仍不一致的记录数"""
+    h = Harness()
+    try:
+        names = []
+        for i in range(containers):
+            h.docker.add_container(f"c{i}", f"app{i}", traefik_labels(f"app{i}"))
+            h.cf.add_record(f"app{i}.{DOMAIN}", "198.51.100.1")
+            names.append(f"app{i}.{DOMAIN}")
+
+        manager = h.create_manager()
+        h.cf.reset_counters()
+
+        started = time.time()
+        manager.cf_client.warm_record_index()
+        manager.docker_monitor.scan_existing_containers()
+        elapsed = time.time() - started
+
+        mismatched = sum(
+            1 for n in names
+            if any(r["content"] != HOST_IP for r in h.cf.records_named(n))
+        )
+        return _report(containers, elapsed, h.cf.calls, [], {"records_mismatched": mismatched})
+    finally:
+        h.close()
+
+
+SCENARIOS = {
+    "cold_start": lambda: cold_start(200),
+    "cold_start_slow_api": lambda: cold_start(50, cf_latency=0.02),
+    "event_burst": lambda: event_burst(200),
+    "event_burst_429": lambda: event_burst(20, rate_429=0.05),
+    "crash_loop": lambda: crash_loop(200),
+    "ip_drift": lambda: ip_drift(100)
+}
+
+# 越大越好的指标，其余指标越小越好
+HIGHER_IS_BETTER = {"events_per_sec"}
+CHECKED_METRICS = ("events_per_sec", "api_calls_per_event", "p99_ms", "rss_mb")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """返回相对基线退化超过 tolerance 的指标描述"""
+    regressions = []
+    for scenario, report in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for metric in CHECKED_METRICS:
+            if metric not in base or metric not in report:
+                continue
+            old, new = base[metric], report[metric]
+            if metric in HIGHER_IS_BETTER:
+                worse = new < old * (1 - tolerance)
+            else:
+                # 计时类指标加少量绝对余量，避免接近 0 的值因抖动误报
+                slack = 0.001 if metric == "api_calls_per_event" else 5.0
+                worse = new > old * (1 + tolerance) + slack
+            if worse:
+                regressions.append(f"{scenario}.{metric}: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dns-manager 基准测试")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="只运行指定场景，可重复")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将结果保存为基线")
+    parser.add_argument("--check", action="store_true", help="与基线比较，退化时返回非零")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许的相对退化比例")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = SCENARIOS[name]()
+        if not args.json:
+            r = results[name]
+            print(f"{name:>20}: {r['events_per_sec']:>8} ev/s  {r['api_calls_per_event']:>6} calls/ev  "
+                  f"p99 {r['p99_ms']:>8} ms  rss {r['rss_mb']} MB")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}", file=sys.stderr)
+            sys.exit(2)
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+from typing import Callable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_environ_proxies
+
+
+DEFAULT_BASE_URL = "https://api.cloudflare.com/client/v4"
+
+# (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_POOL_SIZE = 10
+# dns_records 列表接口单页上限较高，大页可显著减少大 zone 的往返次数
+DEFAULT_PER_PAGE = 1000
+
+
+class CloudflareAPIError(Exception):
+    """Cloudflare API 返回失败"""
+
+    def __init__(self, status: int, code: Optional[int], message: str):
+        super().__init__(f"{status} {code}: {message}" if code else f"{status}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class NotLeaderError(Exception):
+    """写请求发出前发现本副本已不是主节点"""
+
+
+class CloudflareAPI:
+    """
+    Cloudflare v4 API 轻量传输层
+
+    只覆盖 dns-manager 用到的接口（zones 查询、dns_records 列表/创建/更新/删除/批量），
+    所有请求复用同一个 keep-alive 连接池，并带有严格的连接和读取超时。
+    """
+
+    def __init__(
+        self,
+        api_token: Optional[str] = None,
+        api_email: Optional[str] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout=DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limiter=None,
+        write_guard: Optional[Callable[[], bool]] = None
+    ):
+        self.token_auth = bool(api_token)
+        if api_token:
+            headers = {'Authorization': f"Bearer {api_token}"}
+        elif api_email and api_key:
+            headers = {'X-Auth-Email': api_email, 'X-Auth-Key': api_key}
+        else:
+            raise ValueError("Cloudflare credentials required: api_token or (api_email + api_key)")
+
+        # base_url 用于指向本地模拟 API（基准测试）
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        # 每个 HTTP 请求（包括分页的每一页）发出前都经过限流器
+        self.rate_limiter = rate_limiter
+        # 写请求在限流等待之后、发出之前调用，返回 False 时放弃请求（多副本下已失去主节点身份）
+        self.write_guard = write_guard
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.session.headers['Content-Type'] = 'application/json'
+        # 代理设置只在构造时从环境变量解析一次，避免每个请求都遍历 os.environ 和读取 .netrc
+        self.session.proxies = get_environ_proxies(self.base_url)
+        self.session.trust_env = False
+        # 重试由调用方（tenacity）负责，传输层不重试
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, path: str, params: Optional[dict] = None, json=None) -> dict:
+        """
+        发送请求并返回完整响应体
+
+        Raises:
+            CloudflareAPIError: HTTP 错误或 success 为 false
+            NotLeaderError: 写请求被 write_guard 拒绝
+            requests.RequestException: 网络错误或超时
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        if method != 'GET' and self.write_guard and not self.write_guard():
+            raise NotLeaderError(f"{method} {path} dropped: no longer leader")
+
+        response = self.session.request(
+            method,
+            f"{self.base_url}/{path.lstrip('/')}",
+            params=params,
+            json=json,
+            timeout=self.timeout
+        )
+
+        try:
+            body = response.json()
+        except ValueError:
+            raise CloudflareAPIError(response.status_code, None, response.text[:200] or response.reason)
+
+        if response.status_code >= 400 or not body.get('success', False):
+            errors = body.get('errors') or [{}]
+            raise CloudflareAPIError(
+                response.status_code,
+                errors[0].get('code'),
+                errors[0].get('message') or response.reason
+            )
+        return body
+
+    def paginate(self, path: str, params: Optional[dict] = None, per_page: int = DEFAULT_PER_PAGE) -> Iterator[dict]:
+        """
+        逐页拉取列表接口，边拉取边产出
+
+        调用方不需要一次性持有整个 zone 的记录，提前停止迭代时不再请求后续页
+        """
+        params = dict(params or {})
+        params['per_page'] = per_page
+        page = 1
+        while True:
+            params['page'] = page
+            body = self.request('GET', path, params=params)
+            for item in body.get('result') or []:
+                yield item
+
+            info = body.get('result_info') or {}
+            if page >= info.get('total_pages', 1):
+                return
+            page += 1
+
+    def verify_credentials(self) -> dict:
+        """校验凭证：API Token 调用 tokens/verify，Global API Key 调用 /user"""
+        return self.request('GET', 'user/tokens/verify' if self.token_auth else 'user')['result']
+
+    def list_zones(self, name: str) -> list:
+        return self.request('GET', 'zones', params={'name': name})['result']
+
+    def iter_dns_records(self, zone_id: str, **params) -> Iterator[dict]:
+        return self.paginate(f"zones/{zone_id}/dns_records", params)
+
+    def create_dns_record(self, zone_id: str, data: dict) -> dict:
+        return self.request('POST', f"zones/{zone_id}/dns_records", json=data)['result']
+
+    def update_dns_record(self, zone_id: str, record_id: str, data: dict) -> dict:
+        return self.request('PATCH', f"zones/{zone_id}/dns_records/{record_id}", json=data)['result']
+
+    def delete_dns_record(self, zone_id: str, record_id: str) -> dict:
+        return self.request('DELETE', f"zones/{zone_id}/dns_records/{record_id}")['result']
+
+    def batch_dns_records(
+        self,
+        zone_id: str,
+        deletes: Optional[list] = None,
+        patches: Optional[list] = None,
+        puts: Optional[list] = None,
+        posts: Optional[list] = None
+    ) -> dict:
+        """单次请求提交多条记录变更，按 deletes、patches、puts、posts 顺序执行"""
+        data = {
+            key: items for key, items in
+            (('deletes', deletes), ('patches', patches), ('puts', puts), ('posts', posts))
+            if items
+        }
+        return self.request('POST', f"zones/{zone_id}/dns_records/batch", json=data)['result']
+
+    def close(self):
+        self.session.close()
@@ -1,11 +1,23 @@
+import time
 import logging
-from typing import Optional
-from CloudFlare import CloudFlare
-from tenacity import retry, stop_after_attempt, wait_exponential
+import threading
+from typing import Callable, List, Optional, Tuple
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from cloudflare_api import CloudflareAPI, CloudflareAPIError, NotLeaderError
+from utils import RateLimiter
 
 
 logger = logging.getLogger("dns-manager")
 
+# 单次批量请求的最大变更数
+BATCH_SIZE = 100
+
+# 81057: 已存在同名记录（与 CNAME 等冲突）；81058: 已存在完全相同的记录
+RECORD_EXISTS_CODES = (81057, 81058)
+# 81044: 记录不存在
+RECORD_MISSING_CODE = 81044
+
 
 class CloudflareClient:
     """Cloudflare DNS 管理客户端"""
@@ -15,18 +27,41 @@ class CloudflareClient:
         domain: str,
         api_token: Optional[str] = None,
         api_email: Optional[str] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        base_url: Optional[str] = None,
+        index_ttl: float = 300.0,
+        write_guard: Optional[Callable[[], bool]] = None
     ):
+        """
+        Args:
+            index_ttl: 完整预热后的记录索引视为权威的时长（秒），过期后在下次检查时重新预热
+            write_guard: 每个写请求发出前调用，返回 False 时抛出 NotLeaderError 且不再重试
+        """
         self.domain = domain
         self.zone_id = None
+        self.index_ttl = index_ttl
+
+        # 所有 Docker 主机共享的限流器和记录索引(完整域名 -> 记录 id/content/ttl/proxied)
+        self.rate_limiter = rate_limiter or RateLimiter(0)
+        self._records = {}
+        self._records_lock = threading.Lock()
+        # 最近一次完整预热的时间（monotonic），None 表示索引不完整，未命中时需查询 API
+        self._indexed_at = None
+        self._warm_lock = threading.Lock()
+        # 预热拉取期间的索引写入，替换前重放到新索引上；None 表示没有进行中的预热
+        self._pending = None
 
         # 验证凭证
-        if api_token:
-            self.cf = CloudFlare(token=api_token)
-        elif api_email and api_key:
-            self.cf = CloudFlare(email=api_email, key=api_key)
-        else:
-            raise ValueError("Cloudflare credentials required: api_token or (api_email + api_key)")
+        # base_url 用于指向本地模拟 API（基准测试）
+        self.api = CloudflareAPI(
+            api_token=api_token,
+            api_email=api_email,
+            api_key=api_key,
+            base_url=base_url,
+            rate_limiter=self.rate_limiter,
+            write_guard=write_guard
+        )
 
         logger.info(f"Initialized Cloudflare client for domain: {domain}")
 
@@ -36,7 +71,7 @@ class CloudflareClient:
             return self.zone_id
 
         try:
-            zones = self.cf.zones.get(params={'name': self.domain})
+            zones = self.api.list_zones(self.domain)
             if not zones:
                 raise Exception(f"Zone not found for domain: {self.domain}")
 
@@ -47,6 +82,23 @@ class CloudflareClient:
             logger.error(f"Failed to get zone ID: {e}")
             raise
 
+    def verify_credentials(self) -> str:
+        """
+        校验 API 凭证是否有效（用于后台健康探测）
+
+        Returns:
+            凭证状态
+        """
+        result = self.api.verify_credentials()
+        status = result.get('status', 'active')
+        if status != 'active':
+            raise Exception(f"Cloudflare token status: {status}")
+        return status
+
+    def _index_fresh(self) -> bool:
+        indexed_at = self._indexed_at
+        return indexed_at is not None and time.monotonic() - indexed_at < self.index_ttl
+
     def check_dns_exists(self, subdomain: str) -> bool:
         """
         检查 DNS A 记录是否已存在
@@ -57,15 +109,33 @@ class CloudflareClient:
         Returns:
             True 如果记录存在，否则 False
         """
-        zone_id = self._get_zone_id()
         full_domain = f"{subdomain}.{self.domain}"
 
+        # 索引过期后重新预热；其他线程正在预热时直接走逐条查询
+        if self._indexed_at is not None and not self._index_fresh() and self._warm_lock.acquire(blocking=False):
+            try:
+                self._warm_record_index()
+            except Exception as e:
+                logger.warning(f"Failed to refresh record index: {e}")
+            finally:
+                self._warm_lock.release()
+
+        # 完整且未过期的索引对命中和未命中都是权威的，无需请求 API
+        with self._records_lock:
+            if full_domain in self._records:
+                logger.debug(f"DNS record for {full_domain}: exists (cached)")
+                return True
+            if self._index_fresh():
+                logger.debug(f"DNS record for {full_domain}: not found (cached)")
+                return False
+
+        zone_id = self._get_zone_id()
+
         try:
-            records = self.cf.zones.dns_records.get(
-                zone_id,
-                params={'type': 'A', 'name': full_domain}
-            )
+            records = list(self.api.iter_dns_records(zone_id, type='A', name=full_domain))
             exists = len(records) > 0
+            if exists:
+                self._remember(records)
             logger.info(f"DNS record for {full_domain}: {'exists' if exists else 'not found'}")
             return exists
         except Exception as e:
@@ -75,6 +145,8 @@ class CloudflareClient:
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=1, max=16),
+        # 失去主节点身份后不再重试，由新的主节点负责
+        retry=retry_if_not_exception_type(NotLeaderError),
         reraise=True
     )
     def create_dns_record(
@@ -108,23 +180,199 @@ class CloudflareClient:
         }
 
         try:
-            result = self.cf.zones.dns_records.post(zone_id, data=data)
+            result = self.api.create_dns_record(zone_id, data)
+            self._remember([dict(data, id=result.get('id'))])
             logger.info(f"Created DNS record: {full_domain} -> {ip} (ID: {result['id']})")
             return True
+        except CloudflareAPIError as e:
+            if e.code not in RECORD_EXISTS_CODES:
+                logger.error(f"Failed to create DNS record for {full_domain}: {e}")
+                raise
+            # 索引认为不存在但记录已存在（索引过期）: 用实际记录修正索引，不再重试
+            records = list(self.api.iter_dns_records(zone_id, type='A', name=full_domain))
+            if not records:
+                # 与同名的非 A 记录冲突，重试无法解决
+                logger.error(f"Failed to create DNS record for {full_domain}: {e}")
+                raise
+            self._remember(records)
+            logger.warning(f"DNS record for {full_domain} already exists, index corrected")
+            return True
+        except NotLeaderError:
+            raise
         except Exception as e:
             logger.error(f"Failed to create DNS record for {full_domain}: {e}")
             raise
 
-    def list_dns_records(self) -> list:
-        """列出所有 A 记录（用于调试）"""
+    def get_record(self, subdomain: str) -> Optional[dict]:
+        """本地索引中的记录（id/content/ttl/proxied），未索引时为 None"""
+        with self._records_lock:
+            record = self._records.get(f"{subdomain}.{self.domain}")
+            return dict(record) if record else None
+
+    def update_records(self, changes: List[Tuple[str, int, bool]]) -> int:
+        """
+        批量修改已索引记录的 TTL 和代理状态
+
+        Args:
+            changes: [(subdomain, ttl, proxied)]，未索引的子域名被跳过
+
+        Returns:
+            修改的记录数
+        """
         zone_id = self._get_zone_id()
+        patches = []
+        for subdomain, ttl, proxied in changes:
+            record = self.get_record(subdomain)
+            if not record or not record.get('id'):
+                logger.warning(f"Record {subdomain}.{self.domain} not indexed, skipping policy update")
+                continue
+            patches.append((f"{subdomain}.{self.domain}", {'id': record['id'], 'ttl': ttl, 'proxied': proxied}))
+
+        updated = 0
+        for start in range(0, len(patches), BATCH_SIZE):
+            chunk = patches[start:start + BATCH_SIZE]
+            try:
+                self.api.batch_dns_records(zone_id, patches=[patch for _, patch in chunk])
+            except NotLeaderError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to update {len(chunk)} DNS records: {e}")
+                raise
+
+            with self._records_lock:
+                for full_domain, patch in chunk:
+                    self._index_update(full_domain, ttl=patch['ttl'], proxied=patch['proxied'])
+            updated += len(chunk)
 
+        if updated:
+            logger.info(f"Updated TTL/proxied on {updated} DNS records")
+        return updated
+
+    def delete_dns_record(self, subdomain: str, ip: Optional[str] = None) -> bool:
+        """
+        删除 DNS A 记录
+
+        Args:
+            subdomain: 子域名
+            ip: 期望的记录值，记录已指向其他地址（手动修改或其他主机接管）时保留不删
+
+        Returns:
+            True 如果删除成功，记录不存在或被保留时为 False
+        """
+        zone_id = self._get_zone_id()
+        full_domain = f"{subdomain}.{self.domain}"
+
+        with self._records_lock:
+            record = self._records.get(full_domain)
+        if not record or not record.get('id'):
+            records = list(self.api.iter_dns_records(zone_id, type='A', name=full_domain))
+            if not records:
+                logger.info(f"No DNS record to delete for {full_domain}")
+                return False
+            record = records[0]
+
+        if ip and record.get('content') != ip:
+            logger.warning(f"DNS record {full_domain} points to {record.get('content')}, not {ip}; leaving it in place")
+            return False
+
+        try:
+            self.api.delete_dns_record(zone_id, record['id'])
+        except CloudflareAPIError as e:
+            if e.status != 404 and e.code != RECORD_MISSING_CODE:
+                logger.error(f"Failed to delete DNS record for {full_domain}: {e}")
+                raise
+            # 记录已被删除，索引中的条目已过期
+            with self._records_lock:
+                self._index_drop(full_domain)
+            logger.info(f"DNS record {full_domain} was already deleted")
+            return False
+
+        with self._records_lock:
+            self._index_drop(full_domain)
+        logger.info(f"Deleted DNS record: {full_domain} (ID: {record['id']})")
+        return True
+
+    def iter_dns_records(self):
+        """逐页遍历所有 A 记录"""
+        return self.api.iter_dns_records(self._get_zone_id(), type='A')
+
+    def list_dns_records(self) -> list:
+        """列出所有 A 记录（用于调试）"""
         try:
-            records = self.cf.zones.dns_records.get(
-                zone_id,
-                params={'type': 'A'}
-            )
-            return records
+            return list(self.iter_dns_records())
         except Exception as e:
             logger.error(f"Failed to list DNS records: {e}")
             return []
+
+    @staticmethod
+    def _index_entry(record: dict) -> dict:
+        return {
+            'id': record.get('id'),
+            'content': record.get('content'),
+            'ttl': record.get('ttl'),
+            'proxied': record.get('proxied')
+        }
+
+    def _remember(self, records: list):
+        """将 A 记录写入本地索引"""
+        with self._records_lock:
+            for record in records:
+                entry = self._index_entry(record)
+                self._records[record['name']] = entry
+                self._journal('set', record['name'], dict(entry))
+
+    # 以下索引写入方法由调用方持有 _records_lock
+
+    def _index_update(self, full_domain: str, **fields):
+        if full_domain in self._records:
+            self._records[full_domain].update(fields)
+        self._journal('update', full_domain, fields)
+
+    def _index_drop(self, full_domain: str):
+        self._records.pop(full_domain, None)
+        self._journal('drop', full_domain, None)
+
+    def _journal(self, op: str, full_domain: str, entry: Optional[dict]):
+        if self._pending is not None:
+            self._pending.append((op, full_domain, entry))
+
+    def warm_record_index(self) -> int:
+        """
+        一次性拉取所有 A 记录，重建本地索引
+
+        新索引在单独的字典中构建，完成后整体替换；已被删除（其他副本或手动）的记录
+        随之移出索引。拉取期间本副本的创建、更新和删除会先重放到新索引上再替换，
+        不会被拉取开始前的快照覆盖。拉取失败时保留原索引。同一时间只有一个预热在进行
+
+        Returns:
+            索引中的记录数
+        """
+        with self._warm_lock:
+            return self._warm_record_index()
+
+    def _warm_record_index(self) -> int:
+        """warm_record_index 的实现，调用方持有 _warm_lock"""
+        # 以开始拉取的时间计算有效期，拉取期间的变化由写入路径记录
+        started = time.monotonic()
+        with self._records_lock:
+            self._pending = []
+        try:
+            # 逐页构建，只保留索引字段，大 zone 不需要保存完整的记录列表
+            records = {record['name']: self._index_entry(record) for record in self.iter_dns_records()}
+
+            with self._records_lock:
+                for op, full_domain, entry in self._pending:
+                    if op == 'set':
+                        records[full_domain] = entry
+                    elif op == 'drop':
+                        records.pop(full_domain, None)
+                    elif full_domain in records:
+                        records[full_domain].update(entry)
+                self._records = records
+                self._indexed_at = started
+        finally:
+            with self._records_lock:
+                self._pending = None
+
+        logger.info(f"Record index warmed with {len(records)} A records")
+        return len(records)
@@ -3,44 +3,102 @@ import os
 import time
 import signal
 import logging
-from threading import Thread
+from functools import partial
+from concurrent.futures import Future
+from threading import Event, RLock, Thread
+from typing import Optional, Tuple
 from flask import Flask, jsonify
-from prometheus_client import Counter, Gauge, generate_latest
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
 
-from utils import detect_ipv4, setup_logging
+from utils import RateLimiter, detect_ipv4, is_local_docker_url, parse_docker_hosts, setup_logging
+from common.structured_logging import log_context
+from cloudflare_api import NotLeaderError
 from cloudflare_client import CloudflareClient
 from docker_monitor import DockerMonitor
+from leader_election import create_elector
+from startup import StartupPipeline
+from propagation import create_verifier
+from file_provider import create_file_watcher
+from common.health_probes import BackgroundProber
+from policy import PolicyEngine, RecordPolicy, create_policy_watcher
 
 
 # Prometheus 指标
 dns_records_created = Counter('dns_records_created_total', 'Total DNS records created')
+dns_records_updated = Counter('dns_records_updated_total', 'DNS records whose TTL/proxied was changed to match policy')
+dns_records_deleted = Counter('dns_records_deleted_total', 'DNS records deleted after their hostname disappeared')
 dns_api_errors = Counter('dns_api_errors_total', 'Total DNS API errors')
 dns_containers_monitored = Gauge('dns_containers_monitored', 'Number of containers monitored')
+dns_time_to_ready = Gauge('dns_manager_time_to_ready_seconds', 'Seconds from process start until ready')
+dns_startup_step_duration = Gauge('dns_manager_startup_step_seconds', 'Duration of each startup step', ['step'])
+dns_time_to_resolvable = Histogram(
+    'dns_time_to_resolvable_seconds',
+    'Seconds from record creation until all verify resolvers return it',
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+dns_dependency_up = Gauge('dns_manager_dependency_up', 'Result of the last background dependency probe', ['check'])
+dns_propagation_timeouts = Counter('dns_propagation_timeouts_total', 'Records not resolvable before the verify deadline')
 
 # 全局状态
 stats = {
     'start_time': time.time(),
     'containers_monitored': 0,
     'records_created': 0,
+    'records_updated': 0,
+    'records_deleted': 0,
     'api_errors': 0
 }
 
+# 启动就绪状态，由 DNSManager.run 中的启动流水线更新；prober 缓存后台依赖探测结果
+readiness = {
+    'ready': False,
+    'pipeline': None,
+    'prober': None
+}
+
 
 def create_health_app():
     """创建健康检查 Flask 应用"""
     app = Flask(__name__)
 
+    # 两个端点只读取后台探测的缓存结果，不发起任何 Docker / Cloudflare 请求
     @app.route('/health')
     def health():
+        prober = readiness['prober']
+        checks = prober.snapshot() if prober else {}
+        # 存活只看关键探测项（本机 Docker、事件流），Cloudflare 或远程主机故障不应导致重启
+        # 首轮探测完成前没有结果，报告 starting 而不是 503，避免启动期间被重启
+        starting = prober is not None and not prober.started()
+        healthy = starting or (prober.healthy(checks) if prober else True)
+        if starting:
+            status = 'starting'
+        else:
+            status = 'healthy' if healthy else 'unhealthy'
         return jsonify({
-            'status': 'healthy',
+            'status': status,
             'uptime': int(time.time() - stats['start_time']),
             'stats': {
                 'containers_monitored': stats['containers_monitored'],
                 'dns_records_created': stats['records_created'],
+                'dns_records_updated': stats['records_updated'],
+                'dns_records_deleted': stats['records_deleted'],
                 'api_errors': stats['api_errors']
-            }
-        })
+            },
+            'checks': checks
+        }), 200 if healthy else 503
+
+    @app.route('/ready')
+    def ready():
+        pipeline = readiness['pipeline']
+        prober = readiness['prober']
+        checks = prober.snapshot() if prober else {}
+        is_ready = readiness['ready'] and all(check['ok'] for check in checks.values())
+        body = {
+            'ready': is_ready,
+            'steps': pipeline.status() if pipeline else {},
+            'checks': checks
+        }
+        return jsonify(body), 200 if is_ready else 503
 
     @app.route('/metrics')
     def metrics():
@@ -51,6 +109,11 @@ def create_health_app():
         # 手动触发同步的端点
         return jsonify({'message': 'Sync triggered'}), 200
 
+    # 诊断端点仅在显式开启时导入和注册
+    if os.getenv('DEBUG_ENDPOINTS', 'false').lower() == 'true':
+        from common.debug_endpoints import register_debug_routes
+        register_debug_routes(app)
+
     return app
 
 
@@ -72,68 +135,326 @@ class DNSManager:
         if not self.domain:
             raise ValueError("DOMAIN environment variable is required")
 
-        # 检测服务器 IP
-        self.logger.info("Detecting server IPv4 address...")
-        self.server_ip = detect_ipv4()
-        self.logger.info(f"Server IP: {self.server_ip}")
-
-        # 初始化 Cloudflare 客户端
+        # Docker 主机列表,未配置 DOCKER_HOSTS 时只监听本地 daemon
+        self.docker_hosts = parse_docker_hosts(os.getenv('DOCKER_HOSTS'))
+
+        # 本机公网 IP: 未指定 IP 的主机和 Traefik file provider 的路由（由本机 Traefik 提供）使用。
+        # 本机 daemon 条目指定了 IP 时直接采用；所有主机都指定了 IP 且未启用 file provider 时不需要；
+        # 其余情况在后台检测，与其他启动步骤并发，首次使用 server_ip 时才等待结果。
+        # 不能用其他主机的 IP 代替，否则 file provider 的记录会指向该主机
+        local_ip = next((ip for _, url, ip in self.docker_hosts if ip and is_local_docker_url(url)), None)
+        self._server_ip = Future()
+        if local_ip:
+            self._server_ip.set_result(local_ip)
+        elif all(ip for _, _, ip in self.docker_hosts) and not os.getenv('TRAEFIK_DYNAMIC_DIR'):
+            self._server_ip.set_result(None)
+        else:
+            Thread(target=self._detect_server_ip, name="ip-detect", daemon=True).start()
+
+        # 初始化 Cloudflare 客户端,所有主机共享同一个限流器和记录索引
+        # 默认 4 req/s,即 Cloudflare 的 1200 次/5 分钟
         self.cf_client = CloudflareClient(
             domain=self.domain,
             api_token=cf_token,
             api_email=cf_email,
-            api_key=cf_key
+            api_key=cf_key,
+            rate_limiter=RateLimiter(float(os.getenv('CF_RATE_LIMIT', '4'))),
+            base_url=os.getenv('CF_API_BASE_URL') or None,
+            index_ttl=float(os.getenv('CF_INDEX_TTL', '300')),
+            # 创建记录的重试退避（最长约 15 秒）和限流等待可能超过租约有效期，每个写请求发出前重新确认身份
+            write_guard=lambda: self.is_leader
         )
 
-        # 初始化 Docker 监听器
-        self.docker_monitor = DockerMonitor(
-            domain=self.domain,
-            on_container_start=self._handle_container_start
+        # 检查与创建记录需要串行,避免多个主机同时为同一子域名创建重复记录
+        self._record_lock = RLock()
+
+        # 容器重建后不再使用的子域名是否删除记录
+        self.delete_stale = os.getenv('DNS_DELETE_STALE', 'true').lower() == 'true'
+
+        # 每个 Docker 主机一个监听器,回调携带该主机的公网 IP
+        cache_size = int(os.getenv('CONTAINER_CACHE_SIZE', '4096'))
+        self.docker_monitors = [
+            DockerMonitor(
+                domain=self.domain,
+                on_container_start=partial(self._handle_container_start, server_ip=ip),
+                base_url=url,
+                host_name=name,
+                on_host_removed=partial(self._handle_host_removed, server_ip=ip),
+                cache_size=cache_size
+            )
+            for name, url, ip in self.docker_hosts
+        ]
+        self.docker_monitor = self.docker_monitors[0]
+
+        # Traefik file provider 中定义的路由，与容器事件走同一处理流程，使用本机 IP
+        self.file_watcher = create_file_watcher(
+            self.domain,
+            partial(self._handle_container_start, server_ip=None)
         )
 
+        # 记录策略（proxied / TTL），未配置 DNS_POLICY_FILE 时所有记录使用默认值
+        self.policy = create_policy_watcher(on_change=self._handle_policy_change)
+        self._default_policy = PolicyEngine()
+
+        # 期望状态: 子域名 -> (容器名称, IP)，跟随者也持续维护，接管时直接据此补齐记录
+        self._desired = {}
+
+        # 多副本选主，未配置 LEADER_ELECTION 时为 None，始终作为主节点写入
+        self.elector = create_elector(
+            os.getenv('LEADER_ELECTION'),
+            on_elected=self._handle_elected
+        )
+
+        # DNS 传播验证，未开启 DNS_VERIFY 时为 None
+        self.verifier = create_verifier(
+            on_resolved=self._handle_record_resolvable,
+            on_timeout=self._handle_record_unresolvable
+        )
+
+        self.prober = self._build_prober()
+
+        # 启动期间事件处理需等待 IP 检测和记录索引预热完成；未调用 run 时不阻塞
+        self._warmed = Event()
+        self._warmed.set()
+        self.pipeline = None
+
         self.logger.info("DNS Manager initialized")
 
-    def _handle_container_start(self, subdomain: str, container_name: str):
+    def _build_prober(self) -> BackgroundProber:
+        """
+        后台依赖探测:
+            docker:<host>  Docker daemon ping（本机 daemon 为关键，远程主机仅影响 /ready）
+            events:<host>  事件流已连接且处理延迟未超过 EVENT_LAG_THRESHOLD（同上）
+            cloudflare     API 凭证有效（仅影响 /ready）
+
+        远程主机不可达时重启本服务无济于事，反而会中断其他主机的事件处理
+        """
+        prober = BackgroundProber(
+            interval=float(os.getenv('HEALTH_PROBE_INTERVAL', '15')),
+            timeout=float(os.getenv('HEALTH_PROBE_TIMEOUT', '5')),
+            on_result=lambda name, ok: dns_dependency_up.labels(check=name).set(1 if ok else 0),
+            logger=self.logger
+        )
+        lag_threshold = float(os.getenv('EVENT_LAG_THRESHOLD', '30'))
+
+        for (_, url, _), monitor in zip(self.docker_hosts, self.docker_monitors):
+            local = is_local_docker_url(url)
+            prober.add(f"docker:{monitor.host_name}", monitor.client.ping, critical=local)
+            prober.add(
+                f"events:{monitor.host_name}",
+                partial(self._probe_event_stream, monitor, lag_threshold),
+                critical=local
+            )
+        prober.add('cloudflare', self.cf_client.verify_credentials, critical=False)
+        return prober
+
+    @staticmethod
+    def _probe_event_stream(monitor: DockerMonitor, lag_threshold: float) -> dict:
+        status = monitor.event_stream_status()
+        if not status['connected']:
+            raise Exception("event stream disconnected")
+        # 延迟只在收到事件时更新，长时间没有事件时不视为积压
+        if status['lag_seconds'] is not None and status['lag_seconds'] > lag_threshold \
+                and status['last_event_age'] is not None and status['last_event_age'] < lag_threshold:
+            raise Exception(f"event processing lag {status['lag_seconds']}s exceeds {lag_threshold}s")
+        return status
+
+    def _detect_server_ip(self):
+        self.logger.info("Detecting server IPv4 address...")
+        try:
+            ip = detect_ipv4()
+        except Exception as e:
+            self._server_ip.set_exception(e)
+            return
+        self.logger.info(f"Server IP: {ip}")
+        self._server_ip.set_result(ip)
+
+    @property
+    def server_ip(self) -> Optional[str]:
+        """本机公网 IP，检测未完成时阻塞等待；所有主机都指定了 IP 且未启用 file provider 时为 None"""
+        return self._server_ip.result()
+
+    def _handle_container_start(self, subdomain: str, container_name: str, server_ip: Optional[str] = None):
         """
         处理容器启动事件
 
         Args:
             subdomain: 子域名
             container_name: 容器名称
+            server_ip: 容器所在主机的公网 IP,默认使用本机 IP
         """
-        try:
-            stats['containers_monitored'] += 1
-            dns_containers_monitored.set(stats['containers_monitored'])
-
-            # 检查 DNS 记录是否已存在
-            if self.cf_client.check_dns_exists(subdomain):
-                self.logger.info(f"DNS record already exists for {subdomain}.{self.domain}, skipping")
-                return
-
-            # 创建 DNS 记录
-            self.logger.info(f"Creating DNS record: {subdomain}.{self.domain} -> {self.server_ip}")
-            success = self.cf_client.create_dns_record(subdomain, self.server_ip)
-
-            if success:
-                stats['records_created'] += 1
-                dns_records_created.inc()
-                self.logger.info(f"Successfully created DNS record for {subdomain}.{self.domain}")
-            else:
+        self._warmed.wait()
+
+        with log_context(subdomain=subdomain, container=container_name), self._record_lock:
+            try:
+                # IP 检测失败时 server_ip 抛出异常，只影响本次事件
+                server_ip = server_ip or self.server_ip
+                self._desired[subdomain] = (container_name, server_ip)
+
+                # 跟随者只维护期望状态，不访问 Cloudflare
+                if not self.is_leader:
+                    self.logger.debug(f"Not leader, deferring DNS record for {subdomain}.{self.domain}")
+                    return
+
+                stats['containers_monitored'] += 1
+                dns_containers_monitored.set(stats['containers_monitored'])
+
+                policy, configured = self._policy_for(subdomain)
+
+                # 检查 DNS 记录是否已存在，已存在时只修正与显式配置的策略不一致的 TTL / 代理状态
+                if self.cf_client.check_dns_exists(subdomain):
+                    record = self.cf_client.get_record(subdomain) if configured else None
+                    if record and policy.differs(record):
+                        self.logger.info(f"Applying {policy} to existing record {subdomain}.{self.domain}")
+                        self._apply_policy_updates([(subdomain, policy)])
+                    else:
+                        self.logger.info(f"DNS record already exists for {subdomain}.{self.domain}, skipping")
+                    return
+
+                # 创建 DNS 记录
+                self.logger.info(f"Creating DNS record: {subdomain}.{self.domain} -> {server_ip} ({policy.source})")
+                success = self.cf_client.create_dns_record(
+                    subdomain, server_ip, ttl=policy.ttl, proxied=policy.proxied
+                )
+
+                if success:
+                    stats['records_created'] += 1
+                    dns_records_created.inc()
+                    self.logger.info(f"Successfully created DNS record for {subdomain}.{self.domain}")
+                    if self.verifier:
+                        # 代理记录解析到 Cloudflare 边缘节点，只要求可解析
+                        self.verifier.verify(f"{subdomain}.{self.domain}", None if policy.proxied else server_ip)
+                else:
+                    stats['api_errors'] += 1
+                    dns_api_errors.inc()
+                    self.logger.error(f"Failed to create DNS record for {subdomain}.{self.domain}")
+            except NotLeaderError:
+                # 期望状态已记录，由新的主节点在接管时补齐
+                self.logger.info(f"Lost leadership, leaving {subdomain}.{self.domain} to the new leader")
+            except Exception as e:
                 stats['api_errors'] += 1
                 dns_api_errors.inc()
-                self.logger.error(f"Failed to create DNS record for {subdomain}.{self.domain}")
+                self.logger.error(f"Error handling container {container_name}: {e}")
+
+    def _policy_for(self, subdomain: str) -> Tuple[RecordPolicy, bool]:
+        """
+        子域名的记录策略，容器标签中的覆盖优先于规则
+
+        Returns:
+            (策略, 是否显式配置)；未设置策略文件且没有标签覆盖时只用于新建记录，
+            不修改已有记录（例如在 Cloudflare 面板中手动开启代理的记录）
+        """
+        engine = self.policy.engine if self.policy else self._default_policy
+        overrides = next(
+            (o for o in (monitor.overrides(subdomain) for monitor in self.docker_monitors) if o),
+            None
+        )
+        configured = self.policy is not None or bool(overrides)
+        return engine.evaluate(f"{subdomain}.{self.domain}", overrides), configured
+
+    def _apply_policy_updates(self, changes: list):
+        """批量修改记录的 TTL / 代理状态，调用方持有 _record_lock"""
+        try:
+            updated = self.cf_client.update_records(
+                [(subdomain, policy.ttl, policy.proxied) for subdomain, policy in changes]
+            )
+            stats['records_updated'] += updated
+            dns_records_updated.inc(updated)
+        except NotLeaderError:
+            self.logger.info("Lost leadership, leaving policy updates to the new leader")
         except Exception as e:
             stats['api_errors'] += 1
             dns_api_errors.inc()
-            self.logger.error(f"Error handling container {container_name}: {e}")
+            self.logger.error(f"Failed to apply DNS policy to {len(changes)} records: {e}")
+
+    def _handle_policy_change(self, engine: PolicyEngine):
+        """策略文件变化: 只批量修改策略结果与现有记录不一致的记录"""
+        if not self.is_leader:
+            return
+
+        self._warmed.wait()
+        with self._record_lock:
+            changes = []
+            for subdomain in list(self._desired):
+                record = self.cf_client.get_record(subdomain)
+                policy, _ = self._policy_for(subdomain)
+                if record and policy.differs(record):
+                    changes.append((subdomain, policy))
+
+            self.logger.info(f"Policy reloaded: {len(changes)} of {len(self._desired)} records affected")
+            if changes:
+                self._apply_policy_updates(changes)
+
+    def _handle_host_removed(self, subdomain: str, container_name: str, server_ip: Optional[str] = None):
+        """
+        处理子域名被移除（容器删除或重建后路由规则变化）
+
+        其他主机的容器或 Traefik 动态配置仍在使用该子域名时保留记录；
+        只删除仍指向该主机 IP 的记录
+
+        Args:
+            subdomain: 子域名
+            container_name: 最后使用该子域名的容器名称
+            server_ip: 容器所在主机的公网 IP,默认使用本机 IP
+        """
+        if any(monitor.holds(subdomain) for monitor in self.docker_monitors):
+            return
+        if self.file_watcher and any(s == subdomain for s, _ in self.file_watcher.hosts()):
+            return
+
+        self._desired.pop(subdomain, None)
+        if not self.delete_stale or not self.is_leader:
+            return
+
+        self._warmed.wait()
+        server_ip = server_ip or self.server_ip
+        with log_context(subdomain=subdomain, container=container_name), self._record_lock:
+            try:
+                if self.cf_client.delete_dns_record(subdomain, server_ip):
+                    stats['records_deleted'] += 1
+                    dns_records_deleted.inc()
+            except NotLeaderError:
+                self.logger.info(f"Lost leadership, leaving {subdomain}.{self.domain} to the new leader")
+            except Exception as e:
+                stats['api_errors'] += 1
+                dns_api_errors.inc()
+                self.logger.error(f"Error removing DNS record for {subdomain}.{self.domain}: {e}")
+
+    @property
+    def is_leader(self) -> bool:
+        return self.elector is None or self.elector.is_leader
+
+    def _handle_record_resolvable(self, name: str, ip: str, elapsed: float):
+        """记录已可通过所有验证解析器解析，ACME 验证此后才能通过"""
+        dns_time_to_resolvable.observe(elapsed)
+
+    def _handle_record_unresolvable(self, name: str, ip: str, elapsed: float):
+        dns_propagation_timeouts.inc()
+
+    def _handle_elected(self):
+        """成为主节点: 刷新记录索引后按内存中的期望状态补齐记录，无需重新扫描容器"""
+        Thread(target=self._reconcile, name="reconcile", daemon=True).start()
+
+    def _reconcile(self):
+        if not self._desired:
+            return
+
+        try:
+            self.cf_client.warm_record_index()
+        except Exception as e:
+            self.logger.warning(f"Failed to refresh record index: {e}")
+
+        for subdomain, (container_name, server_ip) in list(self._desired.items()):
+            self._handle_container_start(subdomain, container_name, server_ip=server_ip)
 
     def run(self):
         """启动 DNS Manager"""
-        # 扫描现有容器
-        self.logger.info("Scanning existing containers...")
-        self.docker_monitor.scan_existing_containers()
+        # 注册信号处理器
+        signal.signal(signal.SIGUSR1, self._handle_sync_signal)
+        signal.signal(signal.SIGTERM, self._handle_term_signal)
 
-        # 启动健康检查服务器（后台线程）
+        # 健康检查服务器最先启动，/health 反映存活，/ready 反映启动进度和依赖状态
+        readiness['prober'] = self.prober.start()
         health_app = create_health_app()
         health_thread = Thread(
             target=lambda: health_app.run(host='0.0.0.0', port=8000, debug=False),
@@ -142,22 +463,129 @@ class DNSManager:
         health_thread.start()
         self.logger.info("Health check server started on port 8000")
 
-        # 注册信号处理器
-        signal.signal(signal.SIGUSR1, self._handle_sync_signal)
-        signal.signal(signal.SIGTERM, self._handle_term_signal)
+        if self.elector:
+            self.elector.start()
+            self.logger.info(f"Leader election started as {self.elector.holder}")
 
-        # 开始监听 Docker 事件（阻塞）
+        # 先订阅事件流再扫描现有容器，扫描期间启动的容器不会遗漏；
+        # 事件处理在 IP 检测和索引预热完成前等待
+        self._warmed.clear()
         self.logger.info("Starting event listener...")
-        self.docker_monitor.listen()
+        threads = []
+        for monitor in self.docker_monitors:
+            try:
+                stream = monitor.open_event_stream()
+            except Exception as e:
+                self.logger.error(f"Failed to open event stream for host {monitor.host_name}: {e}")
+                stream = None
+            thread = Thread(
+                target=self._listen_forever, args=(monitor, stream),
+                name=f"events-{monitor.host_name}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        if self.file_watcher:
+            Thread(target=self.file_watcher.watch, name="traefik-files", daemon=True).start()
+
+        if self.policy:
+            Thread(target=self.policy.watch, name="policy-reload", daemon=True).start()
+
+        self.pipeline = self._build_startup_pipeline()
+        readiness['pipeline'] = self.pipeline
+        try:
+            self.pipeline.run()
+        finally:
+            # 即使启动失败也放行事件处理，避免监听线程永久阻塞
+            self._warmed.set()
+            for name, step in self.pipeline.status().items():
+                if step['duration'] is not None:
+                    dns_startup_step_duration.labels(step=name).set(step['duration'])
+
+        readiness['ready'] = True
+        elapsed = time.time() - stats['start_time']
+        dns_time_to_ready.set(elapsed)
+        self.logger.info(f"DNS Manager ready in {elapsed:.2f}s")
+
+        # 每个主机一个监听线程，单个主机断开不影响其他主机
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+    def _build_startup_pipeline(self) -> StartupPipeline:
+        """
+        启动步骤依赖关系:
+
+            server_ip ─────────────────────┐
+            zone_id ── record_index ───────┼── gate ──┐
+            list:<host> ───────────────────┴──────────┼── dispatch:<host>
+                                                      └── traefik_files
+
+        容器列表与 IP 检测、Cloudflare 预热并发进行，全部就绪后再逐个处理
+        """
+        pipeline = StartupPipeline()
+        pipeline.add('server_ip', lambda: self.server_ip)
+        # Cloudflare 暂时不可用时照常启动，记录检查回退为逐条查询
+        pipeline.add('zone_id', self.cf_client._get_zone_id, required=False)
+        pipeline.add('record_index', self.cf_client.warm_record_index, depends=('zone_id',), required=False)
+        pipeline.add('gate', self._warmed.set, depends=('server_ip', 'record_index'))
+
+        for monitor in self.docker_monitors:
+            list_step = f"list:{monitor.host_name}"
+            pipeline.add(list_step, monitor.collect_existing_containers, required=False)
+            pipeline.add(
+                f"dispatch:{monitor.host_name}",
+                partial(self._dispatch_existing, monitor, pipeline, list_step),
+                depends=(list_step, 'gate'),
+                required=False
+            )
+
+        if self.file_watcher:
+            pipeline.add(
+                'traefik_files',
+                lambda: self.file_watcher.dispatch(self.file_watcher.scan()),
+                depends=('gate',),
+                required=False
+            )
+        return pipeline
+
+    def _dispatch_existing(self, monitor: DockerMonitor, pipeline: StartupPipeline, list_step: str):
+        """处理启动扫描得到的容器"""
+        containers = pipeline.result(list_step) or []
+        self.logger.info(f"Found {len(containers)} existing containers on host {monitor.host_name}")
+        for subdomain, container_name in containers:
+            monitor.on_container_start(subdomain, container_name)
+
+    def _listen_forever(self, monitor: DockerMonitor, stream=None):
+        """持续监听单个主机的事件,断开后退避重连并补扫期间遗漏的容器"""
+        backoff = 1
+        while True:
+            try:
+                monitor.listen(stream)
+                backoff = 1
+            except Exception as e:
+                self.logger.error(f"Event stream for host {monitor.host_name} lost: {e}, reconnecting in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            stream = None
+            monitor.scan_existing_containers()
 
     def _handle_sync_signal(self, signum, frame):
         """处理 SIGUSR1 信号：触发全量同步"""
         self.logger.info("Received SIGUSR1, triggering full sync...")
-        self.docker_monitor.scan_existing_containers()
+        for monitor in self.docker_monitors:
+            monitor.scan_existing_containers()
+        if self.file_watcher:
+            self.file_watcher.dispatch(self.file_watcher.hosts())
 
     def _handle_term_signal(self, signum, frame):
         """处理 SIGTERM 信号：优雅关闭"""
         self.logger.info("Received SIGTERM, shutting down...")
+        if self.elector:
+            self.elector.stop()
+        if self.policy:
+            self.policy.stop()
+        self.prober.stop()
         exit(0)
 
 
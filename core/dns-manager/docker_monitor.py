@@ -1,117 +1,422 @@
+import os
 import re
+import time
+import hashlib
 import logging
+import threading
+from collections import Counter, OrderedDict
 import docker
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils import extract_hosts_from_rule, subdomain_for_host
+from policy import LABEL_PREFIX, overrides_from_labels
 
 
 logger = logging.getLogger("dns-manager")
 
 
-def extract_domain_from_labels(labels: dict, base_domain: str) -> Optional[str]:
+ROUTER_RULE_PATTERN = re.compile(r'traefik\.http\.routers\..+\.rule')
+
+# 容器生命周期中会影响 DNS 记录的事件
+CONTAINER_EVENTS = ['create', 'start', 'rename', 'destroy']
+
+
+def extract_domains_from_labels(labels: dict, base_domain: str) -> List[str]:
     """
-    从 Traefik 标签中提取子域名
+    从 Traefik 标签中提取所有子域名
 
     Args:
         labels: 容器标签字典
         base_domain: 基础域名（如 example.com）
 
     Returns:
-        子域名（不包含基础域名），如果未找到则返回 None
+        子域名列表（不包含基础域名，按标签顺序去重），未启用 Traefik 时为空
     """
     # 检查是否启用 Traefik
     if labels.get("traefik.enable") != "true":
-        return None
-
-    # 查找所有 Host 规则
-    pattern = r'traefik\.http\.routers\..+\.rule'
+        return []
 
+    subdomains = []
     for key, value in labels.items():
-        if re.match(pattern, key):
-            # 提取 Host(`domain`) 或 Host(\`domain\`)
-            host_match = re.search(r'Host\([`\\]+([^`\\]+)[`\\]+\)', value)
-            if host_match:
-                full_domain = host_match.group(1)
-
+        if ROUTER_RULE_PATTERN.match(key):
+            for full_domain in extract_hosts_from_rule(value):
                 # 检查是否是泛域名
                 if full_domain.startswith('*'):
                     logger.debug(f"Skipping wildcard domain: {full_domain}")
                     continue
 
-                # 检查是否匹配基础域名
-                if full_domain.endswith(f".{base_domain}"):
-                    subdomain = full_domain[:-len(base_domain)-1]
-                    return subdomain
-                elif full_domain == base_domain:
-                    # 主域名，使用 @ 或空字符串
-                    return "@"
+                # 检查是否匹配基础域名，主域名返回 @
+                subdomain = subdomain_for_host(full_domain, base_domain)
+                if subdomain and subdomain not in subdomains:
+                    subdomains.append(subdomain)
+
+    return subdomains
+
+
+def extract_domain_from_labels(labels: dict, base_domain: str) -> Optional[str]:
+    """
+    从 Traefik 标签中提取子域名
+
+    Args:
+        labels: 容器标签字典
+        base_domain: 基础域名（如 example.com）
+
+    Returns:
+        子域名（不包含基础域名），如果未找到则返回 None
+    """
+    subdomains = extract_domains_from_labels(labels, base_domain)
+    return subdomains[0] if subdomains else None
 
-    return None
+
+def label_hash(labels: dict) -> str:
+    """只对影响路由和记录策略的标签计算摘要，其他标签变化不触发重新解析"""
+    relevant = sorted(
+        (key, value) for key, value in labels.items()
+        if key == 'traefik.enable' or key.startswith(LABEL_PREFIX) or ROUTER_RULE_PATTERN.match(key)
+    )
+    return hashlib.sha1(repr(relevant).encode()).hexdigest()
+
+
+class CachedContainer:
+    """缓存的容器标签解析结果"""
+
+    __slots__ = ('name', 'label_hash', 'subdomains', 'overrides', 'announced')
+
+    def __init__(
+        self,
+        name: str,
+        label_hash: str,
+        subdomains: Tuple[str, ...],
+        overrides: Optional[dict] = None,
+        announced: bool = False
+    ):
+        self.name = name
+        self.label_hash = label_hash
+        self.subdomains = subdomains
+        # dns-manager.* 标签中的记录策略覆盖
+        self.overrides = overrides or {}
+        # 已启动并计入子域名引用计数
+        self.announced = announced
+
+
+class ContainerCache:
+    """
+    容器 ID -> CachedContainer 的 LRU 缓存
+
+    被淘汰的容器不再释放其子域名引用，对应记录保留（宁可多留不误删）
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CachedContainer]" = OrderedDict()
+
+    def get(self, container_id: str) -> Optional[CachedContainer]:
+        entry = self._entries.get(container_id)
+        if entry is not None:
+            self._entries.move_to_end(container_id)
+        return entry
+
+    def put(self, container_id: str, entry: CachedContainer):
+        self._entries[container_id] = entry
+        self._entries.move_to_end(container_id)
+        while len(self._entries) > self.maxsize:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            logger.debug(f"Evicted container {evicted.name} ({evicted_id[:12]}) from label cache")
+
+    def pop(self, container_id: str) -> Optional[CachedContainer]:
+        return self._entries.pop(container_id, None)
+
+    def __contains__(self, container_id: str) -> bool:
+        return container_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
 class DockerMonitor:
     """Docker 容器事件监听器"""
 
-    def __init__(self, domain: str, on_container_start: Callable[[str, str], None]):
+    def __init__(
+        self,
+        domain: str,
+        on_container_start: Callable[[str, str], None],
+        base_url: Optional[str] = None,
+        host_name: str = "local",
+        on_host_removed: Optional[Callable[[str, str], None]] = None,
+        cache_size: int = 4096
+    ):
         """
         初始化 Docker 监听器
 
         Args:
             domain: 基础域名
             on_container_start: 容器启动回调函数 (subdomain, container_name) -> None
+            base_url: Docker daemon 地址(unix://、tcp://、ssh://),None 表示使用环境变量配置
+            host_name: 主机名称,用于日志区分
+            on_host_removed: 子域名不再被本主机任何容器使用时的回调 (subdomain, container_name) -> None
+            cache_size: 容器标签缓存的容量
         """
         self.domain = domain
         self.on_container_start = on_container_start
-        self.client = docker.from_env()
-        logger.info("Docker monitor initialized")
+        self.on_host_removed = on_host_removed
+
+        # 标签缓存和子域名引用计数: 同一服务的多个副本、重建时新旧容器短暂共存都只算一个子域名
+        self.containers = ContainerCache(cache_size)
+        self._host_refs: Counter = Counter()
+        # 子域名 -> 最近启动的容器上的策略覆盖
+        self._host_overrides: Dict[str, dict] = {}
+        self._cache_lock = threading.Lock()
+
+        # 事件流状态，供健康探测读取
+        self.stream_connected = False
+        self.last_event_at = None
+        self.last_event_lag = None
+        self.host_name = host_name
+        self.client = self._create_client(base_url)
+        logger.info(f"Docker monitor initialized for host {host_name}")
+
+    def _create_client(self, base_url: Optional[str]) -> docker.DockerClient:
+        """
+        创建 Docker 客户端
+
+        tcp:// 地址在设置 DOCKER_CERT_PATH 时启用 TLS,优先使用
+        $DOCKER_CERT_PATH/<host_name>/ 下的证书;ssh:// 地址使用系统 ssh 客户端
+        """
+        if not base_url:
+            return docker.from_env()
+
+        if base_url.startswith('ssh://'):
+            return docker.DockerClient(base_url=base_url, use_ssh_client=True)
+
+        tls = None
+        cert_path = os.getenv('DOCKER_CERT_PATH')
+        if base_url.startswith('tcp://') and cert_path:
+            host_cert_path = os.path.join(cert_path, self.host_name)
+            if os.path.isdir(host_cert_path):
+                cert_path = host_cert_path
+            tls = docker.tls.TLSConfig(
+                client_cert=(os.path.join(cert_path, 'cert.pem'), os.path.join(cert_path, 'key.pem')),
+                ca_cert=os.path.join(cert_path, 'ca.pem'),
+                verify=True
+            )
+
+        return docker.DockerClient(base_url=base_url, tls=tls)
+
+    def iter_traefik_containers(self, with_id: bool = False) -> Iterator[tuple]:
+        """
+        遍历启用了 Traefik 的运行中容器
+
+        过滤条件下推到 Docker daemon,并直接使用列表接口返回的精简数据
+        (已包含标签),不再逐个 inspect 容器。列表接口不支持分页,
+        过滤后的结果一次性读入内存;生成器只省去构造 Container 对象,并非流式读取
+
+        Yields:
+            (容器名称, 标签字典)，with_id 时为 (容器 ID, 容器名称, 标签字典)
+        """
+        summaries = self.client.api.containers(filters={'label': 'traefik.enable=true'})
+
+        for summary in summaries:
+            names = summary.get('Names') or []
+            container_id = summary.get('Id', '')
+            name = names[0].lstrip('/') if names else container_id[:12]
+            labels = summary.get('Labels') or {}
+            yield (container_id, name, labels) if with_id else (name, labels)
+
+    def collect_existing_containers(self) -> List[Tuple[str, str]]:
+        """
+        列出现有容器对应的子域名（只访问 Docker，不触发回调）
+
+        结果同时写入标签缓存，之后这些容器重启时不再重复处理
+
+        Returns:
+            [(subdomain, container_name)]
+        """
+        found = []
+        total = 0
+        for container_id, name, labels in self.iter_traefik_containers(with_id=True):
+            total += 1
+            self._observe(container_id, name, labels, announce=True)
+            for subdomain in extract_domains_from_labels(labels, self.domain):
+                logger.info(f"Found existing container: {name} -> {subdomain}.{self.domain}")
+                found.append((subdomain, name))
+        logger.info(f"Found {total} running containers with Traefik enabled")
+        return found
 
     def scan_existing_containers(self):
         """扫描所有现有容器"""
         logger.info("Scanning existing containers...")
 
         try:
-            containers = self.client.containers.list()
-            logger.info(f"Found {len(containers)} running containers")
-
-            for container in containers:
-                subdomain = extract_domain_from_labels(container.labels, self.domain)
-                if subdomain:
-                    logger.info(f"Found existing container: {container.name} -> {subdomain}.{self.domain}")
-                    self.on_container_start(subdomain, container.name)
+            for subdomain, name in self.collect_existing_containers():
+                self.on_container_start(subdomain, name)
         except Exception as e:
             logger.error(f"Failed to scan containers: {e}")
 
-    def listen(self):
+    def open_event_stream(self):
+        """
+        建立 Docker 事件流
+
+        请求在调用时即发出，返回后 daemon 已开始为该连接缓冲事件，
+        之后再扫描现有容器不会遗漏扫描期间启动的容器
+        """
+        return self.client.events(decode=True, filters={'type': 'container', 'event': CONTAINER_EVENTS})
+
+    def listen(self, stream=None):
         """
         监听 Docker 事件
         阻塞调用，持续运行
+
+        Args:
+            stream: 已通过 open_event_stream 建立的事件流，None 时新建
         """
-        logger.info("Starting Docker event listener...")
+        logger.info(f"Starting Docker event listener for host {self.host_name}...")
 
         try:
-            # 监听容器启动事件
-            for event in self.client.events(decode=True, filters={'type': 'container', 'event': 'start'}):
+            if stream is None:
+                stream = self.open_event_stream()
+
+            self.stream_connected = True
+            # 监听容器创建、启动、重命名和删除事件
+            for event in stream:
+                self._record_lag(event)
                 self._handle_event(event)
         except Exception as e:
             logger.error(f"Docker event listener error: {e}")
             raise
+        finally:
+            self.stream_connected = False
+
+    def _record_lag(self, event: dict):
+        """记录事件从 daemon 产生到开始处理的延迟，处理积压时该值持续增大"""
+        now = time.time()
+        self.last_event_at = now
+        time_nano = event.get('timeNano')
+        if time_nano:
+            # 远程主机时钟偏差也会体现在该值中
+            self.last_event_lag = now - time_nano / 1e9
+
+    def event_stream_status(self) -> dict:
+        """事件流状态"""
+        return {
+            'connected': self.stream_connected,
+            'last_event_age': round(time.time() - self.last_event_at, 3) if self.last_event_at else None,
+            'lag_seconds': round(self.last_event_lag, 3) if self.last_event_lag is not None else None
+        }
+
+    def holds(self, subdomain: str) -> bool:
+        """本主机是否仍有已启动的容器使用该子域名"""
+        with self._cache_lock:
+            return self._host_refs[subdomain] > 0
+
+    def overrides(self, subdomain: str) -> dict:
+        """使用该子域名的容器标签中的策略覆盖"""
+        with self._cache_lock:
+            return self._host_overrides.get(subdomain, {})
+
+    def _observe(self, container_id: str, name: str, labels: dict, announce: bool) -> Tuple[List[str], List[str]]:
+        """
+        更新容器的缓存条目，并按子域名差异调整引用计数
+
+        标签哈希未变且已计入引用时直接返回，不解析标签、不触发任何回调
+
+        Args:
+            announce: 容器已启动，其子域名计入引用计数
+
+        Returns:
+            (需要处理的子域名: 新出现或策略覆盖变化, 引用计数归零的子域名)
+        """
+        digest = label_hash(labels)
+        with self._cache_lock:
+            cached = self.containers.get(container_id)
+            if cached and cached.label_hash == digest and (cached.announced or not announce):
+                cached.name = name
+                return [], []
+
+            if cached and cached.label_hash == digest:
+                subdomains, overrides = cached.subdomains, cached.overrides
+            else:
+                subdomains = tuple(extract_domains_from_labels(labels, self.domain))
+                overrides = overrides_from_labels(labels)
+            announced = announce or bool(cached and cached.announced)
+            previous = set(cached.subdomains) if cached and cached.announced else set()
+            self.containers.put(container_id, CachedContainer(name, digest, subdomains, overrides, announced))
+
+            current = set(subdomains) if announced else set()
+            added = self._acquire(current - previous)
+            removed = self._release(previous - current)
+
+            # 重建后子域名不变但策略标签变化的容器同样需要处理
+            for subdomain in sorted(current):
+                if self._host_overrides.get(subdomain, {}) != overrides:
+                    if overrides:
+                        self._host_overrides[subdomain] = overrides
+                    else:
+                        self._host_overrides.pop(subdomain, None)
+                    if subdomain not in added:
+                        added.append(subdomain)
+            return added, removed
+
+    def _forget(self, container_id: str) -> List[str]:
+        """删除容器的缓存条目并释放其子域名"""
+        with self._cache_lock:
+            cached = self.containers.pop(container_id)
+            if not cached or not cached.announced:
+                return []
+            return self._release(set(cached.subdomains))
+
+    def _acquire(self, subdomains: set) -> List[str]:
+        added = []
+        for subdomain in sorted(subdomains):
+            self._host_refs[subdomain] += 1
+            if self._host_refs[subdomain] == 1:
+                added.append(subdomain)
+        return added
+
+    def _release(self, subdomains: set) -> List[str]:
+        removed = []
+        for subdomain in sorted(subdomains):
+            self._host_refs[subdomain] -= 1
+            if self._host_refs[subdomain] <= 0:
+                del self._host_refs[subdomain]
+                self._host_overrides.pop(subdomain, None)
+                removed.append(subdomain)
+        return removed
 
     def _handle_event(self, event: dict):
-        """处理单个 Docker 事件"""
-        try:
-            # 检查是否启用 Traefik
-            if event.get('Actor', {}).get('Attributes', {}).get('traefik.enable') != 'true':
-                return
+        """
+        处理单个 Docker 事件
 
-            container_id = event.get('Actor', {}).get('ID')
+        标签直接取自事件属性（Docker 会附带容器的全部标签），不再逐个 inspect 容器；
+        只有标签哈希变化或首次启动的容器才会解析标签并比较子域名
+        """
+        try:
+            actor = event.get('Actor', {})
+            container_id = actor.get('ID') or event.get('id')
             if not container_id:
                 logger.debug("Event missing container ID, skipping")
                 return
 
-            container = self.client.containers.get(container_id)
+            action = event.get('Action') or event.get('status')
+            attributes = actor.get('Attributes', {})
+            name = attributes.get('name', container_id[:12])
+
+            if action == 'destroy':
+                added, removed = [], self._forget(container_id)
+            else:
+                # 未启用 Traefik 且从未缓存过的容器不占用缓存
+                with self._cache_lock:
+                    cached = container_id in self.containers
+                if attributes.get('traefik.enable') != 'true' and not cached:
+                    return
+                labels = {k: v for k, v in attributes.items() if k != 'name'}
+                added, removed = self._observe(container_id, name, labels, announce=(action == 'start'))
 
-            subdomain = extract_domain_from_labels(container.labels, self.domain)
-            if subdomain:
-                logger.info(f"Container started: {container.name} -> {subdomain}.{self.domain}")
-                self.on_container_start(subdomain, container.name)
+            for subdomain in added:
+                logger.info(f"Container started: {name} -> {subdomain}.{self.domain}")
+                self.on_container_start(subdomain, name)
+            for subdomain in removed:
+                logger.info(f"Container {name} no longer routes {subdomain}.{self.domain} ({action})")
+                if self.on_host_removed:
+                    self.on_host_removed(subdomain, name)
         except Exception as e:
             logger.error(f"Failed to handle container event: {e}")
@@ -0,0 +1,285 @@
+import os
+import errno
+import ctypes
+import select
+import struct
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from utils import extract_hosts_from_rule, subdomain_for_host
+
+
+logger = logging.getLogger("dns-manager")
+
+CONFIG_SUFFIXES = ('.yml', '.yaml')
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def extract_routers(config: dict) -> Iterator[Tuple[str, str]]:
+    """
+    遍历动态配置中的 HTTP 路由
+
+    Yields:
+        (路由名称, 规则)
+    """
+    routers = ((config or {}).get('http') or {}).get('routers') or {}
+    for name, router in routers.items():
+        if isinstance(router, dict) and isinstance(router.get('rule'), str):
+            yield name, router['rule']
+
+
+class Inotify:
+    """基于 ctypes 的最小 inotify 封装，只监听单个目录"""
+
+    def __init__(self, path: str, mask: int = WATCH_MASK):
+        # CDLL(None) 解析到进程已加载的 libc，glibc 和 musl（alpine）均可用
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err), path)
+
+    def read(self, timeout: float) -> List[Tuple[int, str]]:
+        """
+        等待并读取事件
+
+        Returns:
+            [(mask, 文件名)]，超时为空列表
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        events, offset = [], 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TraefikFileWatcher:
+    """
+    Traefik file provider 动态配置监听器
+
+    目录中每个文件单独解析并缓存其路由域名，文件变化时只重新解析该文件，
+    新出现的域名通过与容器事件相同的回调进入 DNS 记录流程。
+    Linux 下使用 inotify，不可用时退化为按修改时间轮询。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        domain: str,
+        on_host: Callable[[str, str], None],
+        poll_interval: float = 5.0
+    ):
+        """
+        Args:
+            directory: 动态配置目录（Traefik providers.file.directory）
+            domain: 基础域名
+            on_host: 回调函数 (subdomain, source) -> None，source 形如 file:middlewares.yml/router
+            poll_interval: inotify 不可用时的轮询间隔（秒）
+        """
+        self.directory = directory
+        self.domain = domain
+        self.on_host = on_host
+        self.poll_interval = poll_interval
+
+        # 文件名 -> ((mtime_ns, size), {subdomain: source})
+        self._files: Dict[str, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+        # 启动扫描与 inotify 线程可能同时解析同一文件，串行化避免重复回调
+        self._reparse_lock = threading.RLock()
+        self._stop = threading.Event()
+
+    def hosts(self) -> List[Tuple[str, str]]:
+        """当前所有文件中的 [(subdomain, source)]，用于全量同步"""
+        with self._lock:
+            return [item for _, hosts in self._files.values() for item in hosts.items()]
+
+    def _parse(self, path: str) -> Dict[str, str]:
+        with open(path) as f:
+            config = yaml.safe_load(f)
+
+        hosts = {}
+        name = os.path.basename(path)
+        for router, rule in extract_routers(config):
+            for host in extract_hosts_from_rule(rule):
+                subdomain = subdomain_for_host(host, self.domain)
+                if subdomain:
+                    hosts.setdefault(subdomain, f"file:{name}/{router}")
+        return hosts
+
+    def reparse(self, name: str, force: bool = False) -> List[Tuple[str, str]]:
+        """
+        重新解析单个文件，未变化（mtime 和大小相同）时跳过
+
+        Returns:
+            新出现的 [(subdomain, source)]
+        """
+        if not name.endswith(CONFIG_SUFFIXES) or name.startswith('.'):
+            return []
+
+        with self._reparse_lock:
+            return self._reparse(name, force)
+
+    def _reparse(self, name: str, force: bool) -> List[Tuple[str, str]]:
+        path = os.path.join(self.directory, name)
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                removed = self._files.pop(name, None)
+            if removed:
+                logger.info(f"Traefik dynamic config {name} removed, {len(removed[1])} hosts no longer watched")
+            return []
+
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._files.get(name)
+        if cached and cached[0] == signature and not force:
+            return []
+
+        try:
+            hosts = self._parse(path)
+        except (OSError, yaml.YAMLError) as e:
+            # 与 Traefik 一致：文件无效时保留上一次的结果
+            logger.error(f"Failed to parse Traefik dynamic config {name}: {e}")
+            return []
+
+        with self._lock:
+            previous = self._files.get(name, (None, {}))[1]
+            self._files[name] = (signature, hosts)
+            known = {subdomain for other, (_, h) in self._files.items() if other != name for subdomain in h}
+
+        added = [(s, src) for s, src in hosts.items() if s not in previous and s not in known]
+        logger.debug(f"Parsed Traefik dynamic config {name}: {len(hosts)} hosts, {len(added)} new")
+        return added
+
+    def scan(self) -> List[Tuple[str, str]]:
+        """
+        扫描整个目录，只解析有变化的文件
+
+        Returns:
+            新出现的 [(subdomain, source)]
+        """
+        try:
+            names = set(os.listdir(self.directory))
+        except OSError as e:
+            logger.error(f"Failed to list Traefik dynamic config directory {self.directory}: {e}")
+            return []
+
+        with self._lock:
+            names |= set(self._files)
+
+        added = []
+        for name in sorted(names):
+            added.extend(self.reparse(name))
+        return added
+
+    def dispatch(self, hosts: List[Tuple[str, str]]):
+        for subdomain, source in hosts:
+            logger.info(f"Found host in Traefik dynamic config: {source} -> {subdomain}.{self.domain}")
+            try:
+                self.on_host(subdomain, source)
+            except Exception as e:
+                logger.error(f"Failed to handle host {subdomain} from {source}: {e}")
+
+    def watch(self):
+        """
+        监听目录变化（阻塞，直到 stop）
+
+        先建立监听再补扫一次，监听建立前发生的修改不会遗漏
+        """
+        try:
+            inotify = Inotify(self.directory)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable for {self.directory} ({e}), polling every {self.poll_interval}s")
+            self._poll()
+            return
+
+        logger.info(f"Watching Traefik dynamic config directory {self.directory}")
+        try:
+            self.dispatch(self.scan())
+            while not self._stop.is_set():
+                events = inotify.read(timeout=1.0)
+                if not events:
+                    continue
+
+                # 编辑器保存时通常产生多个事件，同一批次中每个文件只解析一次
+                if any(mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF) for mask, _ in events):
+                    added = self.scan()
+                else:
+                    added = []
+                    for name in sorted({name for _, name in events if name}):
+                        added.extend(self.reparse(name))
+                self.dispatch(added)
+
+                if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF) for mask, _ in events):
+                    logger.warning(f"Traefik dynamic config directory {self.directory} was replaced, falling back to polling")
+                    self._poll()
+                    return
+        finally:
+            inotify.close()
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self.dispatch(self.scan())
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_file_watcher(domain: str, on_host: Callable[[str, str], None]) -> Optional[TraefikFileWatcher]:
+    """
+    根据环境变量创建 file provider 监听器，未配置 TRAEFIK_DYNAMIC_DIR 时返回 None
+
+    环境变量:
+        TRAEFIK_DYNAMIC_DIR: Traefik 动态配置目录（挂载到 dns-manager 容器内的路径）
+        TRAEFIK_DYNAMIC_POLL_INTERVAL: inotify 不可用时的轮询间隔（秒，默认 5）
+    """
+    directory = os.getenv("TRAEFIK_DYNAMIC_DIR")
+    if not directory:
+        return None
+    return TraefikFileWatcher(
+        directory,
+        domain,
+        on_host,
+        poll_interval=float(os.getenv("TRAEFIK_DYNAMIC_POLL_INTERVAL", "5"))
+    )
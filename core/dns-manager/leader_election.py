@@ -0,0 +1,263 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from typing import Callable, Optional
+
+
+logger = logging.getLogger("dns-manager")
+
+
+class LeaseBackend:
+    """租约存储后端接口"""
+
+    def try_acquire(self, holder: str, ttl: float) -> bool:
+        """
+        获取或续约租约
+
+        Args:
+            holder: 持有者 ID
+            ttl: 租约有效期（秒）
+
+        Returns:
+            True 如果当前由 holder 持有
+        """
+        raise NotImplementedError
+
+    def release(self, holder: str):
+        """释放租约（仅当由 holder 持有时）"""
+        raise NotImplementedError
+
+
+class FileLockBackend(LeaseBackend):
+    """
+    基于 flock 的文件锁
+
+    进程退出或崩溃时由内核立即释放，适合同一主机（或共享本地卷）上的副本
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self, holder: str, ttl: float) -> bool:
+        import fcntl
+
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, holder.encode('utf-8'))
+        self._fd = fd
+        return True
+
+    def release(self, holder: str):
+        import fcntl
+
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """基于 SQLite 的租约表，过期后其他副本可以接管"""
+
+    def __init__(self, path: str, name: str = "dns-manager"):
+        self.path = path
+        self.name = name
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lease ("
+                "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+
+    def try_acquire(self, holder: str, ttl: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            # 租约空闲、已过期或本就由自己持有时才写入
+            conn.execute(
+                "INSERT INTO lease (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE lease.holder = excluded.holder OR lease.expires_at < ?",
+                (self.name, holder, now + ttl, now)
+            )
+            row = conn.execute("SELECT holder FROM lease WHERE name = ?", (self.name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release(self, holder: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM lease WHERE name = ? AND holder = ?", (self.name, holder))
+
+
+class RedisLeaseBackend(LeaseBackend):
+    """
+    基于 Redis 的租约
+
+    client 需要提供 redis-py 的 set(name, value, nx=, px=) 和 eval(script, numkeys, *args)
+    """
+
+    # 仅当值仍为自己时续约 / 删除
+    RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, client, key: str = "dns-manager:leader"):
+        self.client = client
+        self.key = key
+
+    @classmethod
+    def from_url(cls, url: str, key: str = "dns-manager:leader") -> "RedisLeaseBackend":
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("LEADER_ELECTION=redis requires the 'redis' package")
+        return cls(redis.Redis.from_url(url, socket_timeout=1.0), key)
+
+    def try_acquire(self, holder: str, ttl: float) -> bool:
+        ttl_ms = int(ttl * 1000)
+        if self.client.eval(self.RENEW_SCRIPT, 1, self.key, holder, ttl_ms):
+            return True
+        return bool(self.client.set(self.key, holder, nx=True, px=ttl_ms))
+
+    def release(self, holder: str):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.key, holder)
+
+
+class LeaderElector:
+    """
+    租约式选主
+
+    后台线程每 renew_interval 秒获取或续约一次租约，角色变化时触发回调。
+    续约失败（如后端不可达）超过 ttl 后本地也视为失去领导权，避免双主写入。
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        holder: Optional[str] = None,
+        ttl: float = 2.0,
+        renew_interval: Optional[float] = None,
+        on_elected: Optional[Callable[[], None]] = None,
+        on_revoked: Optional[Callable[[], None]] = None
+    ):
+        self.backend = backend
+        self.holder = holder or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.renew_interval = renew_interval or ttl / 4
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self._leader = False
+        self._renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader and time.monotonic() - self._renewed_at < self.ttl
+
+    def step(self):
+        """执行一次获取/续约，并处理角色变化"""
+        # 租约在后端从请求发出前后的某一时刻开始计时，本地以发出前的时间为准，
+        # 后端调用耗时较长时本地租约提前过期，而不是晚于后端
+        requested_at = time.monotonic()
+        try:
+            acquired = self.backend.try_acquire(self.holder, self.ttl)
+        except Exception as e:
+            logger.warning(f"Leader lease renewal failed: {e}")
+            acquired = False
+
+        was_leader = self._leader
+        if acquired:
+            self._renewed_at = requested_at
+            self._leader = True
+        # 后端调用耗时超过 ttl 时，即使获取成功本地租约也已过期
+        self._leader = self.is_leader
+
+        if self._leader and not was_leader:
+            logger.info(f"Acquired leadership as {self.holder}")
+            if self.on_elected:
+                self.on_elected()
+        elif was_leader and not self._leader:
+            logger.warning(f"Lost leadership as {self.holder}")
+            if self.on_revoked:
+                self.on_revoked()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.step()
+            self._stop.wait(self.renew_interval)
+
+    def start(self):
+        """启动后台选主线程"""
+        self.step()
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止选主并主动释放租约，使其他副本立即接管"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.renew_interval * 2)
+        if self._leader:
+            try:
+                self.backend.release(self.holder)
+            except Exception as e:
+                logger.warning(f"Failed to release leader lease: {e}")
+            self._leader = False
+
+
+def create_elector(
+    mode: Optional[str],
+    on_elected: Optional[Callable[[], None]] = None,
+    on_revoked: Optional[Callable[[], None]] = None
+) -> Optional[LeaderElector]:
+    """
+    根据环境变量创建选主器
+
+    Args:
+        mode: none / file / sqlite / redis，未配置或 none 时返回 None（单实例，始终写入）
+
+    环境变量:
+        LEADER_LOCK_PATH: file/sqlite 模式的锁文件路径
+        LEADER_REDIS_URL: redis 模式的连接地址
+        LEADER_ID: 持有者 ID，默认 hostname-pid
+        LEADER_LEASE_TTL: 租约有效期（秒，默认 2）
+    """
+    mode = (mode or "none").lower()
+    if mode == "none":
+        return None
+
+    if mode == "file":
+        backend = FileLockBackend(os.getenv("LEADER_LOCK_PATH", "/var/lib/dns-manager/leader.lock"))
+    elif mode == "sqlite":
+        backend = SQLiteLeaseBackend(os.getenv("LEADER_LOCK_PATH", "/var/lib/dns-manager/leader.db"))
+    elif mode == "redis":
+        backend = RedisLeaseBackend.from_url(os.getenv("LEADER_REDIS_URL", "redis://redis:6379/0"))
+    else:
+        raise ValueError(f"Unknown LEADER_ELECTION mode: {mode}")
+
+    return LeaderElector(
+        backend,
+        holder=os.getenv("LEADER_ID") or None,
+        ttl=float(os.getenv("LEADER_LEASE_TTL", "2")),
+        on_elected=on_elected,
+        on_revoked=on_revoked
+    )
@@ -0,0 +1,327 @@
+"""
+DNS 记录策略（proxied / TTL）
+
+规则定义在 YAML 文件中，按出现顺序第一条匹配的规则生效，未指定的字段取 default:
+
+    default:
+      ttl: 300
+      proxied: false
+    rules:
+      - match: "*.apps.example.com"      # glob，匹配完整域名
+        proxied: true
+      - match: "api-?.example.com"
+        ttl: 60
+      - regex: "^acme-.*\\.example\\.com$"
+        proxied: false
+
+glob 中单独的 * 标签（如 *.example.com）匹配一级或多级子域名，其他通配符只在单个标签内匹配。
+容器标签 dns-manager.proxied / dns-manager.ttl 优先于规则。
+
+规则在加载时编译一次: glob 按域名标签从右到左编入后缀树，查询只沿域名标签走一遍；
+regex 各自编译（不合并，规则中的命名分组和反向引用互不影响），按规则顺序匹配，
+序号已大于 glob 命中的规则时不再尝试。
+代理记录的 TTL 由 Cloudflare 固定为自动（1）。
+"""
+
+import os
+import re
+import logging
+import threading
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+
+logger = logging.getLogger("dns-manager")
+
+LABEL_PREFIX = "dns-manager."
+DEFAULT_TTL = 300
+# Cloudflare 中 TTL 为 1 表示自动，代理记录始终为 1
+AUTO_TTL = 1
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+class PolicyError(ValueError):
+    """策略配置无效"""
+
+
+class RecordPolicy:
+    """单条记录的策略"""
+
+    __slots__ = ('ttl', 'proxied', 'source')
+
+    def __init__(self, ttl: int = DEFAULT_TTL, proxied: bool = False, source: str = "default"):
+        self.proxied = proxied
+        self.ttl = AUTO_TTL if proxied else ttl
+        self.source = source
+
+    def differs(self, record: dict) -> bool:
+        """记录的 TTL 或代理状态与策略不一致"""
+        return record.get('ttl') != self.ttl or bool(record.get('proxied')) != self.proxied
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RecordPolicy) and (self.ttl, self.proxied) == (other.ttl, other.proxied)
+
+    def __repr__(self) -> str:
+        return f"RecordPolicy(ttl={self.ttl}, proxied={self.proxied}, source={self.source!r})"
+
+
+def _parse_ttl(value, where: str) -> int:
+    try:
+        ttl = int(value)
+    except (TypeError, ValueError):
+        raise PolicyError(f"{where}: invalid ttl {value!r}")
+    if ttl != AUTO_TTL and not 30 <= ttl <= 86400:
+        raise PolicyError(f"{where}: ttl must be 1 (auto) or between 30 and 86400")
+    return ttl
+
+
+def _parse_bool(value, where: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('true', '1', 'yes'):
+        return True
+    if str(value).lower() in ('false', '0', 'no'):
+        return False
+    raise PolicyError(f"{where}: invalid proxied {value!r}")
+
+
+def overrides_from_labels(labels: dict) -> dict:
+    """
+    从容器标签中读取策略覆盖
+
+    Returns:
+        {'ttl': ..., 'proxied': ...} 中出现的字段，标签值无效时忽略该字段
+    """
+    overrides = {}
+    for field, parse in (('ttl', _parse_ttl), ('proxied', _parse_bool)):
+        value = labels.get(LABEL_PREFIX + field)
+        if value is None:
+            continue
+        try:
+            overrides[field] = parse(value, f"label {LABEL_PREFIX}{field}")
+        except PolicyError as e:
+            logger.warning(str(e))
+    return overrides
+
+
+class _TrieNode:
+    __slots__ = ('children', 'patterns', 'exact', 'wildcard')
+
+    def __init__(self):
+        # 字面标签 -> 子节点
+        self.children: Dict[str, "_TrieNode"] = {}
+        # 含通配符的标签 -> 子节点
+        self.patterns: Dict[str, "_TrieNode"] = {}
+        # 在此结束的规则序号
+        self.exact: Optional[int] = None
+        # 单独的 * 标签: 匹配剩余的一级或多级标签
+        self.wildcard: Optional[int] = None
+
+
+class PolicyEngine:
+    """编译后的策略规则"""
+
+    def __init__(self, default: Optional[RecordPolicy] = None, rules: Optional[List[dict]] = None):
+        """
+        Args:
+            default: 未匹配任何规则时的策略
+            rules: 规则列表，每条包含 match（glob）或 regex 之一，以及 ttl / proxied
+        """
+        self.default = default or RecordPolicy()
+        self.rules: List[RecordPolicy] = []
+        self._root = _TrieNode()
+        self._regexes: List[Tuple[int, "re.Pattern"]] = []
+
+        for index, rule in enumerate(rules or []):
+            where = f"rule {index + 1}"
+            if not isinstance(rule, dict) or ('match' in rule) == ('regex' in rule):
+                raise PolicyError(f"{where}: exactly one of 'match' or 'regex' is required")
+
+            proxied = _parse_bool(rule['proxied'], where) if 'proxied' in rule else self.default.proxied
+            ttl = _parse_ttl(rule['ttl'], where) if 'ttl' in rule else self.default.ttl
+            pattern = rule.get('match') or rule.get('regex')
+            self.rules.append(RecordPolicy(ttl, proxied, source=f"{where}: {pattern}"))
+
+            if 'match' in rule:
+                self._insert(str(rule['match']).lower().rstrip('.'), index)
+            else:
+                try:
+                    self._regexes.append((index, re.compile(rule['regex'], re.IGNORECASE)))
+                except (re.error, TypeError) as e:
+                    raise PolicyError(f"{where}: invalid regex: {e}")
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "PolicyEngine":
+        config = config or {}
+        if not isinstance(config, dict):
+            raise PolicyError("policy file must be a mapping")
+        default = config.get('default') or {}
+        proxied = _parse_bool(default.get('proxied', False), "default")
+        ttl = _parse_ttl(default.get('ttl', DEFAULT_TTL), "default")
+        return cls(RecordPolicy(ttl, proxied), config.get('rules') or [])
+
+    @classmethod
+    def load(cls, path: str) -> "PolicyEngine":
+        with open(path) as f:
+            try:
+                return cls.from_config(yaml.safe_load(f))
+            except yaml.YAMLError as e:
+                raise PolicyError(f"invalid YAML: {e}")
+
+    def _insert(self, pattern: str, index: int):
+        labels = pattern.split('.')
+        node = self._root
+        for position, label in enumerate(reversed(labels)):
+            if label == '*' and position == len(labels) - 1:
+                if node.wildcard is None:
+                    node.wildcard = index
+                return
+            table = node.patterns if GLOB_CHARS.search(label) else node.children
+            node = table.setdefault(label, _TrieNode())
+        if node.exact is None:
+            node.exact = index
+
+    def _lookup(self, node: _TrieNode, labels: List[str], position: int, best: Optional[int]) -> Optional[int]:
+        """沿后缀树匹配，返回命中的最小规则序号"""
+        if position < len(labels) and node.wildcard is not None:
+            best = node.wildcard if best is None else min(best, node.wildcard)
+        if position == len(labels):
+            if node.exact is not None:
+                best = node.exact if best is None else min(best, node.exact)
+            return best
+
+        label = labels[position]
+        child = node.children.get(label)
+        if child is not None:
+            best = self._lookup(child, labels, position + 1, best)
+        for pattern, child in node.patterns.items():
+            if fnmatchcase(label, pattern):
+                best = self._lookup(child, labels, position + 1, best)
+        return best
+
+    def match(self, hostname: str) -> Optional[int]:
+        """第一条匹配的规则序号，未匹配时为 None"""
+        hostname = hostname.lower().rstrip('.')
+        best = self._lookup(self._root, hostname.split('.')[::-1], 0, None)
+        for index, pattern in self._regexes:
+            if best is not None and index > best:
+                break
+            if pattern.fullmatch(hostname):
+                return index
+        return best
+
+    def evaluate(self, hostname: str, overrides: Optional[dict] = None) -> RecordPolicy:
+        """
+        计算域名的策略
+
+        Args:
+            hostname: 完整域名
+            overrides: 容器标签中的覆盖字段（见 overrides_from_labels）
+        """
+        index = self.match(hostname)
+        policy = self.rules[index] if index is not None else self.default
+        if not overrides:
+            return policy
+        return RecordPolicy(
+            overrides.get('ttl', policy.ttl),
+            overrides.get('proxied', policy.proxied),
+            source=f"labels over {policy.source}"
+        )
+
+
+class PolicyWatcher:
+    """
+    策略文件热加载
+
+    按修改时间和大小轮询文件，变化后重新编译；文件无效时保留上一次的规则
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Optional[Callable[[PolicyEngine], None]] = None,
+        poll_interval: float = 5.0
+    ):
+        """
+        Args:
+            path: 策略文件路径
+            on_change: 规则变化后的回调 (engine) -> None
+            poll_interval: 检查间隔（秒）
+        """
+        self.path = path
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.engine = PolicyEngine()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        if not os.path.exists(path):
+            # 通常是卷未挂载或路径写错，文件出现后仍会自动加载
+            logger.warning(f"Policy file {path} does not exist, using the default policy until it is created")
+        self.reload()
+
+    def reload(self) -> bool:
+        """
+        文件有变化时重新加载
+
+        Returns:
+            True 如果加载了新规则
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._signature is not None:
+                logger.warning(f"Policy file {self.path} removed, keeping the current rules")
+            return False
+
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+
+        try:
+            engine = PolicyEngine.load(self.path)
+        except (OSError, PolicyError) as e:
+            logger.error(f"Failed to load policy file {self.path}: {e}")
+            return False
+
+        self.engine = engine
+        logger.info(f"Loaded {len(engine.rules)} DNS policy rules from {self.path}")
+        return True
+
+    def watch(self):
+        """轮询策略文件（阻塞，直到 stop）"""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                changed = self.reload()
+            except Exception as e:
+                # 意外错误不应使热加载线程退出
+                logger.error(f"Failed to reload policy file {self.path}: {e}")
+                continue
+            if changed and self.on_change:
+                try:
+                    self.on_change(self.engine)
+                except Exception as e:
+                    logger.error(f"Failed to apply policy change: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_policy_watcher(on_change: Callable[[PolicyEngine], None]) -> Optional[PolicyWatcher]:
+    """
+    根据环境变量创建策略热加载器，未配置 DNS_POLICY_FILE 时返回 None
+
+    环境变量:
+        DNS_POLICY_FILE: 策略文件路径
+        DNS_POLICY_RELOAD_INTERVAL: 检查文件变化的间隔（秒，默认 5）
+    """
+    path = os.getenv("DNS_POLICY_FILE")
+    if not path:
+        return None
+    return PolicyWatcher(
+        path,
+        on_change=on_change,
+        poll_interval=float(os.getenv("DNS_POLICY_RELOAD_INTERVAL", "5"))
+    )
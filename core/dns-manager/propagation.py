@@ -0,0 +1,290 @@
+import os
+import time
+import random
+import socket
+import struct
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+
+logger = logging.getLogger("dns-manager")
+
+TYPE_A = 1
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+Resolver = Tuple[str, int]
+
+
+def parse_resolvers(spec: Optional[str]) -> List[Resolver]:
+    """
+    解析 DNS_VERIFY_RESOLVERS
+
+    格式: 逗号分隔的 host[:port]，端口默认 53，例如
+        1.1.1.1,8.8.8.8,127.0.0.1:5353
+    """
+    resolvers = []
+    for entry in (spec or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, sep, port = entry.rpartition(":")
+        if not sep:
+            host, port = entry, "53"
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid resolver: {entry}")
+        resolvers.append((host, int(port)))
+    return resolvers
+
+
+def build_query(name: str, txid: int, qtype: int = TYPE_A) -> bytes:
+    """构造递归查询报文"""
+    header = struct.pack(">HHHHHH", txid, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(
+        bytes([len(label)]) + label.encode("idna")
+        for label in name.rstrip(".").split(".")
+    )
+    return header + labels + b"\x00" + struct.pack(">HH", qtype, CLASS_IN)
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += 1 + length
+
+
+def parse_response(data: bytes, txid: int) -> Optional[List[str]]:
+    """
+    解析应答中的 A 记录
+
+    Returns:
+        IPv4 地址列表（NXDOMAIN 或无 A 记录时为空列表）；
+        事务 ID 不匹配或不是应答时为 None
+    """
+    if len(data) < 12:
+        return None
+    rid, flags, qdcount, ancount, _, _ = struct.unpack(">HHHHHH", data[:12])
+    if rid != txid or not flags & 0x8000:
+        return None
+    if flags & 0x000F == RCODE_NXDOMAIN:
+        return []
+
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+
+    addresses = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, rclass, _, rdlength = struct.unpack(">HHIH", data[offset:offset + 10])
+        offset += 10
+        if rtype == TYPE_A and rclass == CLASS_IN and rdlength == 4:
+            addresses.append(socket.inet_ntoa(data[offset:offset + 4]))
+        offset += rdlength
+    return addresses
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, txid: int, future: asyncio.Future):
+        self.txid = txid
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if self.future.done():
+            return
+        try:
+            addresses = parse_response(data, self.txid)
+        except (IndexError, struct.error) as e:
+            self.future.set_exception(ValueError(f"Malformed DNS response: {e}"))
+            return
+        # 不匹配的报文直接忽略，继续等待
+        if addresses is not None:
+            self.future.set_result(addresses)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def query_a(resolver: Resolver, name: str, timeout: float = 2.0) -> List[str]:
+    """向单个解析器发出 A 查询"""
+    loop = asyncio.get_running_loop()
+    txid = random.randint(0, 0xFFFF)
+    future = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _QueryProtocol(txid, future),
+        remote_addr=resolver
+    )
+    try:
+        transport.sendto(build_query(name, txid))
+        return await asyncio.wait_for(future, timeout)
+    finally:
+        transport.close()
+
+
+class PropagationVerifier:
+    """
+    DNS 传播验证
+
+    记录创建后并发轮询所有配置的解析器，全部返回期望 IP 时视为可解析，
+    触发回调和 webhook。轮询间隔指数退避并封顶；独立的事件循环线程
+    负责所有查询，调用方只需提交名称。
+    """
+
+    def __init__(
+        self,
+        resolvers: List[Resolver],
+        on_resolved: Optional[Callable[[str, str, float], None]] = None,
+        on_timeout: Optional[Callable[[str, str, float], None]] = None,
+        webhook_url: Optional[str] = None,
+        query_timeout: float = 2.0,
+        initial_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: float = 600.0
+    ):
+        if not resolvers:
+            raise ValueError("At least one resolver is required")
+        self.resolvers = resolvers
+        self.on_resolved = on_resolved
+        self.on_timeout = on_timeout
+        self.webhook_url = webhook_url
+        self.query_timeout = query_timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动事件循环线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop.run_forever, name="dns-verify", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def verify(self, name: str, expected_ip: Optional[str] = None) -> Future:
+        """
+        提交验证任务，立即返回
+
+        同一名称已在验证中时复用进行中的任务
+
+        Args:
+            name: 完整域名
+            expected_ip: 期望的 A 记录，None 表示任意 A 记录（如代理记录）
+
+        Returns:
+            Future: 完成时结果为可解析耗时（秒），超时为 None
+        """
+        self.start()
+        with self._lock:
+            pending = self._pending.get(name)
+            if pending is not None and not pending.done():
+                return pending
+            future = asyncio.run_coroutine_threadsafe(self._verify(name, expected_ip), self._loop)
+            self._pending[name] = future
+        future.add_done_callback(lambda f: self._forget(name, f))
+        return future
+
+    def _forget(self, name: str, future: Future):
+        with self._lock:
+            if self._pending.get(name) is future:
+                del self._pending[name]
+
+    async def _resolves(self, resolver: Resolver, name: str, expected_ip: Optional[str]) -> bool:
+        try:
+            addresses = await query_a(resolver, name, self.query_timeout)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            logger.debug(f"DNS query for {name} via {resolver[0]}:{resolver[1]} failed: {e}")
+            return False
+        return bool(addresses) and (expected_ip is None or expected_ip in addresses)
+
+    async def _verify(self, name: str, expected_ip: Optional[str]) -> Optional[float]:
+        started = time.monotonic()
+        delay = self.initial_delay
+        remaining = set(self.resolvers)
+
+        while True:
+            # 已返回期望结果的解析器不再查询
+            pending = list(remaining)
+            results = await asyncio.gather(*(self._resolves(r, name, expected_ip) for r in pending))
+            remaining.difference_update(r for r, ok in zip(pending, results) if ok)
+
+            elapsed = time.monotonic() - started
+            if not remaining:
+                logger.info(f"DNS record {name} resolvable via {len(self.resolvers)} resolvers after {elapsed:.1f}s")
+                await self._notify(self.on_resolved, name, expected_ip, elapsed, "resolved")
+                return elapsed
+
+            if elapsed + delay > self.deadline:
+                logger.warning(
+                    f"DNS record {name} not resolvable after {elapsed:.1f}s, "
+                    f"pending resolvers: {', '.join(f'{h}:{p}' for h, p in sorted(remaining))}"
+                )
+                await self._notify(self.on_timeout, name, expected_ip, elapsed, "timeout")
+                return None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+    async def _notify(self, callback, name: str, ip: Optional[str], elapsed: float, status: str):
+        loop = asyncio.get_running_loop()
+        # 回调和 webhook 可能阻塞，放到线程池执行，不影响其他名称的轮询
+        if callback:
+            try:
+                await loop.run_in_executor(None, callback, name, ip, elapsed)
+            except Exception as e:
+                logger.error(f"DNS verify callback for {name} failed: {e}")
+        if self.webhook_url:
+            payload = {'name': name, 'ip': ip, 'status': status, 'seconds': round(elapsed, 3)}
+            try:
+                await loop.run_in_executor(None, self._post_webhook, payload)
+            except Exception as e:
+                logger.error(f"DNS verify webhook for {name} failed: {e}")
+
+    def _post_webhook(self, payload: dict):
+        response = requests.post(self.webhook_url, json=payload, timeout=5)
+        response.raise_for_status()
+
+
+def create_verifier(
+    on_resolved: Optional[Callable[[str, str, float], None]] = None,
+    on_timeout: Optional[Callable[[str, str, float], None]] = None
+) -> Optional[PropagationVerifier]:
+    """
+    根据环境变量创建传播验证器，DNS_VERIFY 未开启时返回 None
+
+    环境变量:
+        DNS_VERIFY_RESOLVERS: 逗号分隔的 host[:port]，默认 1.1.1.1,8.8.8.8
+        DNS_VERIFY_WEBHOOK: 记录可解析或超时后 POST 通知的地址
+        DNS_VERIFY_MAX_INTERVAL: 轮询间隔上限（秒，默认 30）
+        DNS_VERIFY_DEADLINE: 放弃验证的时限（秒，默认 600）
+    """
+    if os.getenv("DNS_VERIFY", "false").lower() != "true":
+        return None
+
+    return PropagationVerifier(
+        parse_resolvers(os.getenv("DNS_VERIFY_RESOLVERS", "1.1.1.1,8.8.8.8")),
+        on_resolved=on_resolved,
+        on_timeout=on_timeout,
+        webhook_url=os.getenv("DNS_VERIFY_WEBHOOK") or None,
+        max_delay=float(os.getenv("DNS_VERIFY_MAX_INTERVAL", "30")),
+        deadline=float(os.getenv("DNS_VERIFY_DEADLINE", "600"))
+    )
@@ -0,0 +1,139 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+
+logger = logging.getLogger("dns-manager")
+
+
+class StartupStepSkipped(Exception):
+    """必需的依赖步骤失败，步骤未执行"""
+
+
+class StartupStep:
+    """启动流水线中的单个步骤"""
+
+    def __init__(self, name: str, fn: Callable[[], object], depends: Iterable[str] = (), required: bool = True):
+        self.name = name
+        self.fn = fn
+        self.depends = tuple(depends)
+        self.required = required
+        self.state = "pending"
+        self.duration = None
+        self.error = None
+        self.future = Future()
+
+
+class StartupPipeline:
+    """
+    并发启动编排
+
+    每个步骤在独立线程中运行，只等待其依赖完成；非必需步骤失败时
+    记录错误，依赖它的步骤照常继续。必需步骤失败（或被跳过）时依赖它的步骤
+    不再执行，标记为 skipped；必需步骤失败时 run() 抛出异常。
+    """
+
+    def __init__(self):
+        self._steps: Dict[str, StartupStep] = {}
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, name: str, fn: Callable[[], object], depends: Iterable[str] = (), required: bool = True):
+        """
+        添加步骤
+
+        Args:
+            name: 步骤名称
+            fn: 无参可调用对象
+            depends: 依赖的步骤名称
+            required: 失败时是否中止启动
+        """
+        self._steps[name] = StartupStep(name, fn, depends, required)
+        return self
+
+    def _execute(self, step: StartupStep):
+        for dep in step.depends:
+            try:
+                self._steps[dep].future.result()
+            except Exception as e:
+                upstream = self._steps[dep]
+                # 可选依赖失败时照常执行，必需依赖失败或依赖被跳过时本步骤也跳过
+                if upstream.required or upstream.state == "skipped":
+                    self._skip(step, f"dependency {dep} failed: {e}")
+                    return
+
+        with self._lock:
+            step.state = "running"
+        started = time.monotonic()
+        try:
+            result = step.fn()
+        except Exception as e:
+            with self._lock:
+                step.state = "failed"
+                step.error = str(e)
+                step.duration = time.monotonic() - started
+            logger.error(f"Startup step {step.name} failed after {step.duration:.2f}s: {e}")
+            step.future.set_exception(e)
+            return
+
+        with self._lock:
+            step.state = "done"
+            step.duration = time.monotonic() - started
+        logger.info(f"Startup step {step.name} done in {step.duration:.2f}s")
+        step.future.set_result(result)
+
+    def _skip(self, step: StartupStep, reason: str):
+        with self._lock:
+            step.state = "skipped"
+            step.error = reason
+        logger.error(f"Startup step {step.name} skipped: {reason}")
+        step.future.set_exception(StartupStepSkipped(reason))
+
+    def run(self, timeout: Optional[float] = None) -> Dict[str, object]:
+        """
+        并发执行所有步骤并等待完成
+
+        Returns:
+            步骤名称 -> 返回值（失败的非必需步骤为 None）
+        """
+        for step in self._steps.values():
+            for dep in step.depends:
+                if dep not in self._steps:
+                    raise ValueError(f"Startup step {step.name} depends on unknown step {dep}")
+
+        self.started_at = time.monotonic()
+        # 每个步骤一个线程，等待依赖的步骤不会占满线程池导致死锁
+        with ThreadPoolExecutor(max_workers=max(1, len(self._steps)), thread_name_prefix="startup") as pool:
+            for step in self._steps.values():
+                pool.submit(self._execute, step)
+
+            results = {}
+            for step in self._steps.values():
+                try:
+                    results[step.name] = step.future.result(timeout=timeout)
+                except Exception:
+                    if step.required:
+                        raise
+                    results[step.name] = None
+
+        self.finished_at = time.monotonic()
+        return results
+
+    def result(self, name: str):
+        """已完成步骤的返回值，步骤失败时抛出其异常"""
+        return self._steps[name].future.result()
+
+    def status(self) -> Dict[str, dict]:
+        """各步骤状态，用于 /ready"""
+        with self._lock:
+            return {
+                step.name: {
+                    "state": step.state,
+                    "duration": round(step.duration, 3) if step.duration is not None else None,
+                    "error": step.error
+                }
+                for step in self._steps.values()
+            }
@@ -0,0 +1,28 @@
+from benchmarks.run import cold_start, compare, crash_loop, event_burst
+
+
+def test_cold_start_creates_all_records():
+    report = cold_start(containers=5)
+    assert report["events"] == 5
+    # 一次列表扫描，无逐个 inspect
+    assert report["docker_calls"] == 1
+
+
+def test_event_burst_end_to_end():
+    report = event_burst(events=5)
+    assert report["events"] == 5
+    assert report["p99_ms"] > 0
+
+
+def test_crash_loop_creates_single_record():
+    report = crash_loop(restarts=5)
+    assert report["records_for_name"] == 1
+
+
+def test_compare_detects_regressions():
+    baseline = {"s": {"events_per_sec": 100.0, "api_calls_per_event": 1.0, "p99_ms": 10.0, "rss_mb": 50.0}}
+    ok = {"s": {"events_per_sec": 95.0, "api_calls_per_event": 1.0, "p99_ms": 12.0, "rss_mb": 51.0}}
+    bad = {"s": {"events_per_sec": 50.0, "api_calls_per_event": 2.0, "p99_ms": 12.0, "rss_mb": 51.0}}
+
+    assert compare(ok, baseline, tolerance=0.3) == []
+    assert len(compare(bad, baseline, tolerance=0.3)) == 2
@@ -0,0 +1,109 @@
+import pytest
+from unittest.mock import MagicMock
+from benchmarks.fake_cloudflare import FakeCloudflareAPI
+from cloudflare_api import CloudflareAPI, CloudflareAPIError, NotLeaderError
+
+
+@pytest.fixture
+def fake_cf():
+    api = FakeCloudflareAPI("example.com").start()
+    yield api
+    api.stop()
+
+
+def test_missing_credentials():
+    with pytest.raises(ValueError, match="Cloudflare credentials required"):
+        CloudflareAPI()
+
+
+def test_auth_headers():
+    assert CloudflareAPI(api_token="t").session.headers['Authorization'] == "Bearer t"
+
+    api = CloudflareAPI(api_email="a@example.com", api_key="k")
+    assert api.session.headers['X-Auth-Email'] == "a@example.com"
+    assert api.session.headers['X-Auth-Key'] == "k"
+
+
+def test_record_lifecycle(fake_cf):
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+    zone_id = api.list_zones("example.com")[0]['id']
+
+    record = api.create_dns_record(zone_id, {'type': 'A', 'name': 'app.example.com', 'content': '203.0.113.1'})
+    assert api.update_dns_record(zone_id, record['id'], {'content': '203.0.113.2'})['content'] == '203.0.113.2'
+    assert [r['content'] for r in api.iter_dns_records(zone_id, name='app.example.com')] == ['203.0.113.2']
+
+    api.delete_dns_record(zone_id, record['id'])
+    assert fake_cf.records_named('app.example.com') == []
+
+
+def test_write_guard_blocks_writes(fake_cf):
+    leader = [True]
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url, write_guard=lambda: leader[0])
+    zone_id = api.list_zones("example.com")[0]['id']
+    api.create_dns_record(zone_id, {'type': 'A', 'name': 'app.example.com', 'content': '203.0.113.1'})
+
+    leader[0] = False
+    with pytest.raises(NotLeaderError):
+        api.create_dns_record(zone_id, {'type': 'A', 'name': 'web.example.com', 'content': '203.0.113.1'})
+    # 读请求不受影响
+    assert [r['name'] for r in api.iter_dns_records(zone_id)] == ['app.example.com']
+
+
+def test_pagination_reuses_connection(fake_cf):
+    for i in range(25):
+        fake_cf.add_record(f"app{i}.example.com", "203.0.113.1")
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+    limiter = MagicMock()
+    api.rate_limiter = limiter
+
+    records = list(api.paginate(f"zones/{fake_cf.zone_id}/dns_records", per_page=10))
+
+    assert len(records) == 25
+    assert fake_cf.calls_by_route["GET /zones/{id}/dns_records"] == 3
+    # 每一页都经过限流器
+    assert limiter.acquire.call_count == 3
+
+
+def test_pagination_stops_early(fake_cf):
+    for i in range(25):
+        fake_cf.add_record(f"app{i}.example.com", "203.0.113.1")
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+
+    pages = api.paginate(f"zones/{fake_cf.zone_id}/dns_records", per_page=10)
+    next(pages)
+
+    assert fake_cf.calls_by_route["GET /zones/{id}/dns_records"] == 1
+
+
+def test_batch(fake_cf):
+    old = fake_cf.add_record("old.example.com", "203.0.113.1")
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+
+    result = api.batch_dns_records(
+        fake_cf.zone_id,
+        deletes=[{'id': old['id']}],
+        posts=[{'type': 'A', 'name': 'new.example.com', 'content': '203.0.113.2'}]
+    )
+
+    assert result['deletes'] == [{'id': old['id']}]
+    assert [r['name'] for r in fake_cf.records.values()] == ['new.example.com']
+
+
+def test_error_response(fake_cf):
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+
+    with pytest.raises(CloudflareAPIError) as exc:
+        api.delete_dns_record(fake_cf.zone_id, "missing")
+
+    assert exc.value.status == 404
+    assert exc.value.code == 81044
+
+
+def test_throttled_response(fake_cf):
+    fake_cf.rate_429 = 1.0
+    api = CloudflareAPI(api_token="t", base_url=fake_cf.base_url)
+
+    with pytest.raises(CloudflareAPIError) as exc:
+        api.list_zones("example.com")
+
+    assert exc.value.status == 429
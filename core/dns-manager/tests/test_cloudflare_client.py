@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from cloudflare_api import CloudflareAPIError, NotLeaderError
 from cloudflare_client import CloudflareClient
 
 
@@ -41,74 +42,237 @@ def test_init_missing_credentials(mock_domain):
         CloudflareClient(domain=mock_domain)
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_get_zone_id_success(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
-    mock_cf.zones.get.return_value = [
+def test_get_zone_id_success(client):
+    client.api = MagicMock()
+    client.api.list_zones.return_value = [
         {"id": "zone123", "name": "example.com"}
     ]
 
     zone_id = client._get_zone_id()
     assert zone_id == "zone123"
+    client.api.list_zones.assert_called_once_with("example.com")
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_get_zone_id_not_found(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
-    mock_cf.zones.get.return_value = []
+def test_get_zone_id_not_found(client):
+    client.api = MagicMock()
+    client.api.list_zones.return_value = []
 
     with pytest.raises(Exception, match="Zone not found"):
         client._get_zone_id()
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_check_dns_exists_true(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
+def test_check_dns_exists_true(client):
+    client.api = MagicMock()
     client.zone_id = "zone123"
-    mock_cf.zones.dns_records.get.return_value = [
-        {"type": "A", "name": "test.example.com"}
-    ]
+    client.api.iter_dns_records.return_value = iter([
+        {"type": "A", "name": "test.example.com", "content": "192.168.1.1"}
+    ])
 
     exists = client.check_dns_exists("test")
     assert exists == True
+    client.api.iter_dns_records.assert_called_once_with("zone123", type='A', name="test.example.com")
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_check_dns_exists_false(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
+def test_check_dns_exists_false(client):
+    client.api = MagicMock()
     client.zone_id = "zone123"
-    mock_cf.zones.dns_records.get.return_value = []
+    client.api.iter_dns_records.return_value = iter([])
 
     exists = client.check_dns_exists("test")
     assert exists == False
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_create_dns_record_success(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
+def test_create_dns_record_success(client):
+    client.api = MagicMock()
     client.zone_id = "zone123"
-    mock_cf.zones.dns_records.post.return_value = {"id": "record123"}
+    client.api.create_dns_record.return_value = {"id": "record123"}
 
     result = client.create_dns_record("test", "192.168.1.1")
     assert result == True
 
 
-@patch('cloudflare_client.CloudFlare')
-def test_create_dns_record_with_retry(mock_cf_class, client):
-    mock_cf = MagicMock()
-    mock_cf_class.return_value = mock_cf
+@patch('time.sleep')
+def test_create_dns_record_with_retry(mock_sleep, client):
+    client.api = MagicMock()
     client.zone_id = "zone123"
 
     # 第一次失败，第二次成功
-    mock_cf.zones.dns_records.post.side_effect = [
+    client.api.create_dns_record.side_effect = [
         Exception("Rate limit"),
         {"id": "record123"}
     ]
 
     result = client.create_dns_record("test", "192.168.1.1")
     assert result == True
+    assert client.api.create_dns_record.call_count == 2
+
+
+@patch('time.sleep')
+def test_create_stops_retrying_when_leadership_lost(mock_sleep, client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.side_effect = [Exception("Rate limit"), NotLeaderError("no longer leader")]
+
+    with pytest.raises(NotLeaderError):
+        client.create_dns_record("test", "192.168.1.1")
+    assert client.api.create_dns_record.call_count == 2
+
+
+def test_record_index_avoids_api_calls(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.iter_dns_records.return_value = iter([
+        {"type": "A", "name": "app.example.com", "content": "203.0.113.1"}
+    ])
+
+    assert client.warm_record_index() == 1
+    assert client.check_dns_exists("app") == True
+    # 预热后只调用过一次列表接口
+    assert client.api.iter_dns_records.call_count == 1
+
+
+def test_warm_drops_deleted_records(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.iter_dns_records.return_value = iter([
+        {"type": "A", "name": "app.example.com", "content": "203.0.113.1"}
+    ])
+    client.warm_record_index()
+
+    # 记录已被其他副本或手动删除，重新预热后不再视为存在
+    client.api.iter_dns_records.side_effect = [iter([]), iter([])]
+    assert client.warm_record_index() == 0
+    assert client.check_dns_exists("app") == False
+
+
+def test_created_record_is_indexed(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.return_value = {"id": "record123"}
+
+    client.create_dns_record("new", "203.0.113.1")
+
+    assert client.check_dns_exists("new") == True
+    client.api.iter_dns_records.assert_not_called()
+
+
+def test_delete_dns_record_uses_index(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.return_value = {"id": "record123"}
+    client.create_dns_record("old", "203.0.113.1")
+
+    assert client.delete_dns_record("old", "203.0.113.1") == True
+    client.api.delete_dns_record.assert_called_once_with("zone123", "record123")
+    client.api.iter_dns_records.assert_not_called()
+    assert "old.example.com" not in client._records
+
+
+def test_warmed_index_answers_misses(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.iter_dns_records.return_value = iter([
+        {"id": "r1", "name": "app.example.com", "content": "203.0.113.1"}
+    ])
+    client.warm_record_index()
+    client.api.iter_dns_records.reset_mock()
+
+    # 完整预热后的索引对未命中同样权威
+    assert client.check_dns_exists("new") == False
+    client.api.iter_dns_records.assert_not_called()
+
+
+def test_expired_index_is_rewarmed(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.index_ttl = 60
+    client.api.iter_dns_records.side_effect = [
+        iter([{"id": "r1", "name": "app.example.com", "content": "203.0.113.1"}]),
+        iter([]),
+    ]
+    client.warm_record_index()
+
+    with patch('cloudflare_client.time.monotonic', return_value=client._indexed_at + 61):
+        assert client.check_dns_exists("app") == False
+    assert client.api.iter_dns_records.call_count == 2
+
+
+def test_writes_during_warm_survive_swap(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.return_value = {"id": "r2", "name": "new.example.com", "content": "203.0.113.2"}
+
+    old = {"id": "r1", "name": "old.example.com", "content": "203.0.113.1"}
+
+    def zone_pages():
+        yield old
+        # 列表已翻过这两条记录后，本副本创建了 new、删除了 old
+        client.create_dns_record("new", "203.0.113.2")
+        client.delete_dns_record("old", "203.0.113.1")
+
+    client.api.iter_dns_records.side_effect = lambda zone_id, type, name=None: iter([old]) if name else zone_pages()
+    assert client.warm_record_index() == 1
+
+    assert client.get_record("new")['id'] == "r2"
+    assert client.get_record("old") is None
+    assert client._pending is None
+
+
+def test_create_existing_record_corrects_index(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.iter_dns_records.side_effect = [
+        iter([]),
+        iter([{"id": "r1", "name": "app.example.com", "content": "203.0.113.1"}]),
+    ]
+    client.warm_record_index()
+    client.api.create_dns_record.side_effect = CloudflareAPIError(400, 81058, "An identical record already exists.")
+
+    assert client.create_dns_record("app", "203.0.113.1") == True
+    assert client.api.create_dns_record.call_count == 1
+    assert client.get_record("app")['id'] == "r1"
+
+
+def test_delete_missing_record_drops_index_entry(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.return_value = {"id": "record123"}
+    client.create_dns_record("old", "203.0.113.1")
+    client.api.delete_dns_record.side_effect = CloudflareAPIError(404, 81044, "Record does not exist.")
+
+    assert client.delete_dns_record("old", "203.0.113.1") == False
+    assert "old.example.com" not in client._records
+
+
+def test_delete_dns_record_keeps_foreign_value(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.iter_dns_records.return_value = iter([
+        {"id": "r1", "name": "app.example.com", "content": "198.51.100.7"}
+    ])
+
+    # 记录已被改为指向其他地址，不删除
+    assert client.delete_dns_record("app", "203.0.113.1") == False
+    client.api.delete_dns_record.assert_not_called()
+
+
+def test_update_records_batches_patches(client):
+    client.api = MagicMock()
+    client.zone_id = "zone123"
+    client.api.create_dns_record.return_value = {"id": "record123"}
+    client.create_dns_record("app", "203.0.113.1")
+
+    assert client.update_records([("app", 1, True), ("unknown", 60, False)]) == 1
+    client.api.batch_dns_records.assert_called_once_with(
+        "zone123", patches=[{'id': 'record123', 'ttl': 1, 'proxied': True}]
+    )
+    assert client.get_record("app")['proxied'] is True
+
+
+def test_rate_limiter_shared_across_calls(mock_cf_token, mock_domain):
+    limiter = MagicMock()
+
+    client = CloudflareClient(api_token=mock_cf_token, domain=mock_domain, rate_limiter=limiter)
+
+    # 客户端与传输层共用同一个限流器
+    assert client.api.rate_limiter is limiter
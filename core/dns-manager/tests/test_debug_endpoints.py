@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+from dns_manager import create_health_app
+
+
+def _debug_client(monkeypatch, token="s3cret"):
+    monkeypatch.setenv("DEBUG_ENDPOINTS", "true")
+    monkeypatch.setenv("DEBUG_ENDPOINTS_TOKEN", token)
+    client = create_health_app().test_client()
+    client.environ_base['HTTP_X_DEBUG_TOKEN'] = token
+    return client
+
+
+def test_debug_routes_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("DEBUG_ENDPOINTS", raising=False)
+    client = create_health_app().test_client()
+    assert client.get('/debug/threads').status_code == 404
+
+
+def test_debug_threads(monkeypatch):
+    client = _debug_client(monkeypatch)
+    response = client.get('/debug/threads')
+    assert response.status_code == 200
+    assert 'MainThread' in response.get_data(as_text=True)
+
+
+def test_debug_profile_collapsed_stacks(monkeypatch):
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=busy_worker, name="busy-worker")
+    worker.start()
+    try:
+        client = _debug_client(monkeypatch)
+        response = client.get('/debug/profile?seconds=0.1&hz=200')
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = response.get_data(as_text=True).strip().splitlines()
+    assert any(line.startswith('busy-worker;') and 'busy_worker' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_debug_tracemalloc_snapshot_and_diff(monkeypatch):
+    client = _debug_client(monkeypatch)
+    try:
+        assert client.get('/debug/tracemalloc/diff').status_code == 409
+
+        data = client.get('/debug/tracemalloc/snapshot').get_json()
+        assert data['tracing_started'] is True
+
+        leak = [bytearray(1024) for _ in range(100)]
+        diff = client.get('/debug/tracemalloc/diff').get_json()
+        assert isinstance(diff['top'], list)
+        assert any(item['size_diff_kb'] > 0 for item in diff['top'])
+        del leak
+    finally:
+        assert client.post('/debug/tracemalloc/stop').get_json()['stopped'] is True
+
+
+def test_debug_token_required(monkeypatch):
+    client = _debug_client(monkeypatch, token="s3cret")
+    assert client.get('/debug/threads', headers={'X-Debug-Token': 'wrong'}).status_code == 403
+    assert client.get('/debug/threads', headers={'X-Debug-Token': 's3cret'}).status_code == 200
+    # 非诊断端点不受影响
+    assert client.get('/health').status_code == 200
+
+
+def test_debug_routes_closed_without_token(monkeypatch):
+    monkeypatch.setenv("DEBUG_ENDPOINTS", "true")
+    monkeypatch.delenv("DEBUG_ENDPOINTS_TOKEN", raising=False)
+    client = create_health_app().test_client()
+
+    assert client.get('/debug/threads').status_code == 403
+    assert client.get('/debug/threads', headers={'X-Debug-Token': ''}).status_code == 403
+
+
+@pytest.mark.parametrize("query", ["seconds=abc", "hz=fast", "seconds=0", "seconds=-1", "seconds=nan", "hz=inf"])
+def test_debug_profile_rejects_bad_input(monkeypatch, query):
+    client = _debug_client(monkeypatch)
+    assert client.get(f'/debug/profile?{query}').status_code == 400
+
+
+def test_debug_profile_clamps_hz(monkeypatch):
+    client = _debug_client(monkeypatch)
+    # hz=0 会导致除零，按最小 1Hz 采样
+    assert client.get('/debug/profile?seconds=0.05&hz=0').status_code == 200
@@ -37,7 +37,7 @@ def test_handle_container_start_new_record(mock_detect_ip, mock_cf_client, mock_
     manager._handle_container_start("myapp", "myapp-container")
 
     mock_cf.check_dns_exists.assert_called_once_with("myapp")
-    mock_cf.create_dns_record.assert_called_once_with("myapp", "203.0.113.42")
+    mock_cf.create_dns_record.assert_called_once_with("myapp", "203.0.113.42", ttl=300, proxied=False)
 
 
 @patch('dns_manager.CloudflareClient')
@@ -47,6 +47,7 @@ def test_handle_container_start_existing_record(mock_detect_ip, mock_cf_client,
     mock_cf = MagicMock()
     mock_cf.check_dns_exists.return_value = True
     mock_cf_client.return_value = mock_cf
+    mock_cf.get_record.return_value = None
 
     manager = DNSManager()
     manager._handle_container_start("myapp", "myapp-container")
@@ -66,3 +67,364 @@ def test_health_app():
     assert data['status'] == 'healthy'
     assert 'uptime' in data
     assert 'stats' in data
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_multi_host_ip_mapping(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    monkeypatch.setenv(
+        "DOCKER_HOSTS",
+        "node1=tcp://10.0.0.1:2376=203.0.113.1,node2=tcp://10.0.0.2:2376=203.0.113.2"
+    )
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = False
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+
+    manager = DNSManager()
+
+    # 所有主机都指定了 IP,无需自动检测
+    mock_detect_ip.assert_not_called()
+    assert len(manager.docker_monitors) == 2
+    assert [c.kwargs['base_url'] for c in mock_monitor.call_args_list] == [
+        "tcp://10.0.0.1:2376", "tcp://10.0.0.2:2376"
+    ]
+
+    # 每个主机的回调使用各自的公网 IP
+    node2_callback = mock_monitor.call_args_list[1].kwargs['on_container_start']
+    node2_callback("app", "app-1")
+    mock_cf.create_dns_record.assert_called_once_with("app", "203.0.113.2", ttl=300, proxied=False)
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_follower_defers_writes_until_elected(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("LEADER_ELECTION", "sqlite")
+    monkeypatch.setenv("LEADER_LOCK_PATH", str(tmp_path / "leader.db"))
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = False
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+
+    manager = DNSManager()
+    manager.elector.backend.try_acquire("other-replica", ttl=60)
+
+    manager.elector.step()
+    manager._handle_container_start("myapp", "myapp-container")
+    assert not manager.is_leader
+    mock_cf.check_dns_exists.assert_not_called()
+
+    # 另一副本释放租约后接管，按期望状态补齐记录
+    manager.elector.backend.release("other-replica")
+    manager.elector.step()
+    assert manager.is_leader
+    manager._reconcile()
+    mock_cf.create_dns_record.assert_called_with("myapp", "203.0.113.42", ttl=300, proxied=False)
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_startup_pipeline_dispatches_after_warmup(mock_detect_ip, mock_cf_client, mock_monitor, mock_env):
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = False
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+    monitor = mock_monitor.return_value
+    monitor.host_name = "local"
+    monitor.collect_existing_containers.return_value = [("myapp", "myapp-container")]
+
+    manager = DNSManager()
+    monitor.on_container_start = mock_monitor.call_args.kwargs['on_container_start']
+    pipeline = manager._build_startup_pipeline()
+    pipeline.run(timeout=5)
+
+    mock_cf.warm_record_index.assert_called_once()
+    mock_cf.create_dns_record.assert_called_once_with("myapp", "203.0.113.42", ttl=300, proxied=False)
+    assert set(pipeline.status()) == {'server_ip', 'zone_id', 'record_index', 'gate', 'list:local', 'dispatch:local'}
+
+
+def test_ready_endpoint(monkeypatch):
+    import dns_manager
+
+    monkeypatch.setitem(dns_manager.readiness, 'ready', False)
+    monkeypatch.setitem(dns_manager.readiness, 'pipeline', None)
+    client = create_health_app().test_client()
+
+    assert client.get('/ready').status_code == 503
+
+    monkeypatch.setitem(dns_manager.readiness, 'ready', True)
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()['ready'] is True
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_created_record_is_verified(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    monkeypatch.setenv("DNS_VERIFY", "true")
+    monkeypatch.setenv("DNS_VERIFY_RESOLVERS", "127.0.0.1:5353")
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.side_effect = [False, True]
+    mock_cf.create_dns_record.return_value = True
+    mock_cf_client.return_value = mock_cf
+    mock_cf.get_record.return_value = None
+    mock_monitor.return_value.overrides.return_value = {}
+
+    manager = DNSManager()
+    manager.verifier = MagicMock()
+    manager._handle_container_start("myapp", "myapp-container")
+    manager._handle_container_start("myapp", "myapp-container")
+
+    # 只验证新建的记录
+    manager.verifier.verify.assert_called_once_with("myapp.example.com", "203.0.113.42")
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_health_serves_cached_probes(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    import dns_manager
+
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.verify_credentials.side_effect = Exception("Invalid API Token")
+    mock_cf_client.return_value = mock_cf
+    mock_cf.get_record.return_value = None
+    mock_monitor.return_value.overrides.return_value = {}
+    monitor = mock_monitor.return_value
+    monitor.host_name = "local"
+    monitor.client.ping.return_value = True
+    monitor.event_stream_status.return_value = {'connected': True, 'last_event_age': None, 'lag_seconds': None}
+
+    manager = DNSManager()
+    manager.prober.run_once()
+    monkeypatch.setitem(dns_manager.readiness, 'ready', True)
+    monkeypatch.setitem(dns_manager.readiness, 'prober', manager.prober)
+    client = create_health_app().test_client()
+
+    # Cloudflare 凭证失效只影响就绪，不影响存活
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['checks']['docker:local']['ok'] is True
+    assert client.get('/ready').status_code == 503
+    assert monitor.client.ping.call_count == 1
+
+    # 事件流断开时存活检查失败
+    monitor.event_stream_status.return_value = {'connected': False, 'last_event_age': None, 'lag_seconds': None}
+    manager.prober.run_once()
+    assert client.get('/health').status_code == 503
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_health_ignores_remote_hosts(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    import dns_manager
+
+    monkeypatch.setenv("DOCKER_HOSTS", "local=unix:///var/run/docker.sock,node2=tcp://10.0.0.2:2376=203.0.113.2")
+    mock_detect_ip.return_value = "203.0.113.42"
+    monitors = {}
+
+    def make_monitor(**kwargs):
+        monitor = MagicMock()
+        monitor.host_name = kwargs['host_name']
+        monitor.overrides.return_value = {}
+        monitor.client.ping.return_value = True
+        monitor.event_stream_status.return_value = {'connected': True, 'last_event_age': None, 'lag_seconds': None}
+        monitors[kwargs['host_name']] = monitor
+        return monitor
+
+    mock_monitor.side_effect = make_monitor
+    mock_cf_client.return_value.verify_credentials.return_value = True
+    manager = DNSManager()
+    monkeypatch.setitem(dns_manager.readiness, 'ready', True)
+    monkeypatch.setitem(dns_manager.readiness, 'prober', manager.prober)
+    client = create_health_app().test_client()
+
+    # 首轮探测完成前报告 starting
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'starting'
+
+    # 远程主机不可达只影响就绪
+    monitors['node2'].client.ping.side_effect = Exception("connection refused")
+    manager.prober.run_once()
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'healthy'
+    assert response.get_json()['checks']['docker:node2']['critical'] is False
+    assert client.get('/ready').status_code == 503
+
+    # 本机 daemon 不可达时存活检查失败
+    monitors['local'].client.ping.side_effect = Exception("connection refused")
+    manager.prober.run_once()
+    assert client.get('/health').status_code == 503
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_removed_host_deletes_record(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    monkeypatch.setenv(
+        "DOCKER_HOSTS",
+        "node1=tcp://10.0.0.1:2376=203.0.113.1,node2=tcp://10.0.0.2:2376=203.0.113.2"
+    )
+    mock_cf = MagicMock()
+    mock_cf_client.return_value = mock_cf
+    mock_cf.get_record.return_value = None
+    mock_monitor.return_value.overrides.return_value = {}
+    node1, node2 = MagicMock(), MagicMock()
+    mock_monitor.side_effect = [node1, node2]
+
+    manager = DNSManager()
+    on_removed = mock_monitor.call_args_list[0].kwargs['on_host_removed']
+
+    # 另一台主机仍在使用该子域名时保留记录
+    node2.holds.return_value = True
+    node1.holds.return_value = False
+    on_removed("app", "app-1")
+    mock_cf.delete_dns_record.assert_not_called()
+
+    node2.holds.return_value = False
+    on_removed("app", "app-1")
+    mock_cf.delete_dns_record.assert_called_once_with("app", "203.0.113.1")
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_policy_reload_updates_only_affected_records(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch, tmp_path):
+    policy_file = tmp_path / "policy.yml"
+    policy_file.write_text("rules:\n  - match: 'web.example.com'\n    proxied: true\n")
+    monkeypatch.setenv("DNS_POLICY_FILE", str(policy_file))
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = False
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+    verifier = MagicMock()
+    monkeypatch.setattr('dns_manager.create_verifier', lambda **kwargs: verifier)
+
+    manager = DNSManager()
+    manager._handle_container_start("web", "web-1")
+    manager._handle_container_start("api", "api-1")
+    mock_cf.create_dns_record.assert_any_call("web", "203.0.113.42", ttl=1, proxied=True)
+    # 代理记录解析到 Cloudflare 边缘节点，不校验 IP
+    verifier.verify.assert_any_call("web.example.com", None)
+
+    records = {"web": {'id': 'w', 'ttl': 1, 'proxied': True}, "api": {'id': 'a', 'ttl': 300, 'proxied': False}}
+    mock_cf.get_record.side_effect = records.get
+    policy_file.write_text("rules:\n  - match: 'web.example.com'\n    proxied: true\n  - match: 'api.example.com'\n    ttl: 60\n")
+    assert manager.policy.reload()
+    manager._handle_policy_change(manager.policy.engine)
+
+    mock_cf.update_records.assert_called_once_with([("api", 60, False)])
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_existing_record_untouched_without_policy(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    monkeypatch.delenv("DNS_POLICY_FILE", raising=False)
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = True
+    # 在 Cloudflare 面板中手动开启代理的记录
+    mock_cf.get_record.return_value = {'id': 'r1', 'ttl': 1, 'proxied': True}
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+
+    manager = DNSManager()
+    manager._handle_container_start("app", "app-1")
+
+    mock_cf.update_records.assert_not_called()
+    mock_cf.create_dns_record.assert_not_called()
+
+    # 容器标签显式指定策略时才修正已有记录
+    mock_monitor.return_value.overrides.return_value = {'ttl': 60}
+    manager._handle_container_start("app", "app-1")
+    mock_cf.update_records.assert_called_once_with([("app", 60, False)])
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_container_start_survives_ip_detection_failure(mock_detect_ip, mock_cf_client, mock_monitor, mock_env):
+    import dns_manager
+
+    mock_detect_ip.side_effect = Exception("no route")
+    mock_cf = MagicMock()
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+    errors = dns_manager.stats['api_errors']
+
+    manager = DNSManager()
+    # IP 检测失败只使本次事件失败，不在监听线程中抛出
+    manager._handle_container_start("myapp", "myapp-container")
+
+    mock_cf.create_dns_record.assert_not_called()
+    assert "myapp" not in manager._desired
+    assert dns_manager.stats['api_errors'] == errors + 1
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_server_ip_from_local_host_entry(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch):
+    monkeypatch.setenv(
+        "DOCKER_HOSTS",
+        "node2=tcp://10.0.0.2:2376=203.0.113.2,local=unix:///var/run/docker.sock=203.0.113.1"
+    )
+
+    manager = DNSManager()
+
+    assert manager.server_ip == "203.0.113.1"
+    mock_detect_ip.assert_not_called()
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_file_provider_detects_server_ip(mock_detect_ip, mock_cf_client, mock_monitor, mock_env, monkeypatch, tmp_path):
+    # 所有主机都指定了 IP，但 file provider 的路由由本机提供，不能使用其他主机的 IP
+    monkeypatch.setenv("DOCKER_HOSTS", "node2=tcp://10.0.0.2:2376=203.0.113.2")
+    monkeypatch.setenv("TRAEFIK_DYNAMIC_DIR", str(tmp_path))
+    mock_detect_ip.return_value = "203.0.113.42"
+
+    manager = DNSManager()
+
+    assert manager.server_ip == "203.0.113.42"
+
+
+@patch('dns_manager.DockerMonitor')
+@patch('dns_manager.CloudflareClient')
+@patch('dns_manager.detect_ipv4')
+def test_container_start_guards_writes_with_leadership(mock_detect_ip, mock_cf_client, mock_monitor, mock_env):
+    import dns_manager
+    from cloudflare_api import NotLeaderError
+
+    mock_detect_ip.return_value = "203.0.113.42"
+    mock_cf = MagicMock()
+    mock_cf.check_dns_exists.return_value = False
+    mock_cf.create_dns_record.side_effect = NotLeaderError("no longer leader")
+    mock_cf_client.return_value = mock_cf
+    mock_monitor.return_value.overrides.return_value = {}
+    errors = dns_manager.stats['api_errors']
+
+    manager = DNSManager()
+    write_guard = mock_cf_client.call_args.kwargs['write_guard']
+    manager.elector = MagicMock(is_leader=False)
+    assert write_guard() is False
+
+    # 写入途中失去主节点身份不计为 API 错误，期望状态保留给新的主节点
+    manager.elector.is_leader = True
+    manager._handle_container_start("myapp", "myapp-container")
+    assert dns_manager.stats['api_errors'] == errors
+    assert "myapp" in manager._desired
@@ -1,6 +1,7 @@
+import time
 import pytest
 from unittest.mock import MagicMock, patch
-from docker_monitor import DockerMonitor, extract_domain_from_labels
+from docker_monitor import DockerMonitor, ContainerCache, CachedContainer, extract_domain_from_labels, extract_domains_from_labels
 
 
 def test_extract_domain_from_labels_simple():
@@ -74,14 +75,15 @@ def test_scan_existing_containers(mock_docker):
     mock_client = MagicMock()
     mock_docker.return_value = mock_client
 
-    # 模拟容器列表
-    mock_container = MagicMock()
-    mock_container.name = "test-app"
-    mock_container.labels = {
-        "traefik.enable": "true",
-        "traefik.http.routers.test.rule": "Host(`test.example.com`)"
-    }
-    mock_client.containers.list.return_value = [mock_container]
+    # 模拟容器列表（精简数据，已包含标签）
+    mock_client.api.containers.return_value = [{
+        "Id": "abc123",
+        "Names": ["/test-app"],
+        "Labels": {
+            "traefik.enable": "true",
+            "traefik.http.routers.test.rule": "Host(`test.example.com`)"
+        }
+    }]
 
     callback_called = []
     def callback(subdomain, container_name):
@@ -92,6 +94,24 @@ def test_scan_existing_containers(mock_docker):
 
     assert len(callback_called) == 1
     assert callback_called[0] == ("test", "test-app")
+    mock_client.api.containers.assert_called_once_with(filters={'label': 'traefik.enable=true'})
+    mock_client.containers.get.assert_not_called()
+
+
+def container_event(action, container_id, name, rule=None):
+    attributes = {"name": name}
+    if rule:
+        attributes.update({"traefik.enable": "true", "traefik.http.routers.app.rule": rule})
+    return {"Action": action, "status": action, "Actor": {"ID": container_id, "Attributes": attributes}}
+
+
+def test_extract_domains_from_labels_all_hosts():
+    labels = {
+        "traefik.enable": "true",
+        "traefik.http.routers.app1.rule": "Host(`app1.example.com`) || Host(`www.example.com`)",
+        "traefik.http.routers.app2.rule": "Host(`app1.example.com`)"
+    }
+    assert extract_domains_from_labels(labels, "example.com") == ["app1", "www"]
 
 
 @patch('docker.from_env')
@@ -99,32 +119,147 @@ def test_handle_container_start(mock_docker):
     mock_client = MagicMock()
     mock_docker.return_value = mock_client
 
-    mock_container = MagicMock()
-    mock_container.name = "new-app"
-    mock_container.labels = {
-        "traefik.enable": "true",
-        "traefik.http.routers.new.rule": "Host(`new.example.com`)"
-    }
-    mock_client.containers.get.return_value = mock_container
-
     callback_called = []
     def callback(subdomain, container_name):
         callback_called.append((subdomain, container_name))
 
     monitor = DockerMonitor("example.com", callback)
 
-    # 模拟容器启动事件
-    event = {
-        "status": "start",
-        "id": "container123",
-        "Actor": {
-            "Attributes": {
-                "traefik.enable": "true"
-            }
-        }
-    }
-
-    monitor._handle_event(event)
+    # 模拟容器启动事件，事件属性中携带容器标签
+    monitor._handle_event(container_event("start", "container123", "new-app", "Host(`new.example.com`)"))
 
     assert len(callback_called) == 1
     assert callback_called[0] == ("new", "new-app")
+    mock_client.containers.get.assert_not_called()
+
+
+@patch('docker.from_env')
+def test_unchanged_restart_is_ignored(mock_docker):
+    mock_docker.return_value = MagicMock()
+    started = []
+    monitor = DockerMonitor("example.com", lambda s, n: started.append(s))
+
+    for action in ("create", "start", "start", "rename", "start"):
+        monitor._handle_event(container_event(action, "c1", "app", "Host(`app.example.com`)"))
+
+    assert started == ["app"]
+
+
+@patch('docker.from_env')
+def test_recreated_container_with_changed_rule(mock_docker):
+    mock_docker.return_value = MagicMock()
+    started, removed = [], []
+    monitor = DockerMonitor(
+        "example.com",
+        lambda s, n: started.append(s),
+        on_host_removed=lambda s, n: removed.append(s)
+    )
+
+    monitor._handle_event(container_event("start", "old", "app", "Host(`old.example.com`)"))
+    # compose 重建: 新容器先创建启动，旧容器随后删除
+    monitor._handle_event(container_event("create", "new", "app", "Host(`new.example.com`)"))
+    monitor._handle_event(container_event("start", "new", "app", "Host(`new.example.com`)"))
+    monitor._handle_event(container_event("destroy", "old", "app_old", "Host(`old.example.com`)"))
+
+    assert started == ["old", "new"]
+    assert removed == ["old"]
+    assert monitor.holds("new") and not monitor.holds("old")
+
+
+@patch('docker.from_env')
+def test_recreated_container_with_same_rule(mock_docker):
+    mock_docker.return_value = MagicMock()
+    started, removed = [], []
+    monitor = DockerMonitor(
+        "example.com",
+        lambda s, n: started.append(s),
+        on_host_removed=lambda s, n: removed.append(s)
+    )
+
+    monitor._handle_event(container_event("start", "old", "app", "Host(`app.example.com`)"))
+    monitor._handle_event(container_event("start", "new", "app", "Host(`app.example.com`)"))
+    monitor._handle_event(container_event("destroy", "old", "app", "Host(`app.example.com`)"))
+
+    # 新旧容器共享子域名，引用计数始终大于 0
+    assert started == ["app"]
+    assert removed == []
+
+
+@patch('docker.from_env')
+def test_scanned_containers_are_cached(mock_docker):
+    mock_client = MagicMock()
+    mock_docker.return_value = mock_client
+    mock_client.api.containers.return_value = [{
+        "Id": "abc123",
+        "Names": ["/test-app"],
+        "Labels": {"traefik.enable": "true", "traefik.http.routers.app.rule": "Host(`test.example.com`)"}
+    }]
+    started = []
+    monitor = DockerMonitor("example.com", lambda s, n: started.append(s))
+
+    assert monitor.collect_existing_containers() == [("test", "test-app")]
+    monitor._handle_event(container_event("start", "abc123", "test-app", "Host(`test.example.com`)"))
+
+    assert started == []
+    assert monitor.holds("test")
+
+
+@patch('docker.from_env')
+def test_policy_label_change_is_dispatched(mock_docker):
+    mock_docker.return_value = MagicMock()
+    started = []
+    monitor = DockerMonitor("example.com", lambda s, n: started.append(s))
+
+    event = container_event("start", "old", "app", "Host(`app.example.com`)")
+    monitor._handle_event(event)
+    # 重建后子域名不变，只有策略标签变化
+    event = container_event("start", "new", "app", "Host(`app.example.com`)")
+    event["Actor"]["Attributes"]["dns-manager.proxied"] = "true"
+    monitor._handle_event(event)
+
+    assert started == ["app", "app"]
+    assert monitor.overrides("app") == {'proxied': True}
+
+
+def test_container_cache_lru():
+    cache = ContainerCache(maxsize=2)
+    cache.put("a", CachedContainer("a", "h", ()))
+    cache.put("b", CachedContainer("b", "h", ()))
+    cache.get("a")
+    cache.put("c", CachedContainer("c", "h", ()))
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+
+@patch('docker.DockerClient')
+def test_docker_monitor_remote_host(mock_docker_client):
+    monitor = DockerMonitor("example.com", lambda x, y: None,
+                            base_url="tcp://10.0.0.2:2375", host_name="node2")
+
+    mock_docker_client.assert_called_once_with(base_url="tcp://10.0.0.2:2375", tls=None)
+    assert monitor.host_name == "node2"
+    assert monitor.client == mock_docker_client.return_value
+
+
+@patch('docker.from_env')
+def test_event_stream_status(mock_docker):
+    mock_docker.return_value = MagicMock()
+    monitor = DockerMonitor("example.com", lambda x, y: None)
+    assert monitor.event_stream_status()['connected'] is False
+
+    seen = []
+    # 事件在 daemon 上产生于 2 秒前
+    events = [{"Actor": {"Attributes": {}}, "timeNano": int((time.time() - 2) * 1e9)}]
+
+    def stream():
+        for event in events:
+            yield event
+            seen.append(monitor.event_stream_status())
+
+    monitor.listen(stream())
+
+    assert seen[0]['connected'] is True
+    assert 1.5 < seen[0]['lag_seconds'] < 10
+    assert monitor.event_stream_status()['connected'] is False
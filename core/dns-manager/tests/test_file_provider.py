@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock
+from file_provider import TraefikFileWatcher, create_file_watcher
+
+
+ROUTERS = """
+http:
+  routers:
+    grafana:
+      rule: "Host(`grafana.example.com`)"
+      service: grafana
+    api:
+      rule: "Host(`api.example.com`) || Host(`api-v2.example.com`) && PathPrefix(`/v1`)"
+      service: api
+    external:
+      rule: "Host(`other.org`)"
+      service: other
+"""
+
+
+def write(path, content):
+    path.write_text(content)
+    # 保证 mtime 变化可被识别
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    on_host = MagicMock()
+    return TraefikFileWatcher(str(tmp_path), "example.com", on_host, poll_interval=0.05)
+
+
+def test_scan_extracts_hosts(tmp_path, watcher):
+    write(tmp_path / "routers.yml", ROUTERS)
+    (tmp_path / "notes.txt").write_text("Host(`ignored.example.com`)")
+
+    added = watcher.scan()
+
+    assert sorted(s for s, _ in added) == ["api", "api-v2", "grafana"]
+    assert dict(added)["grafana"] == "file:routers.yml/grafana"
+
+
+def test_scan_only_reparses_changed_files(tmp_path, watcher, monkeypatch):
+    write(tmp_path / "a.yml", 'http: {routers: {a: {rule: "Host(`a.example.com`)"}}}')
+    write(tmp_path / "b.yml", 'http: {routers: {b: {rule: "Host(`b.example.com`)"}}}')
+    watcher.scan()
+
+    parsed = []
+    original = watcher._parse
+    monkeypatch.setattr(watcher, "_parse", lambda path: parsed.append(os.path.basename(path)) or original(path))
+
+    write(tmp_path / "b.yml", 'http: {routers: {b: {rule: "Host(`b.example.com`) || Host(`c.example.com`)"}}}')
+    added = watcher.scan()
+
+    assert parsed == ["b.yml"]
+    assert added == [("c", "file:b.yml/b")]
+
+
+def test_invalid_file_keeps_previous_hosts(tmp_path, watcher):
+    write(tmp_path / "routers.yml", ROUTERS)
+    watcher.scan()
+
+    write(tmp_path / "routers.yml", "http: [unclosed")
+    assert watcher.scan() == []
+    assert len(watcher.hosts()) == 3
+
+
+def test_removed_file_forgotten(tmp_path, watcher):
+    write(tmp_path / "routers.yml", ROUTERS)
+    watcher.scan()
+
+    os.remove(tmp_path / "routers.yml")
+    watcher.scan()
+
+    assert watcher.hosts() == []
+
+
+def test_watch_dispatches_new_hosts(tmp_path, watcher):
+    thread = threading.Thread(target=watcher.watch, daemon=True)
+    thread.start()
+    try:
+        # 原子替换（编辑器和配置管理工具的常见写法）
+        tmp = tmp_path / ".routers.yml.tmp"
+        tmp.write_text('http: {routers: {app: {rule: "Host(`app.example.com`)"}}}')
+        os.rename(tmp, tmp_path / "routers.yml")
+
+        deadline = time.monotonic() + 5
+        while not watcher.on_host.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        watcher.on_host.assert_called_once_with("app", "file:routers.yml/app")
+    finally:
+        watcher.stop()
+        thread.join(timeout=5)
+
+
+def test_create_file_watcher_requires_directory(monkeypatch):
+    monkeypatch.delenv("TRAEFIK_DYNAMIC_DIR", raising=False)
+    assert create_file_watcher("example.com", MagicMock()) is None
+
+    monkeypatch.setenv("TRAEFIK_DYNAMIC_DIR", "/dynamic")
+    assert create_file_watcher("example.com", MagicMock()).directory == "/dynamic"
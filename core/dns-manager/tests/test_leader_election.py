@@ -0,0 +1,128 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from leader_election import (
+    FileLockBackend, LeaderElector, RedisLeaseBackend, SQLiteLeaseBackend, create_elector
+)
+
+
+class FakeRedis:
+    """最小 Redis 替身，实现 RedisLeaseBackend 用到的命令"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, holder, *args):
+        if self.data.get(key) != holder:
+            return 0
+        if script == RedisLeaseBackend.RELEASE_SCRIPT:
+            del self.data[key]
+        return 1
+
+
+def test_sqlite_lease_exclusive(tmp_path):
+    path = str(tmp_path / "leader.db")
+    a = SQLiteLeaseBackend(path)
+    b = SQLiteLeaseBackend(path)
+
+    assert a.try_acquire("a", ttl=10)
+    assert not b.try_acquire("b", ttl=10)
+    # 续约
+    assert a.try_acquire("a", ttl=10)
+
+    a.release("a")
+    assert b.try_acquire("b", ttl=10)
+
+
+def test_sqlite_lease_expiry(tmp_path):
+    path = str(tmp_path / "leader.db")
+    a = SQLiteLeaseBackend(path)
+    b = SQLiteLeaseBackend(path)
+
+    assert a.try_acquire("a", ttl=-1)
+    assert b.try_acquire("b", ttl=10)
+    assert not a.try_acquire("a", ttl=10)
+
+
+def test_file_lock_exclusive(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    a = FileLockBackend(path)
+    b = FileLockBackend(path)
+
+    assert a.try_acquire("a", ttl=10)
+    assert not b.try_acquire("b", ttl=10)
+
+    a.release("a")
+    assert b.try_acquire("b", ttl=10)
+    b.release("b")
+
+
+def test_redis_lease():
+    redis = FakeRedis()
+    a = RedisLeaseBackend(redis)
+    b = RedisLeaseBackend(redis)
+
+    assert a.try_acquire("a", ttl=5)
+    assert not b.try_acquire("b", ttl=5)
+    assert a.try_acquire("a", ttl=5)
+
+    b.release("b")
+    assert redis.data["dns-manager:leader"] == "a"
+    a.release("a")
+    assert b.try_acquire("b", ttl=5)
+
+
+def test_elector_transitions():
+    backend = MagicMock()
+    elected, revoked = MagicMock(), MagicMock()
+    elector = LeaderElector(backend, holder="a", ttl=0.05, on_elected=elected, on_revoked=revoked)
+
+    backend.try_acquire.return_value = True
+    elector.step()
+    assert elector.is_leader
+    elected.assert_called_once()
+
+    # 续约失败且租约过期后失去领导权
+    backend.try_acquire.side_effect = Exception("backend down")
+    elector._renewed_at -= 1
+    elector.step()
+    assert not elector.is_leader
+    revoked.assert_called_once()
+
+
+def test_slow_backend_does_not_extend_local_lease():
+    backend = MagicMock()
+    elector = LeaderElector(backend, holder="a", ttl=0.05)
+
+    def slow_acquire(holder, ttl):
+        time.sleep(0.08)
+        return True
+
+    # 后端调用耗时超过 ttl，后端租约可能已过期，本地不能认为自己是主节点
+    backend.try_acquire.side_effect = slow_acquire
+    elector.step()
+    assert not elector.is_leader
+
+
+def test_elector_stop_releases_lease(tmp_path):
+    backend = SQLiteLeaseBackend(str(tmp_path / "leader.db"))
+    elector = LeaderElector(backend, holder="a", ttl=10, renew_interval=0.01)
+    elector.start()
+    assert elector.is_leader
+
+    elector.stop()
+    assert not elector.is_leader
+    assert backend.try_acquire("b", ttl=10)
+
+
+def test_create_elector_disabled():
+    assert create_elector(None) is None
+    assert create_elector("none") is None
+    with pytest.raises(ValueError, match="Unknown LEADER_ELECTION"):
+        create_elector("zookeeper")
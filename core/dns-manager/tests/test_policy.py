@@ -0,0 +1,158 @@
+import os
+import pytest
+from policy import PolicyEngine, PolicyError, PolicyWatcher, RecordPolicy, overrides_from_labels
+
+
+CONFIG = {
+    'default': {'ttl': 300, 'proxied': False},
+    'rules': [
+        {'match': 'acme.example.com', 'proxied': False, 'ttl': 120},
+        {'match': '*.apps.example.com', 'proxied': True},
+        {'match': 'api-?.example.com', 'ttl': 60},
+        {'regex': r'^db-\d+\.example\.com$', 'ttl': 600},
+        {'match': '*.example.com', 'ttl': 3600},
+    ]
+}
+
+
+@pytest.fixture
+def engine():
+    return PolicyEngine.from_config(CONFIG)
+
+
+def test_first_matching_rule_wins(engine):
+    assert engine.evaluate("acme.example.com") == RecordPolicy(120, False)
+    assert engine.evaluate("shop.apps.example.com") == RecordPolicy(1, True)
+    assert engine.evaluate("a.b.apps.example.com").proxied is True
+    assert engine.evaluate("api-1.example.com").ttl == 60
+    # 标签内通配符不跨越 .
+    assert engine.evaluate("api-1.x.example.com").ttl == 3600
+
+
+def test_regex_and_glob_ordering(engine):
+    assert engine.evaluate("db-12.example.com").ttl == 600
+    assert engine.evaluate("DB-3.Example.com.").ttl == 600
+    assert engine.evaluate("db-x.example.com").ttl == 3600
+
+
+def test_default_policy(engine):
+    assert engine.evaluate("example.org") == RecordPolicy(300, False)
+    assert engine.evaluate("example.org").source == "default"
+
+
+def test_label_overrides(engine):
+    overrides = overrides_from_labels({"dns-manager.proxied": "true", "dns-manager.ttl": "bogus"})
+    assert overrides == {'proxied': True}
+
+    policy = engine.evaluate("api-1.example.com", overrides)
+    assert policy.proxied is True
+    assert policy.ttl == 1
+
+
+def test_policy_differs():
+    policy = RecordPolicy(60, False)
+    assert not policy.differs({'ttl': 60, 'proxied': False})
+    assert policy.differs({'ttl': 300, 'proxied': False})
+    assert RecordPolicy(300, True).differs({'ttl': 1, 'proxied': False})
+
+
+@pytest.mark.parametrize("config", [
+    {'rules': [{'ttl': 60}]},
+    {'rules': [{'match': 'a.example.com', 'regex': 'a'}]},
+    {'rules': [{'match': 'a.example.com', 'ttl': 5}]},
+    {'rules': [{'regex': '('}]},
+    {'default': {'proxied': 'maybe'}},
+])
+def test_invalid_config(config):
+    with pytest.raises(PolicyError):
+        PolicyEngine.from_config(config)
+
+
+def test_regex_rules_with_same_group_name():
+    engine = PolicyEngine.from_config({'rules': [
+        {'regex': r'^(?P<svc>api)\.example\.com$', 'ttl': 60},
+        {'regex': r'^(?P<svc>web)\.example\.com$', 'ttl': 120},
+    ]})
+
+    assert engine.evaluate("api.example.com").ttl == 60
+    assert engine.evaluate("web.example.com").ttl == 120
+
+
+def test_regex_rules_with_backreferences():
+    engine = PolicyEngine.from_config({'rules': [
+        {'regex': r'^(a+)-b\.example\.com$', 'ttl': 60},
+        # 反向引用只引用本规则的分组
+        {'regex': r'^(\w+)-\1\.example\.com$', 'ttl': 120},
+    ]})
+
+    assert engine.evaluate("aa-b.example.com").ttl == 60
+    assert engine.evaluate("web-web.example.com").ttl == 120
+    assert engine.evaluate("web-api.example.com").ttl == 300
+
+
+def test_regex_and_glob_rule_order():
+    engine = PolicyEngine.from_config({'rules': [
+        {'regex': r'^db-\d+\.example\.com$', 'ttl': 600},
+        {'match': '*.example.com', 'ttl': 3600},
+        {'regex': r'^web\.example\.com$', 'ttl': 60},
+    ]})
+
+    assert engine.evaluate("db-1.example.com").ttl == 600
+    # 前面的 glob 优先于后面的 regex
+    assert engine.evaluate("web.example.com").ttl == 3600
+
+
+def test_many_rules_compiled_once():
+    rules = [{'match': f'svc{i}.example.com', 'ttl': 60 + i} for i in range(5000)]
+    engine = PolicyEngine.from_config({'rules': rules})
+
+    assert engine.evaluate("svc4321.example.com").ttl == 60 + 4321
+    assert engine.evaluate("other.example.com").ttl == 300
+
+
+def test_watcher_reloads_on_change(tmp_path):
+    path = tmp_path / "policy.yml"
+    path.write_text("rules:\n  - match: '*.example.com'\n    ttl: 60\n")
+    changes = []
+    watcher = PolicyWatcher(str(path), on_change=changes.append)
+
+    assert watcher.engine.evaluate("a.example.com").ttl == 60
+    assert watcher.reload() is False
+
+    path.write_text("rules:\n  - match: '*.example.com'\n    ttl: 120\n")
+    os.utime(path, ns=(1, 1))
+    assert watcher.reload() is True
+    assert watcher.engine.evaluate("a.example.com").ttl == 120
+
+    # 文件无效时保留上一次的规则
+    path.write_text("rules: [\n")
+    assert watcher.reload() is False
+    assert watcher.engine.evaluate("a.example.com").ttl == 120
+
+
+def test_watcher_warns_about_missing_file(tmp_path, caplog):
+    path = tmp_path / "policy.yml"
+
+    with caplog.at_level("WARNING", logger="dns-manager"):
+        watcher = PolicyWatcher(str(path))
+    assert "does not exist" in caplog.text
+    assert watcher.engine.evaluate("a.example.com") == RecordPolicy()
+
+    # 文件创建后自动加载
+    path.write_text("default:\n  ttl: 60\n")
+    assert watcher.reload() is True
+    assert watcher.engine.evaluate("a.example.com").ttl == 60
+
+
+def test_watcher_keeps_rules_on_duplicate_group_names(tmp_path):
+    path = tmp_path / "policy.yml"
+    path.write_text("rules:\n  - match: '*.example.com'\n    ttl: 60\n")
+    watcher = PolicyWatcher(str(path))
+
+    path.write_text(
+        "rules:\n"
+        "  - regex: '^(?P<x>a)\\.example\\.com$'\n    ttl: 120\n"
+        "  - regex: '^(?P<x>b)\\.example\\.com$'\n    ttl: 600\n"
+    )
+    assert watcher.reload() is True
+    assert watcher.engine.evaluate("b.example.com").ttl == 600
@@ -0,0 +1,108 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from benchmarks.fake_dns import FakeDNSServer
+from propagation import PropagationVerifier, build_query, create_verifier, parse_resolvers, parse_response
+
+
+@pytest.fixture
+def fake_dns():
+    server = FakeDNSServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def verifier_factory():
+    verifiers = []
+
+    def factory(resolvers, **kwargs):
+        kwargs.setdefault('initial_delay', 0.05)
+        kwargs.setdefault('max_delay', 0.1)
+        kwargs.setdefault('query_timeout', 0.5)
+        verifier = PropagationVerifier(resolvers, **kwargs).start()
+        verifiers.append(verifier)
+        return verifier
+
+    yield factory
+    for verifier in verifiers:
+        verifier.stop()
+
+
+def test_parse_resolvers():
+    assert parse_resolvers("1.1.1.1, 127.0.0.1:5353") == [("1.1.1.1", 53), ("127.0.0.1", 5353)]
+    assert parse_resolvers("") == []
+
+    with pytest.raises(ValueError):
+        parse_resolvers("127.0.0.1:dns")
+
+
+def test_parse_response_ignores_mismatched_id():
+    query = build_query("app.example.com", 1234)
+    # 把查询报文改成应答，但事务 ID 不同
+    response = bytearray(query)
+    response[0:2] = (4321).to_bytes(2, "big")
+    response[2] |= 0x80
+
+    assert parse_response(bytes(response), 1234) is None
+
+
+def test_verify_waits_until_all_resolvers_answer(fake_dns, verifier_factory):
+    other = FakeDNSServer().start()
+    try:
+        on_resolved = MagicMock()
+        verifier = verifier_factory([fake_dns.address, other.address], on_resolved=on_resolved)
+
+        fake_dns.set_record("app.example.com", "203.0.113.1")
+        future = verifier.verify("app.example.com", "203.0.113.1")
+        time.sleep(0.2)
+        assert not future.done()
+
+        other.set_record("app.example.com", "203.0.113.1")
+        assert future.result(timeout=5) is not None
+        on_resolved.assert_called_once()
+        assert on_resolved.call_args.args[:2] == ("app.example.com", "203.0.113.1")
+        # 已确认的解析器不再重复查询
+        assert fake_dns.queries == 1
+    finally:
+        other.stop()
+
+
+def test_verify_rejects_stale_ip(fake_dns, verifier_factory):
+    on_timeout = MagicMock()
+    verifier = verifier_factory([fake_dns.address], on_timeout=on_timeout, deadline=0.3)
+    fake_dns.set_record("app.example.com", "198.51.100.1")
+
+    assert verifier.verify("app.example.com", "203.0.113.1").result(timeout=5) is None
+    on_timeout.assert_called_once()
+
+
+def test_verify_deduplicates_pending_names(fake_dns, verifier_factory):
+    verifier = verifier_factory([fake_dns.address], deadline=1)
+
+    first = verifier.verify("app.example.com")
+    assert verifier.verify("app.example.com") is first
+
+    fake_dns.set_record("app.example.com", "203.0.113.1")
+    assert first.result(timeout=5) is not None
+
+
+@patch('propagation.requests.post')
+def test_webhook_notified(mock_post, fake_dns, verifier_factory):
+    verifier = verifier_factory([fake_dns.address], webhook_url="http://hooks.local/dns")
+    fake_dns.set_record("app.example.com", "203.0.113.1")
+
+    verifier.verify("app.example.com", "203.0.113.1").result(timeout=5)
+
+    payload = mock_post.call_args.kwargs['json']
+    assert payload['name'] == "app.example.com"
+    assert payload['status'] == "resolved"
+
+
+def test_create_verifier_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("DNS_VERIFY", raising=False)
+    assert create_verifier() is None
+
+    monkeypatch.setenv("DNS_VERIFY", "true")
+    monkeypatch.setenv("DNS_VERIFY_RESOLVERS", "127.0.0.1:5353")
+    assert create_verifier().resolvers == [("127.0.0.1", 5353)]
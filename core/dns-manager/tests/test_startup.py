@@ -0,0 +1,101 @@
+import time
+import threading
+import pytest
+from startup import StartupPipeline, StartupStepSkipped
+
+
+def test_pipeline_respects_dependencies():
+    order = []
+    lock = threading.Lock()
+
+    def step(name, delay=0.0):
+        def fn():
+            time.sleep(delay)
+            with lock:
+                order.append(name)
+            return name
+        return fn
+
+    pipeline = StartupPipeline()
+    pipeline.add('slow', step('slow', 0.05))
+    pipeline.add('fast', step('fast'))
+    pipeline.add('after', step('after'), depends=('slow', 'fast'))
+
+    results = pipeline.run(timeout=5)
+
+    assert results == {'slow': 'slow', 'fast': 'fast', 'after': 'after'}
+    assert order.index('after') > order.index('slow')
+    assert order.index('after') > order.index('fast')
+    assert pipeline.result('slow') == 'slow'
+
+
+def test_pipeline_runs_independent_steps_concurrently():
+    pipeline = StartupPipeline()
+    for i in range(4):
+        pipeline.add(f"s{i}", lambda: time.sleep(0.1))
+
+    started = time.monotonic()
+    pipeline.run(timeout=5)
+
+    assert time.monotonic() - started < 0.3
+
+
+def test_optional_step_failure_does_not_block_dependents():
+    def fail():
+        raise RuntimeError("cloudflare down")
+
+    pipeline = StartupPipeline()
+    pipeline.add('index', fail, required=False)
+    pipeline.add('dispatch', lambda: 'ok', depends=('index',))
+
+    results = pipeline.run(timeout=5)
+
+    assert results == {'index': None, 'dispatch': 'ok'}
+    status = pipeline.status()
+    assert status['index']['state'] == 'failed'
+    assert status['index']['error'] == 'cloudflare down'
+    assert status['dispatch']['state'] == 'done'
+
+
+def test_required_step_failure_raises():
+    def fail():
+        raise RuntimeError("no ip")
+
+    pipeline = StartupPipeline()
+    pipeline.add('server_ip', fail)
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(timeout=5)
+
+
+def test_required_failure_skips_dependents():
+    ran = []
+
+    def fail():
+        raise RuntimeError("no ip")
+
+    pipeline = StartupPipeline()
+    pipeline.add('server_ip', fail)
+    pipeline.add('gate', lambda: ran.append('gate'), depends=('server_ip',))
+    pipeline.add('dispatch', lambda: ran.append('dispatch'), depends=('gate',), required=False)
+    pipeline.add('list', lambda: ran.append('list'), required=False)
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(timeout=5)
+
+    assert ran == ['list']
+    status = pipeline.status()
+    assert status['gate']['state'] == 'skipped'
+    assert 'server_ip' in status['gate']['error']
+    # 被跳过的可选步骤同样使其后续步骤跳过
+    assert status['dispatch']['state'] == 'skipped'
+    with pytest.raises(StartupStepSkipped):
+        pipeline.result('gate')
+
+
+def test_unknown_dependency_rejected():
+    pipeline = StartupPipeline()
+    pipeline.add('a', lambda: None, depends=('missing',))
+
+    with pytest.raises(ValueError):
+        pipeline.run()
@@ -1,6 +1,9 @@
+import time
 import pytest
 from unittest.mock import patch, MagicMock
-from utils import detect_ipv4, setup_logging, validate_ipv4
+from utils import (
+    RateLimiter, detect_ipv4, extract_hosts_from_rule, parse_docker_hosts, setup_logging, subdomain_for_host, validate_ipv4
+)
 
 
 def test_validate_ipv4_valid():
@@ -51,3 +54,60 @@ def test_setup_logging():
     logger = setup_logging("INFO")
     assert logger.level == 20  # INFO level
     assert logger.name == "dns-manager"
+
+
+def test_parse_docker_hosts_default():
+    assert parse_docker_hosts(None) == [("local", None, None)]
+    assert parse_docker_hosts("  ") == [("local", None, None)]
+
+
+def test_parse_docker_hosts_multiple():
+    hosts = parse_docker_hosts(
+        "local=unix:///var/run/docker.sock,"
+        "node2=tcp://10.0.0.2:2376=203.0.113.2,"
+        "node3=ssh://root@10.0.0.3=203.0.113.3"
+    )
+    assert hosts == [
+        ("local", "unix:///var/run/docker.sock", None),
+        ("node2", "tcp://10.0.0.2:2376", "203.0.113.2"),
+        ("node3", "ssh://root@10.0.0.3", "203.0.113.3"),
+    ]
+
+
+def test_parse_docker_hosts_invalid():
+    with pytest.raises(ValueError, match="Invalid DOCKER_HOSTS entry"):
+        parse_docker_hosts("node2")
+    with pytest.raises(ValueError, match="Invalid IPv4"):
+        parse_docker_hosts("node2=tcp://10.0.0.2:2376=999.0.0.1")
+    with pytest.raises(ValueError, match="Duplicate"):
+        parse_docker_hosts("a=tcp://h1:2375,a=tcp://h2:2375")
+
+
+def test_rate_limiter_throttles():
+    limiter = RateLimiter(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # 首个令牌立即可用,其余 5 个约需 0.1 秒
+    assert time.monotonic() - started >= 0.09
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(rate=0)
+    started = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.5
+
+
+def test_extract_hosts_from_rule():
+    rule = "Host(`a.example.com`) || Host(`b.example.com`, `c.example.com`) && PathPrefix(`/api`)"
+    assert extract_hosts_from_rule(rule) == ["a.example.com", "b.example.com", "c.example.com"]
+    assert extract_hosts_from_rule("HostRegexp(`{sub:[a-z]+}.example.com`)") == []
+
+
+def test_subdomain_for_host():
+    assert subdomain_for_host("app.example.com", "example.com") == "app"
+    assert subdomain_for_host("example.com", "example.com") == "@"
+    assert subdomain_for_host("*.example.com", "example.com") is None
+    assert subdomain_for_host("app.other.com", "example.com") is None
@@ -1,7 +1,12 @@
+import os
 import re
+import time
 import logging
+import threading
 import requests
-from typing import Optional
+from typing import List, Optional, Tuple
+
+from common import structured_logging
 
 
 def validate_ipv4(ip: Optional[str]) -> bool:
@@ -49,24 +54,128 @@ def detect_ipv4() -> str:
     raise Exception("Failed to detect IPv4 address from all services")
 
 
+def extract_hosts_from_rule(rule: str) -> List[str]:
+    """
+    从 Traefik 路由规则中提取所有 Host 域名
+
+    支持 Host(`a`) || Host(`b`)、Host(`a`, `b`) 以及标签中转义的 \\`，
+    Docker 标签和 file provider 的规则共用此解析
+    """
+    hosts = []
+    for args in re.findall(r'\bHost\(([^)]*)\)', rule):
+        hosts.extend(re.findall(r'[`"\\]+([^`"\\,\s]+)[`"\\]+', args))
+    return hosts
+
+
+def subdomain_for_host(host: str, base_domain: str) -> Optional[str]:
+    """
+    将完整域名转换为子域名
+
+    Returns:
+        子域名，主域名本身为 "@"；泛域名或不属于 base_domain 时为 None
+    """
+    if host.startswith('*'):
+        return None
+    if host.endswith(f".{base_domain}"):
+        return host[:-len(base_domain) - 1]
+    if host == base_domain:
+        return "@"
+    return None
+
+
 def setup_logging(level: str = "INFO") -> logging.Logger:
     """
     配置日志系统
-    输出 JSON 格式日志便于 Loki 采集
+    输出 JSON 格式日志便于 Loki 采集,写入在后台线程完成
+
+    可选环境变量:
+        LOG_SAMPLE_BURST: 每个调用位置每个周期最多输出的 DEBUG 条数(默认 10,0 表示不采样)
+        LOG_SAMPLE_INTERVAL: 采样周期秒数(默认 60)
     """
-    logger = logging.getLogger("dns-manager")
-    logger.setLevel(getattr(logging, level.upper()))
+    return structured_logging.setup_logging(
+        "dns-manager",
+        level,
+        sample_burst=int(os.getenv("LOG_SAMPLE_BURST", "10")),
+        sample_interval=float(os.getenv("LOG_SAMPLE_INTERVAL", "60"))
+    )
 
-    # 控制台处理器
-    handler = logging.StreamHandler()
-    handler.setLevel(getattr(logging, level.upper()))
 
-    # JSON 格式
-    formatter = logging.Formatter(
-        '{"timestamp":"%(asctime)s","level":"%(levelname)s","message":"%(message)s"}',
-        datefmt='%Y-%m-%dT%H:%M:%SZ'
-    )
-    handler.setFormatter(formatter)
+def is_local_docker_url(url: Optional[str]) -> bool:
+    """Docker 主机是否为本机 daemon（未指定地址或 unix socket）"""
+    return url is None or url.startswith('unix://')
+
+
+def parse_docker_hosts(spec: Optional[str]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    解析 DOCKER_HOSTS 配置
+
+    格式: 逗号分隔的 name=url[=ip] 条目,例如
+        local=unix:///var/run/docker.sock,node2=tcp://10.0.0.2:2376=203.0.113.2,node3=ssh://root@10.0.0.3=203.0.113.3
+    未指定 ip 的主机使用自动检测到的本机公网 IP
+
+    Returns:
+        [(name, url, ip)],未配置时返回单个本地主机 [("local", None, None)]
+    """
+    if not spec or not spec.strip():
+        return [("local", None, None)]
+
+    hosts = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        parts = entry.split('=')
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            raise ValueError(f"Invalid DOCKER_HOSTS entry: {entry}")
+
+        name, url = parts[0].strip(), parts[1].strip()
+        ip = parts[2].strip() if len(parts) == 3 else None
+        if ip is not None and not validate_ipv4(ip):
+            raise ValueError(f"Invalid IPv4 address for docker host {name}: {ip}")
+
+        hosts.append((name, url, ip))
+
+    names = [h[0] for h in hosts]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate docker host names in DOCKER_HOSTS")
+
+    return hosts
+
+
+class RateLimiter:
+    """
+    线程安全的令牌桶限流器
+    所有线程共享同一个实例,acquire 在令牌不足时阻塞等待
+    """
 
-    logger.addHandler(handler)
-    return logger
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数,<= 0 表示不限流
+            burst: 桶容量,默认等于 rate(至少为 1)
+        """
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
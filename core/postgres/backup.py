@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL 备份工具
+
+按数据库并行导出，压缩后直接流式写入磁盘，并维护带校验和的备份索引（manifest.json），
+保留策略只作用于索引中记录的备份。运行结果以 Prometheus textfile 格式输出，
+由 node-exporter 的 textfile collector 采集。
+
+两种模式:
+  docker（默认）: 通过 docker exec -i 在 postgres 容器内执行 pg_dump（custom 格式），
+                  输出经 zstd / pigz（多线程）压缩后写入文件，不落中间文件
+  local:          本机 pg_dump 直连数据库，使用 directory 格式 + pg_dump -j 并行导出，
+                  各表文件由 pg_dump 自行压缩；可用于对本地 Postgres 测试
+
+使用方法:
+    python3 backup.py                                # 备份并按保留策略清理
+    python3 backup.py --mode local --host 127.0.0.1  # 使用本机 pg_dump
+    python3 backup.py list                           # 列出索引中的备份
+    python3 backup.py verify [backup_id]             # 校验备份文件（默认最新一次）
+    python3 backup.py prune                          # 只执行保留策略
+
+恢复（docker 模式）:
+    zstd -dc <db>.dump.zst | docker exec -i postgres pg_restore -U <user> -d <db> --clean
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import subprocess
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+logger = logging.getLogger("pg-backup")
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "manifest.json"
+
+
+class BackupError(Exception):
+    """导出或压缩失败"""
+
+
+class Compressor:
+    """
+    压缩方式
+
+    zstd、pigz 为外部多线程压缩进程，导出进程的 stdout 直接接到其 stdin；
+    都不可用时在 Python 中用 zlib 输出 gzip 格式
+    """
+
+    def __init__(self, name: str, command, suffix: str, level: int):
+        self.name = name
+        self.command = command
+        self.suffix = suffix
+        self.level = level
+
+    @classmethod
+    def choose(cls, preference: str, level: int, threads: int) -> "Compressor":
+        if preference in ("auto", "zstd") and shutil.which("zstd"):
+            return cls("zstd", ["zstd", "-q", "-c", f"-{level}", f"-T{threads}"], ".zst", level)
+        if preference in ("auto", "pigz", "gzip") and shutil.which("pigz"):
+            return cls("pigz", ["pigz", "-c", f"-{level}", "-p", str(threads)], ".gz", level)
+        if preference not in ("auto", "gzip"):
+            raise BackupError(f"压缩程序 {preference} 不可用")
+        return cls("gzip", None, ".gz", min(level, 9))
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stream_to_file(command: list, compressor: Compressor, path: str, env: dict = None) -> dict:
+    """
+    执行导出命令并将压缩后的输出写入 path
+
+    数据经管道流转，写入时同步计算 sha256；先写入临时文件，成功后再重命名
+
+    Returns:
+        {'size': ..., 'sha256': ...}
+    """
+    tmp_path = path + ".partial"
+    digest = hashlib.sha256()
+    size = 0
+    renamed = False
+
+    try:
+        with tempfile.TemporaryFile() as dump_err, tempfile.TemporaryFile() as comp_err, open(tmp_path, "wb") as out:
+            dump = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=dump_err, env=env)
+            comp = None
+            zlib_stream = None
+            if compressor.command:
+                comp = subprocess.Popen(compressor.command, stdin=dump.stdout, stdout=subprocess.PIPE, stderr=comp_err)
+                # 管道只由压缩进程持有，导出进程退出时压缩进程才能读到 EOF
+                dump.stdout.close()
+                source = comp.stdout
+            else:
+                source = dump.stdout
+                zlib_stream = zlib.compressobj(compressor.level, zlib.DEFLATED, 31)
+
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            try:
+                while True:
+                    n = source.readinto(view)
+                    if not n:
+                        break
+                    data = zlib_stream.compress(view[:n]) if zlib_stream else view[:n]
+                    digest.update(data)
+                    out.write(data)
+                    size += len(data)
+                if zlib_stream:
+                    data = zlib_stream.flush()
+                    digest.update(data)
+                    out.write(data)
+                    size += len(data)
+                out.flush()
+                os.fsync(out.fileno())
+            finally:
+                source.close()
+                dump_code = dump.wait()
+                comp_code = comp.wait() if comp else 0
+
+            if dump_code != 0 or comp_code != 0:
+                dump_err.seek(0)
+                comp_err.seek(0)
+                message = (dump_err.read() + comp_err.read()).decode(errors="replace").strip()
+                raise BackupError(f"退出码 {dump_code}/{comp_code}: {message[-500:]}")
+
+        os.rename(tmp_path, path)
+        renamed = True
+    finally:
+        # 任何失败（命令不存在、磁盘写满、中断）都不留下不完整的文件
+        if not renamed and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+class Postgres:
+    """构造在容器内或本机执行的 PostgreSQL 客户端命令"""
+
+    def __init__(self, mode: str, container: str, user: str, host: str = None, port: int = None, bin_dir: str = None):
+        self.mode = mode
+        self.container = container
+        self.user = user
+        self.host = host
+        self.port = port
+        self.bin_dir = bin_dir
+
+    def command(self, program: str, *args) -> list:
+        connection = []
+        if self.user:
+            connection += ["-U", self.user]
+        if self.mode == "local":
+            if self.host:
+                connection += ["-h", self.host]
+            if self.port:
+                connection += ["-p", str(self.port)]
+            binary = os.path.join(self.bin_dir, program) if self.bin_dir else program
+            return [binary, *connection, *args]
+
+        # 不能使用 -t: 伪终端会转换换行符，破坏二进制输出
+        env = ["-e", "PGPASSWORD"] if os.getenv("PGPASSWORD") else []
+        return ["docker", "exec", "-i", *env, self.container, program, *connection, *args]
+
+    def list_databases(self) -> list:
+        query = "SELECT datname FROM pg_database WHERE datallowconn AND NOT datistemplate ORDER BY datname"
+        result = subprocess.run(
+            self.command("psql", "-d", "postgres", "-At", "-c", query),
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise BackupError(f"列出数据库失败: {result.stderr.strip()}")
+        return [line for line in result.stdout.splitlines() if line]
+
+
+class Manifest:
+    """
+    备份索引
+
+    每次备份追加一条记录（文件路径、大小、sha256、耗时），写入时先写临时文件再原子替换。
+    清理只删除索引中记录的目录，不按修改时间盲删
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.backups = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.backups = json.load(f).get("backups", [])
+
+    def add(self, entry: dict):
+        self.backups = [b for b in self.backups if b["id"] != entry["id"]]
+        self.backups.append(entry)
+        self.backups.sort(key=lambda b: b["started_at"])
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "backups": self.backups}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get(self, backup_id: str = None) -> dict:
+        if backup_id is None:
+            ok = [b for b in self.backups if b["status"] == "ok"]
+            return ok[-1] if ok else None
+        return next((b for b in self.backups if b["id"] == backup_id), None)
+
+    def last_success(self) -> dict:
+        return self.get()
+
+    def prune(self, keep: int, retention_days: float) -> list:
+        """
+        保留最近 keep 个成功备份，以及 retention_days 天内的所有备份
+
+        Returns:
+            被删除的备份 ID
+        """
+        cutoff = time.time() - retention_days * 86400
+        ok_ids = [b["id"] for b in self.backups if b["status"] == "ok"]
+        protected = set(ok_ids[-keep:]) if keep > 0 else set()
+
+        removed = []
+        for backup in list(self.backups):
+            if backup["id"] in protected or backup["started_at"] >= cutoff:
+                continue
+            shutil.rmtree(os.path.join(self.root, backup["id"]), ignore_errors=True)
+            self.backups.remove(backup)
+            removed.append(backup["id"])
+
+        if removed:
+            self.save()
+        return removed
+
+
+def dump_database(pg: Postgres, database: str, target: str, compressor: Compressor, jobs: int) -> dict:
+    """导出单个数据库，返回索引中的文件记录"""
+    started = time.monotonic()
+    if pg.mode == "local":
+        # directory 格式: pg_dump -j 并行导出各表并各自压缩，直接写入目标目录
+        path = os.path.join(target, f"{database}.dir")
+        method = "zstd" if compressor.name == "zstd" else "gzip"
+        result = subprocess.run(
+            pg.command("pg_dump", "-Fd", "-j", str(jobs), "-Z", f"{method}:{compressor.level}", "-f", path, database),
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            shutil.rmtree(path, ignore_errors=True)
+            raise BackupError(result.stderr.strip()[-500:])
+        files = {}
+        for name in sorted(os.listdir(path)):
+            files[name] = {"size": os.path.getsize(os.path.join(path, name)), "sha256": sha256_file(os.path.join(path, name))}
+        record = {
+            "format": "directory",
+            "compression": method,
+            "size": sum(f["size"] for f in files.values()),
+            "files": files
+        }
+    else:
+        # custom 格式不压缩，由外部压缩程序多线程压缩；可用 pg_restore 选择性恢复
+        path = os.path.join(target, f"{database}.dump{compressor.suffix}")
+        record = {"format": "custom", "compression": compressor.name}
+        record.update(stream_to_file(pg.command("pg_dump", "-Fc", "-Z0", database), compressor, path))
+
+    record["database"] = database
+    record["path"] = os.path.relpath(path, os.path.dirname(target))
+    record["duration_seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def dump_globals(pg: Postgres, target: str, compressor: Compressor) -> dict:
+    """导出角色和表空间定义，恢复数据库前需要先恢复"""
+    started = time.monotonic()
+    path = os.path.join(target, f"globals.sql{compressor.suffix}")
+    record = {"database": "_globals", "format": "plain", "compression": compressor.name}
+    record.update(stream_to_file(pg.command("pg_dumpall", "--globals-only"), compressor, path))
+    record["path"] = os.path.relpath(path, os.path.dirname(target))
+    record["duration_seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def write_metrics(path: str, manifest: Manifest, entry: dict):
+    """以 Prometheus textfile 格式写入本次备份指标（原子替换）"""
+    lines = []
+
+    def metric(name, help_text, samples, kind="gauge"):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    last_success = manifest.last_success()
+    metric("pg_backup_last_run_timestamp_seconds", "Start time of the last backup run", [({}, entry["started_at"])])
+    metric("pg_backup_last_status", "1 if the last backup run succeeded", [({}, 1 if entry["status"] == "ok" else 0)])
+    metric("pg_backup_last_success_timestamp_seconds", "Start time of the last successful backup",
+           [({}, last_success["started_at"] if last_success else 0)])
+    metric("pg_backup_duration_seconds", "Wall time of the last backup run", [({}, entry["duration_seconds"])])
+    metric("pg_backup_size_bytes", "Size of the last backup run", [({}, entry["total_bytes"])])
+
+    per_db = [f for f in entry["files"] if "size" in f]
+    metric("pg_backup_database_size_bytes", "Compressed dump size per database",
+           [({"database": f["database"]}, f["size"]) for f in per_db])
+    metric("pg_backup_database_duration_seconds", "Dump duration per database",
+           [({"database": f["database"]}, f["duration_seconds"]) for f in per_db])
+    metric("pg_backup_database_throughput_bytes_per_second", "Compressed bytes written per second per database",
+           [({"database": f["database"]}, round(f["size"] / f["duration_seconds"], 1) if f["duration_seconds"] else 0)
+            for f in per_db])
+
+    retained = [b for b in manifest.backups if b["status"] == "ok"]
+    metric("pg_backup_retained_count", "Successful backups kept by the retention policy", [({}, len(retained))])
+    metric("pg_backup_retained_bytes", "Total size of retained backups", [({}, sum(b["total_bytes"] for b in retained))])
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def run_backup(args) -> int:
+    pg = Postgres(args.mode, args.container, args.user, args.host, args.port, args.pg_bin_dir)
+    cpus = os.cpu_count() or 1
+    compressor = Compressor.choose(args.compress, args.level, max(1, cpus // args.parallel))
+    manifest = Manifest(args.backup_dir)
+
+    backup_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if manifest.get(backup_id) or os.path.exists(os.path.join(args.backup_dir, backup_id)):
+        backup_id += f"_{os.getpid()}"
+    target = os.path.join(args.backup_dir, backup_id)
+    os.makedirs(target)
+
+    started_at = time.time()
+    started = time.monotonic()
+    entry = {
+        "id": backup_id,
+        "started_at": round(started_at, 3),
+        "started_at_iso": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        "mode": args.mode,
+        "status": "ok",
+        "files": [],
+        "errors": []
+    }
+
+    try:
+        databases = args.database or pg.list_databases()
+        logger.info(f"备份 {len(databases)} 个数据库到 {target}（并行 {args.parallel}，压缩 {compressor.name}）")
+
+        jobs = args.jobs or max(1, cpus // args.parallel)
+        with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+            futures = {pool.submit(dump_database, pg, db, target, compressor, jobs): db for db in databases}
+            if not args.no_globals:
+                futures[pool.submit(dump_globals, pg, target, compressor)] = "_globals"
+
+            for future, database in futures.items():
+                try:
+                    record = future.result()
+                    entry["files"].append(record)
+                    logger.info(f"✓ {database}: {record['size'] / 1024 / 1024:.1f} MB, {record['duration_seconds']}s")
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["errors"].append(f"{database}: {e}")
+                    logger.error(f"✗ {database}: {e}")
+    except (BackupError, OSError) as e:
+        entry["status"] = "failed"
+        entry["errors"].append(str(e))
+        logger.error(str(e))
+
+    entry["files"].sort(key=lambda f: f["database"])
+    entry["duration_seconds"] = round(time.monotonic() - started, 3)
+    entry["total_bytes"] = sum(f["size"] for f in entry["files"])
+    manifest.add(entry)
+
+    if entry["status"] == "ok":
+        logger.info(f"备份完成: {backup_id}, {entry['total_bytes'] / 1024 / 1024:.1f} MB, {entry['duration_seconds']}s")
+        removed = manifest.prune(args.keep, args.retention_days)
+        if removed:
+            logger.info(f"按保留策略删除 {len(removed)} 个旧备份: {', '.join(removed)}")
+    else:
+        logger.error(f"备份失败: {backup_id}，不执行清理")
+
+    if args.metrics_file:
+        write_metrics(args.metrics_file, manifest, entry)
+
+    return 0 if entry["status"] == "ok" else 1
+
+
+def verify_backup(args) -> int:
+    manifest = Manifest(args.backup_dir)
+    backup = manifest.get(args.backup_id)
+    if backup is None:
+        logger.error("索引中没有对应的备份")
+        return 1
+
+    problems = 0
+    for record in backup["files"]:
+        path = os.path.join(args.backup_dir, record["path"])
+        checks = [(os.path.join(path, name), f) for name, f in record["files"].items()] \
+            if record["format"] == "directory" else [(path, record)]
+        for file_path, expected in checks:
+            if not os.path.exists(file_path):
+                logger.error(f"✗ 缺失: {file_path}")
+                problems += 1
+            elif sha256_file(file_path) != expected["sha256"]:
+                logger.error(f"✗ 校验和不匹配: {file_path}")
+                problems += 1
+
+    if problems:
+        logger.error(f"备份 {backup['id']} 校验失败: {problems} 个问题")
+        return 1
+    logger.info(f"备份 {backup['id']} 校验通过（{len(backup['files'])} 个数据库）")
+    return 0
+
+
+def list_backups(args) -> int:
+    manifest = Manifest(args.backup_dir)
+    for backup in manifest.backups:
+        databases = ", ".join(f["database"] for f in backup["files"])
+        print(f"{backup['id']}  {backup['status']:<6}  {backup['total_bytes'] / 1024 / 1024:>10.1f} MB  "
+              f"{backup['duration_seconds']:>8.1f}s  {databases}")
+    return 0
+
+
+def prune_backups(args) -> int:
+    manifest = Manifest(args.backup_dir)
+    removed = manifest.prune(args.keep, args.retention_days)
+    logger.info(f"删除 {len(removed)} 个旧备份" + (f": {', '.join(removed)}" if removed else ""))
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PostgreSQL 并行流式备份")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "list", "verify", "prune"])
+    parser.add_argument("backup_id", nargs="?", help="verify 的备份 ID，默认最新的成功备份")
+    parser.add_argument("--backup-dir", default=os.getenv("BACKUP_DIR", "../data/backups/postgres"), help="备份根目录")
+    parser.add_argument("--mode", choices=["docker", "local"], default=os.getenv("BACKUP_MODE", "docker"))
+    parser.add_argument("--container", default=os.getenv("POSTGRES_CONTAINER", "postgres"), help="docker 模式的容器名")
+    parser.add_argument("--user", "-U", default=os.getenv("POSTGRES_USER"), help="数据库用户")
+    parser.add_argument("--host", default=None, help="local 模式的主机（默认使用 PGHOST）")
+    parser.add_argument("--port", type=int, default=None, help="local 模式的端口（默认使用 PGPORT）")
+    parser.add_argument("--pg-bin-dir", default=None, help="local 模式的 pg_dump/psql 所在目录")
+    parser.add_argument("--database", "-d", action="append", help="只备份指定数据库，可重复；默认全部")
+    parser.add_argument("--no-globals", action="store_true", help="不导出角色和表空间")
+    parser.add_argument("--parallel", type=int, default=int(os.getenv("BACKUP_PARALLEL", "2")), help="同时导出的数据库数")
+    parser.add_argument("--jobs", type=int, default=None, help="local 模式下每个数据库的 pg_dump -j")
+    parser.add_argument("--compress", choices=["auto", "zstd", "pigz", "gzip"], default=os.getenv("BACKUP_COMPRESS", "auto"))
+    parser.add_argument("--level", type=int, default=3, help="压缩级别")
+    parser.add_argument("--keep", type=int, default=int(os.getenv("BACKUP_KEEP", "7")), help="至少保留的成功备份数")
+    parser.add_argument("--retention-days", type=float, default=float(os.getenv("BACKUP_RETENTION_DAYS", "7")),
+                        help="保留天数，超过且不在最近 --keep 个之内的备份会被删除")
+    parser.add_argument("--metrics-file", default=os.getenv("BACKUP_METRICS_FILE"),
+                        help="Prometheus textfile 输出路径（node-exporter textfile collector 目录下的 .prom 文件）")
+    args = parser.parse_args(argv)
+    args.parallel = max(1, args.parallel)
+    return args
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    os.makedirs(args.backup_dir, exist_ok=True)
+
+    commands = {"run": run_backup, "list": list_backups, "verify": verify_backup, "prune": prune_backups}
+    return commands[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
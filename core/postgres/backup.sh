@@ -1,36 +1,19 @@
 #!/bin/bash
 
 # PostgreSQL 数据库备份脚本
-# 使用方法: ./backup.sh
+# 使用方法: ./backup.sh [backup.py 参数]
+#
+# 实际备份由 backup.py 完成（并行导出、多线程压缩、带校验和的索引、Prometheus 指标），
+# 本脚本保留原有入口和默认目录。指标写入仓库根目录 data/node-exporter/textfile，
+# 由 node-exporter 采集；不写指标时 PostgreSQLBackupStale 告警会误报
 
 set -e
 
-# 配置
-BACKUP_DIR="../data/backups/postgres"
-CONTAINER_NAME="postgres"
-DATE=$(date +%Y%m%d_%H%M%S)
-BACKUP_FILE="${BACKUP_DIR}/postgres_backup_${DATE}.sql.gz"
-RETENTION_DAYS=7
+cd "$(dirname "$0")"
 
-# 创建备份目录
-mkdir -p "${BACKUP_DIR}"
-
-echo "开始备份 PostgreSQL 数据库..."
-echo "备份文件: ${BACKUP_FILE}"
-
-# 执行备份
-docker exec -t ${CONTAINER_NAME} pg_dumpall -c -U ${POSTGRES_USER} | gzip > "${BACKUP_FILE}"
-
-if [ $? -eq 0 ]; then
-    echo "备份成功完成!"
-    echo "文件大小: $(du -h ${BACKUP_FILE} | cut -f1)"
-
-    # 删除超过保留天数的旧备份
-    echo "清理 ${RETENTION_DAYS} 天前的旧备份..."
-    find "${BACKUP_DIR}" -name "postgres_backup_*.sql.gz" -type f -mtime +${RETENTION_DAYS} -delete
-
-    echo "备份任务完成!"
-else
-    echo "备份失败!"
-    exit 1
-fi
+exec python3 backup.py \
+    --backup-dir "${BACKUP_DIR:-../data/backups/postgres}" \
+    --container "${CONTAINER_NAME:-postgres}" \
+    --retention-days "${RETENTION_DAYS:-7}" \
+    --metrics-file "${METRICS_FILE:-../../data/node-exporter/textfile/pg_backup.prom}" \
+    "$@"
@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+import backup
+from backup import BackupError, Compressor, Manifest, stream_to_file, write_metrics
+
+
+PAYLOAD = b"pg_dump output\n" * 200000
+
+# 伪造的导出命令和压缩命令，用当前解释器代替 pg_dump / zstd
+DUMP = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'pg_dump output\\n' * 200000)"]
+FAILING_DUMP = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'partial'); sys.stderr.write('connection lost'); sys.exit(3)"]
+COPY = [sys.executable, "-c", "import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"]
+FAILING_COPY = [sys.executable, "-c", "import sys; sys.stdin.buffer.read(); sys.stderr.write('disk full'); sys.exit(2)"]
+
+
+def entry(backup_id, started_at, status="ok", size=100):
+    return {
+        "id": backup_id,
+        "started_at": started_at,
+        "status": status,
+        "duration_seconds": 2.0,
+        "total_bytes": size,
+        "files": [{"database": "app", "size": size, "duration_seconds": 2.0}] if status == "ok" else []
+    }
+
+
+def test_stream_through_compressor(tmp_path):
+    path = str(tmp_path / "app.dump.raw")
+
+    result = stream_to_file(DUMP, Compressor("copy", COPY, ".raw", 1), path)
+
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert result == {"size": len(PAYLOAD), "sha256": hashlib.sha256(PAYLOAD).hexdigest()}
+    assert not os.path.exists(path + ".partial")
+
+
+def test_stream_with_zlib_fallback(tmp_path):
+    path = str(tmp_path / "app.dump.gz")
+
+    result = stream_to_file(DUMP, Compressor("gzip", None, ".gz", 6), path)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    assert gzip.decompress(data) == PAYLOAD
+    assert result["size"] == len(data)
+
+
+@pytest.mark.parametrize("dump, compress, message", [
+    (FAILING_DUMP, COPY, "connection lost"),
+    (DUMP, FAILING_COPY, "disk full"),
+])
+def test_stream_failure_removes_partial(tmp_path, dump, compress, message):
+    path = str(tmp_path / "app.dump.raw")
+
+    with pytest.raises(BackupError, match=message):
+        stream_to_file(dump, Compressor("copy", compress, ".raw", 1), path)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_missing_command_removes_partial(tmp_path):
+    path = str(tmp_path / "app.dump.raw")
+
+    with pytest.raises(OSError):
+        stream_to_file(["/nonexistent/pg_dump"], Compressor("copy", COPY, ".raw", 1), path)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_prune_keeps_recent_and_last_successful(tmp_path):
+    now = time.time()
+    manifest = Manifest(str(tmp_path))
+    for backup_id, age_days, status in [
+        ("b1", 30, "ok"), ("b2", 20, "ok"), ("b3", 15, "failed"), ("b4", 10, "ok"), ("b5", 1, "ok")
+    ]:
+        os.makedirs(tmp_path / backup_id)
+        manifest.add(entry(backup_id, now - age_days * 86400, status))
+
+    removed = manifest.prune(keep=2, retention_days=7)
+
+    # b5 在保留期内，b4 是保留期外最近的成功备份；失败的 b3 不计入 keep
+    assert removed == ["b1", "b2", "b3"]
+    assert [b["id"] for b in Manifest(str(tmp_path)).backups] == ["b4", "b5"]
+    assert sorted(os.listdir(tmp_path)) == ["b4", "b5", "manifest.json"]
+
+
+def test_prune_within_retention_keeps_everything(tmp_path):
+    now = time.time()
+    manifest = Manifest(str(tmp_path))
+    for i in range(3):
+        manifest.add(entry(f"b{i}", now - i * 3600))
+
+    assert manifest.prune(keep=0, retention_days=1) == []
+    assert len(manifest.backups) == 3
+
+
+def test_write_metrics(tmp_path):
+    manifest = Manifest(str(tmp_path / "backups"))
+    os.makedirs(manifest.root)
+    manifest.add(entry("b1", 1000.0, size=300))
+    failed = entry("b2", 2000.0, status="failed")
+    manifest.add(failed)
+    path = tmp_path / "textfile" / "pg_backup.prom"
+
+    write_metrics(str(path), manifest, failed)
+
+    lines = path.read_text().splitlines()
+    assert "# TYPE pg_backup_last_status gauge" in lines
+    assert "pg_backup_last_status 0" in lines
+    assert "pg_backup_last_run_timestamp_seconds 2000.0" in lines
+    # 失败的运行不更新最近一次成功时间
+    assert "pg_backup_last_success_timestamp_seconds 1000.0" in lines
+    assert "pg_backup_retained_count 1" in lines
+    assert "pg_backup_retained_bytes 300" in lines
+    assert not (tmp_path / "textfile" / "pg_backup.prom.tmp").exists()
+
+
+def test_write_metrics_per_database(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    run = entry("b1", 1000.0, size=4096)
+    manifest.add(run)
+    path = tmp_path / "pg_backup.prom"
+
+    write_metrics(str(path), manifest, run)
+
+    text = path.read_text()
+    assert 'pg_backup_database_size_bytes{database="app"} 4096' in text
+    assert 'pg_backup_database_throughput_bytes_per_second{database="app"} 2048.0' in text
+
+
+@pytest.mark.skipif(not shutil.which("pg_dump") or not os.getenv("PGHOST"),
+                    reason="需要本机 pg_dump 和可连接的 PostgreSQL（PGHOST）")
+def test_local_mode_backup_and_verify(tmp_path):
+    # 真实执行 pg_dump -Fd -j，连接参数取自 PGHOST / PGPORT / PGUSER / PGPASSWORD
+    database = os.getenv("PGDATABASE", "postgres")
+    backup_dir = str(tmp_path / "backups")
+
+    assert backup.main(["run", "--mode", "local", "--backup-dir", backup_dir, "-d", database,
+                        "--no-globals", "--jobs", "2", "--compress", "gzip"]) == 0
+
+    run = Manifest(backup_dir).last_success()
+    assert run is not None and run["mode"] == "local"
+    [record] = run["files"]
+    assert record["database"] == database
+    assert record["format"] == "directory"
+    assert "toc.dat" in record["files"]
+    dump_dir = os.path.join(backup_dir, record["path"])
+    assert sorted(os.listdir(dump_dir)) == sorted(record["files"])
+    assert record["size"] == sum(f["size"] for f in record["files"].values())
+
+    assert backup.main(["verify", "--backup-dir", backup_dir]) == 0
+
+    # 篡改任一文件后校验失败
+    with open(os.path.join(dump_dir, "toc.dat"), "ab") as f:
+        f.write(b"\0")
+    assert backup.main(["verify", run["id"], "--backup-dir", backup_dir]) == 1
@@ -0,0 +1,170 @@
+"""
+告警生命周期状态表
+
+按 fingerprint 记录已发送过短信的告警,用于在告警恢复时发送一条
+"已恢复,持续 N 分钟"的短信。表大小有上限,超出时按 LRU 淘汰最久未
+更新的告警,避免高基数标签导致内存无限增长。
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def alert_fingerprint(alert):
+    """
+    获取告警 fingerprint
+
+    AlertManager 会为每个告警附带 fingerprint,缺失时按标签计算
+    """
+    fingerprint = alert.get('fingerprint')
+    if fingerprint:
+        return fingerprint
+
+    labels = alert.get('labels', {})
+    raw = '\x00'.join(f'{k}={labels[k]}' for k in sorted(labels))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_timestamp(value):
+    """解析 AlertManager 的 RFC3339 时间,无效值(如 0001-01-01)返回 None"""
+    if not value or value.startswith('0001-'):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class AlertRecord:
+    """单个已通知告警的状态"""
+
+    __slots__ = ('fingerprint', 'alertname', 'instance', 'started_at', 'notified_at')
+
+    def __init__(self, fingerprint, alertname, instance, started_at, notified_at):
+        self.fingerprint = fingerprint
+        self.alertname = alertname
+        self.instance = instance
+        self.started_at = started_at
+        self.notified_at = notified_at
+
+
+class AlertStateTable:
+    """线程安全的有界 LRU 告警状态表"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.evictions = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def mark_notified(self, alerts, now=None):
+        """
+        记录已发送短信的 firing 告警
+
+        Args:
+            alerts: AlertManager payload 中的告警列表
+            now: 当前时间戳,默认 time.time()
+
+        Returns:
+            int: 本次因超出上限被淘汰的告警数
+        """
+        now = now or time.time()
+        evicted = 0
+
+        with self._lock:
+            for alert in alerts:
+                if alert.get('status', 'firing') != 'firing':
+                    continue
+
+                fingerprint = alert_fingerprint(alert)
+                record = self._records.get(fingerprint)
+                if record is not None:
+                    record.notified_at = now
+                    self._records.move_to_end(fingerprint)
+                    continue
+
+                labels = alert.get('labels', {})
+                self._records[fingerprint] = AlertRecord(
+                    fingerprint=fingerprint,
+                    alertname=labels.get('alertname', 'Unknown'),
+                    instance=labels.get('instance', 'unknown'),
+                    started_at=parse_timestamp(alert.get('startsAt')) or now,
+                    notified_at=now
+                )
+
+                while len(self._records) > self.max_size:
+                    self._records.popitem(last=False)
+                    self.evictions += 1
+                    evicted += 1
+
+        return evicted
+
+    def resolve(self, alerts):
+        """
+        查找恢复的告警,不从表中移除
+
+        恢复短信发送成功后再调用 discard 移除;发送失败时状态保留,
+        AlertManager 重试时仍能找到这些告警
+
+        Args:
+            alerts: AlertManager payload 中的告警列表
+
+        Returns:
+            list: 此前发送过短信、现已恢复的 (AlertRecord, 恢复时间戳)
+        """
+        resolved = []
+
+        with self._lock:
+            for alert in alerts:
+                if alert.get('status') != 'resolved':
+                    continue
+
+                record = self._records.get(alert_fingerprint(alert))
+                if record is not None:
+                    ended_at = parse_timestamp(alert.get('endsAt')) or time.time()
+                    resolved.append((record, ended_at))
+
+        return resolved
+
+    def discard(self, resolved):
+        """
+        从表中移除已恢复的告警
+
+        Args:
+            resolved: resolve 的返回值
+        """
+        with self._lock:
+            for record, _ in resolved:
+                # 期间重新 firing 的告警已是新记录,不移除
+                if self._records.get(record.fingerprint) is record:
+                    del self._records[record.fingerprint]
+
+
+def format_resolved(resolved):
+    """
+    将恢复的告警压缩为一条短信模板参数
+
+    Args:
+        resolved: AlertStateTable.resolve 的返回值(非空)
+
+    Returns:
+        dict: 与 firing 短信相同字段的模板参数
+    """
+    record, ended_at = max(resolved, key=lambda item: item[1] - item[0].started_at)
+    minutes = max(1, int(round((ended_at - record.started_at) / 60)))
+
+    summary = f"已恢复,持续 {minutes} 分钟"
+    if len(resolved) > 1:
+        summary += f"(共 {len(resolved)} 条)"
+
+    return {
+        'alertname': record.alertname,
+        'instance': record.instance,
+        'summary': summary
+    }
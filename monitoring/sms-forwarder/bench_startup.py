@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+
+在独立子进程中多次测量:
+  - import:  导入 main 模块(创建 Flask 应用)的耗时
+  - health:  导入后首次 /health 请求完成的耗时
+  - warm_up: 预热钩子(导入短信 SDK、创建客户端)的耗时
+
+使用方法: python bench_startup.py [--runs 10] [--json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 子进程中执行的测量代码,输出一行 JSON
+_PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main.app.test_client().get('/health')
+t2 = time.perf_counter()
+main.warm_up()
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'health': t2 - t0, 'warm_up': t3 - t2}))
+'''
+
+
+def run_once(env):
+    """启动一个全新解释器测量一次,返回各阶段耗时(秒)"""
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sms-forwarder 启动耗时基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='测量次数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # 使用占位凭证,使预热阶段真正导入 SDK
+    env.setdefault('ALIYUN_ACCESS_KEY', 'bench')
+    env.setdefault('ALIYUN_ACCESS_SECRET', 'bench')
+    env['SMS_WARMUP'] = 'false'
+
+    samples = [run_once(env) for _ in range(args.runs)]
+
+    report = {}
+    for stage in ('import', 'health', 'warm_up'):
+        values = sorted(s[stage] * 1000 for s in samples)
+        report[stage] = {
+            'median_ms': round(statistics.median(values), 2),
+            'min_ms': round(values[0], 2),
+            'max_ms': round(values[-1], 2)
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"runs: {args.runs}")
+    for stage, r in report.items():
+        print(f"{stage:>8}: median {r['median_ms']:.2f} ms  (min {r['min_ms']:.2f}, max {r['max_ms']:.2f})")
+
+
+if __name__ == '__main__':
+    main()
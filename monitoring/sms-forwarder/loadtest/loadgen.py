@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+sms-forwarder 压测工具
+
+按固定速率(开环)回放录制的 AlertManager payload 到 /webhook/sms 和
+/webhook/default,统计 p50/p99 延迟、吞吐量和响应状态分布。
+延迟从计划发送时间算起(避免协调遗漏): 工作线程占满导致请求排队时,
+排队时间计入延迟;service_p99_ms 为不含排队的服务端耗时。
+
+使用方法:
+  python loadtest/loadgen.py --target http://127.0.0.1:5000 --rate 200 --duration 30
+  python loadtest/loadgen.py --payloads loadtest/payloads --endpoints sms --max-p99-ms 50
+  python loadtest/loadgen.py --target https://sms.example.com --rate 20
+
+--max-p99-ms / --min-throughput 未达标时以非零状态退出,便于在 CI 中发现回归。
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import threading
+import http.client
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# percentile 与 dns-manager 基准测试共用，位于仓库根目录的 common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from common.latency import percentile  # noqa: E402
+
+
+DEFAULT_PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+
+def load_payloads(path):
+    """读取目录下所有 *.json payload(或单个文件)"""
+    files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, '*.json')))
+    payloads = []
+    for name in files:
+        with open(name, 'rb') as f:
+            payloads.append(f.read())
+    if not payloads:
+        raise SystemExit(f"No payloads found in {path}")
+    return payloads
+
+
+class LoadGenerator:
+    """开环压测: 按计划时间发出请求,不因服务变慢而降低发送速率"""
+
+    def __init__(self, target, payloads, endpoints, rate, duration, concurrency, timeout=10.0):
+        url = urllib.parse.urlsplit(target)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f"Unsupported target {target}, expected http(s)://host[:port]")
+        self.host = url.hostname
+        self.https = url.scheme == 'https'
+        self.port = url.port or (443 if self.https else 80)
+        self.payloads = payloads
+        self.endpoints = [f'/webhook/{e}' for e in endpoints]
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.service_times = []
+        self.statuses = Counter()
+
+    def _connection(self):
+        # 每个工作线程复用一个 keep-alive 连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = connection_class(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, path, body, scheduled):
+        """scheduled 为计划发送时间(perf_counter),延迟从此刻算起"""
+        started = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            status = str(response.status)
+        except Exception as e:
+            self._local.conn = None
+            status = type(e).__name__
+        finished = time.perf_counter()
+
+        with self._lock:
+            self.latencies.append(finished - scheduled)
+            self.service_times.append(finished - started)
+            self.statuses[f'{path} {status}'] += 1
+
+    def run(self):
+        total = int(self.rate * self.duration)
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i in range(total):
+                scheduled = started + i / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                path = self.endpoints[i % len(self.endpoints)]
+                body = self.payloads[i % len(self.payloads)]
+                pool.submit(self._send, path, body, scheduled)
+
+        elapsed = time.perf_counter() - started
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'service_p99_ms': round(percentile(self.service_times, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            'statuses': dict(self.statuses)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sms-forwarder 压测工具')
+    parser.add_argument('--target', default='http://127.0.0.1:5000', help='sms-forwarder 地址')
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS, help='payload 目录或文件')
+    parser.add_argument('--endpoints', default='sms,default', help='逗号分隔: sms,default')
+    parser.add_argument('--rate', type=float, default=50.0, help='每秒请求数')
+    parser.add_argument('--duration', type=float, default=10.0, help='持续时间(秒)')
+    parser.add_argument('--concurrency', type=int, default=32, help='最大并发请求数')
+    parser.add_argument('--max-p99-ms', type=float, default=None, help='p99 延迟上限')
+    parser.add_argument('--min-throughput', type=float, default=None, help='吞吐量下限(rps)')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    try:
+        generator = LoadGenerator(
+            target=args.target,
+            payloads=load_payloads(args.payloads),
+            endpoints=[e.strip() for e in args.endpoints.split(',') if e.strip()],
+            rate=args.rate,
+            duration=args.duration,
+            concurrency=args.concurrency
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    report = generator.run()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"requests:   {report['requests']} in {report['elapsed_s']}s")
+        print(f"throughput: {report['throughput_rps']} rps")
+        print(f"latency:    p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, max {report['max_ms']} ms")
+        print(f"service:    p99 {report['service_p99_ms']} ms (excluding queueing)")
+        for key, count in sorted(report['statuses'].items()):
+            print(f"  {key}: {count}")
+
+    failed = False
+    if args.max_p99_ms is not None and report['p99_ms'] > args.max_p99_ms:
+        print(f"FAIL: p99 {report['p99_ms']} ms > {args.max_p99_ms} ms", file=sys.stderr)
+        failed = True
+    if args.min_throughput is not None and report['throughput_rps'] < args.min_throughput:
+        print(f"FAIL: throughput {report['throughput_rps']} rps < {args.min_throughput} rps", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+本地模拟短信服务器
+
+实现 providers.HTTPSMSProvider 使用的接口,可模拟延迟、错误率和限流,
+用于在不发送真实短信的情况下压测 sms-forwarder。
+
+使用方法:
+  python loadtest/mock_sms_server.py --port 8025 --latency-ms 80 --jitter-ms 40 \\
+      --error-rate 0.01 --rate-limit 50
+
+  SMS_PROVIDER=http SMS_PROVIDER_URL=http://127.0.0.1:8025/send python main.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TokenBucket:
+    """令牌桶限流器,rate <= 0 表示不限流"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return True
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class MockSMSServer(ThreadingHTTPServer):
+    """模拟短信服务器,记录收到的请求数量和结果"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0, seed=None):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit)
+        self.random = random.Random(seed)
+        self.counts = {'OK': 0, 'isv.BUSINESS_LIMIT_CONTROL': 0, 'isp.SYSTEM_ERROR': 0}
+        self.lock = threading.Lock()
+
+    def decide(self):
+        """决定本次请求的延迟(秒)和响应码"""
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self.random.random() < self.error_rate
+
+        if not self.bucket.acquire():
+            code = 'isv.BUSINESS_LIMIT_CONTROL'
+        elif failed:
+            code = 'isp.SYSTEM_ERROR'
+        else:
+            code = 'OK'
+
+        with self.lock:
+            self.counts[code] += 1
+        return delay, code
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+
+        delay, code = self.server.decide()
+        if delay:
+            time.sleep(delay)
+
+        status = {'OK': 200, 'isv.BUSINESS_LIMIT_CONTROL': 429}.get(code, 500)
+        self._reply(status, {'Code': code, 'Message': code, 'RequestId': 'mock'})
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server.lock:
+                self._reply(200, dict(self.server.counts))
+        else:
+            self._reply(200, {'status': 'ok'})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟短信服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='平均响应延迟')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='延迟抖动(均匀分布)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回系统错误的比例 0-1')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='每秒允许的请求数,超出返回限流错误')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockSMSServer(
+        (args.host, args.port),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed
+    )
+    print(f"Mock SMS server listening on http://{args.host}:{args.port}/send")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
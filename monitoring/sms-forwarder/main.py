@@ -2,30 +2,55 @@
 """
 短信转发服务 - 接收 AlertManager Webhook 并发送短信通知
 
-支持阿里云短信和腾讯云短信 API
+短信服务商见 providers.py,通过 SMS_PROVIDER 选择
 """
 
 import os
-import json
 import logging
+import time
+import threading
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 
-# 阿里云短信 SDK
-try:
-    from aliyunsdkcore.client import AcsClient
-    from aliyunsdkcore.request import CommonRequest
-    ALIYUN_AVAILABLE = True
-except ImportError:
-    ALIYUN_AVAILABLE = False
-    logging.warning("阿里云 SDK 未安装,短信功能将不可用")
+from providers import create_provider
+from alert_state import AlertStateTable, alert_fingerprint, format_resolved
+from common.structured_logging import log_context, setup_logging
+from common.health_probes import BackgroundProber
 
 app = Flask(__name__)
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Prometheus 指标
+webhook_requests = Counter(
+    'sms_webhook_requests_total', 'Webhook requests received', ['endpoint', 'outcome']
+)
+webhook_alerts_per_payload = Histogram(
+    'sms_webhook_alerts_per_payload', 'Number of alerts in each webhook payload',
+    ['endpoint'], buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+webhook_skipped = Counter(
+    'sms_webhook_skipped_total', 'Webhook payloads skipped without sending', ['reason']
+)
+sms_send_results = Counter(
+    'sms_send_total', 'SMS send attempts by provider result code', ['provider', 'code']
+)
+alert_state_size = Gauge(
+    'sms_alert_state_size', 'Notified alerts tracked for resolve notifications'
+)
+alert_state_evictions = Counter(
+    'sms_alert_state_evictions', 'Alerts evicted from the state table by LRU'
+)
+stage_duration = Histogram(
+    'sms_stage_duration_seconds', 'Duration of each processing stage', ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+# 配置日志: JSON 格式,写入在后台线程完成
+setup_logging(
+    None,
+    os.getenv('LOG_LEVEL', 'INFO'),
+    sample_burst=int(os.getenv('LOG_SAMPLE_BURST', '10')),
+    sample_interval=float(os.getenv('LOG_SAMPLE_INTERVAL', '60'))
 )
 logger = logging.getLogger(__name__)
 
@@ -35,59 +60,70 @@ ALIYUN_ACCESS_SECRET = os.getenv('ALIYUN_ACCESS_SECRET', '')
 ALIYUN_SMS_SIGN = os.getenv('ALIYUN_SMS_SIGN', '')
 ALIYUN_SMS_TEMPLATE = os.getenv('ALIYUN_SMS_TEMPLATE', '')
 ALERT_PHONE = os.getenv('ALERT_PHONE', '')
+# 恢复短信模板,未配置时使用告警模板,summary 字段填写恢复信息
+ALIYUN_SMS_RESOLVED_TEMPLATE = os.getenv('ALIYUN_SMS_RESOLVED_TEMPLATE') or None
+ALERT_STATE_MAX = int(os.getenv('ALERT_STATE_MAX', '10000'))
+
+SMS_WARMUP = os.getenv('SMS_WARMUP', 'false').lower() == 'true'
+
+# 短信服务商,由 SMS_PROVIDER 选择(aliyun / http)
+sms_provider = create_provider()
+
+# 服务商可达性由后台线程定期探测,/health 和 /ready 只读取缓存结果
+provider_up = Gauge('sms_provider_up', 'Result of the last provider reachability probe')
+prober = BackgroundProber(
+    interval=float(os.getenv('HEALTH_PROBE_INTERVAL', '30')),
+    timeout=float(os.getenv('HEALTH_PROBE_TIMEOUT', '5')),
+    on_result=lambda name, ok: provider_up.set(1 if ok else 0),
+    logger=logger
+)
+# 服务商不可达时重启本服务无济于事,只影响就绪状态
+prober.add('provider', sms_provider.probe, critical=False)
+
+# 已发送短信的告警,用于发送恢复通知
+alert_state = AlertStateTable(max_size=ALERT_STATE_MAX)
+
+
+def warm_up():
+    """
+    预热钩子: 提前导入短信 SDK 并创建客户端
 
-# 初始化阿里云客户端
-aliyun_client = None
-if ALIYUN_AVAILABLE and ALIYUN_ACCESS_KEY and ALIYUN_ACCESS_SECRET:
-    aliyun_client = AcsClient(ALIYUN_ACCESS_KEY, ALIYUN_ACCESS_SECRET, 'cn-hangzhou')
-    logger.info("阿里云短信客户端初始化成功")
-else:
-    logger.warning("阿里云短信客户端未配置")
+    可在 gunicorn 的 post_worker_init 中调用,或设置 SMS_WARMUP=true
+    在启动后由后台线程执行,不阻塞 /health 的就绪
+    """
+    return sms_provider.warm_up()
 
 
-def send_aliyun_sms(phone, template_param):
+def send_sms(phone, template_param, template=None):
     """
-    发送阿里云短信
+    通过当前短信服务商发送短信
 
     Args:
         phone: 手机号
         template_param: 模板参数字典
+        template: 模板编号,默认使用服务商配置的模板
 
     Returns:
         bool: 发送是否成功
     """
-    if not aliyun_client:
-        logger.error("阿里云客户端未初始化")
-        return False
+    provider = sms_provider.name
 
     try:
-        request = CommonRequest()
-        request.set_accept_format('json')
-        request.set_domain('dysmsapi.aliyuncs.com')
-        request.set_method('POST')
-        request.set_protocol_type('https')
-        request.set_version('2017-05-25')
-        request.set_action_name('SendSms')
-
-        request.add_query_param('PhoneNumbers', phone)
-        request.add_query_param('SignName', ALIYUN_SMS_SIGN)
-        request.add_query_param('TemplateCode', ALIYUN_SMS_TEMPLATE)
-        request.add_query_param('TemplateParam', json.dumps(template_param))
-
-        response = aliyun_client.do_action_with_exception(request)
-        result = json.loads(response)
-
-        if result.get('Code') == 'OK':
-            logger.info(f"短信发送成功: {phone}")
-            return True
-        else:
-            logger.error(f"短信发送失败: {result.get('Message')}")
-            return False
-
+        with stage_duration.labels('send_provider_call').time():
+            result = sms_provider.send(phone, template_param, template)
     except Exception as e:
+        sms_send_results.labels(provider, 'exception').inc()
         logger.error(f"短信发送异常: {str(e)}")
         return False
 
+    sms_send_results.labels(provider, result.code).inc()
+
+    if result.success:
+        logger.info(f"短信发送成功: {phone}")
+    else:
+        logger.error(f"短信发送失败: {result.code} {result.message}")
+    return result.success
+
 
 def parse_alertmanager_payload(payload):
     """
@@ -131,12 +167,38 @@ def parse_alertmanager_payload(payload):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """健康检查端点"""
+    """健康检查端点(存活): 关键探测项失败时返回 503,附带服务商探测的缓存结果"""
+    checks = prober.snapshot()
+    # 首轮探测完成前没有结果,报告 starting 而不是 503,避免启动期间被重启
+    starting = not prober.started()
+    healthy = starting or prober.healthy(checks)
+    if starting:
+        status = 'starting'
+    else:
+        status = 'healthy' if healthy else 'unhealthy'
     return jsonify({
-        'status': 'healthy',
+        'status': status,
         'timestamp': datetime.now().isoformat(),
-        'aliyun_configured': aliyun_client is not None
-    })
+        'provider': sms_provider.name,
+        'provider_configured': sms_provider.configured(),
+        'provider_loaded': sms_provider.loaded(),
+        'provider_reachable': checks['provider']['ok'],
+        'checks': checks
+    }), 200 if healthy else 503
+
+
+@app.route('/ready', methods=['GET'])
+def ready_check():
+    """就绪检查端点: 服务商不可达或探测结果过期时返回 503"""
+    checks = prober.snapshot()
+    ready = all(check['ok'] for check in checks.values())
+    return jsonify({'ready': ready, 'checks': checks}), 200 if ready else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标端点"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
 
 @app.route('/webhook/sms', methods=['POST'])
@@ -144,55 +206,98 @@ def webhook_sms():
     """
     接收 AlertManager webhook 并发送短信
 
-    只处理 firing 状态的告警,resolved 不发送短信
+    firing 的 critical 告警发送短信并记录到状态表;告警组恢复时,
+    仅对此前发送过短信的告警发送一条恢复短信。firing 组中单独恢复的
+    告警只从状态表移除,不单独通知。
     """
+    started = time.perf_counter()
     try:
         payload = request.get_json()
-        logger.info(f"收到 webhook 请求: {payload.get('status')}")
-
-        # 解析告警信息
-        alert_info = parse_alertmanager_payload(payload)
-
-        # 只处理 firing 状态的告警
-        if alert_info['status'] != 'firing':
-            logger.info("告警已恢复,跳过短信发送")
-            return jsonify({'status': 'skipped', 'reason': 'resolved'})
-
-        # 只处理 critical 级别的告警
-        if alert_info['severity'] != 'critical':
-            logger.info(f"告警级别为 {alert_info['severity']},跳过短信发送")
-            return jsonify({'status': 'skipped', 'reason': 'not_critical'})
-
-        # 构造短信模板参数
-        # 根据你的阿里云短信模板调整参数
-        template_param = {
-            'alertname': alert_info['alertname'],
-            'instance': alert_info['instance'],
-            'summary': alert_info['summary'][:50]  # 限制长度
-        }
-
-        # 发送短信
-        success = send_aliyun_sms(ALERT_PHONE, template_param)
-
-        if success:
-            return jsonify({
-                'status': 'success',
-                'message': '短信发送成功',
-                'alert': alert_info
-            })
-        else:
-            return jsonify({
-                'status': 'failed',
-                'message': '短信发送失败',
-                'alert': alert_info
-            }), 500
+        alerts = payload.get('alerts', [])
+        fingerprint = alert_fingerprint(alerts[0]) if alerts else None
+
+        with log_context(fingerprint=fingerprint, receiver=payload.get('receiver')):
+            logger.info(f"收到 webhook 请求: {payload.get('status')}")
+
+            # 解析告警信息
+            with stage_duration.labels('webhook_parse').time():
+                alert_info = parse_alertmanager_payload(payload)
+            webhook_alerts_per_payload.labels('sms').observe(alert_info['count'])
+
+            resolved = alert_state.resolve(alerts)
+
+            # 告警组已恢复: 只通知此前发送过短信的告警，发送成功后才移除状态
+            if alert_info['status'] != 'firing':
+                if not resolved:
+                    logger.info("告警已恢复,此前未发送短信,跳过")
+                    webhook_skipped.labels('resolved').inc()
+                    webhook_requests.labels('sms', 'skipped').inc()
+                    return jsonify({'status': 'skipped', 'reason': 'resolved'})
+
+                with stage_duration.labels('webhook_send').time():
+                    success = send_sms(ALERT_PHONE, format_resolved(resolved), ALIYUN_SMS_RESOLVED_TEMPLATE)
+
+                if success:
+                    alert_state.discard(resolved)
+                    alert_state_size.set(len(alert_state))
+                webhook_requests.labels('sms', 'resolved_sent' if success else 'failed').inc()
+                return jsonify({
+                    'status': 'resolved_sent' if success else 'failed',
+                    'resolved': len(resolved),
+                    'alert': alert_info
+                }), 200 if success else 500
+
+            # firing 组中单独恢复的告警不单独通知
+            if resolved:
+                alert_state.discard(resolved)
+                alert_state_size.set(len(alert_state))
+
+            # 只处理 critical 级别的告警
+            if alert_info['severity'] != 'critical':
+                logger.info(f"告警级别为 {alert_info['severity']},跳过短信发送")
+                webhook_skipped.labels('not_critical').inc()
+                webhook_requests.labels('sms', 'skipped').inc()
+                return jsonify({'status': 'skipped', 'reason': 'not_critical'})
+
+            # 构造短信模板参数
+            # 根据你的阿里云短信模板调整参数
+            template_param = {
+                'alertname': alert_info['alertname'],
+                'instance': alert_info['instance'],
+                'summary': alert_info['summary'][:50]  # 限制长度
+            }
+
+            # 发送短信
+            with stage_duration.labels('webhook_send').time():
+                success = send_sms(ALERT_PHONE, template_param)
+
+            if success:
+                evicted = alert_state.mark_notified(alerts)
+                alert_state_size.set(len(alert_state))
+                alert_state_evictions.inc(evicted)
+                webhook_requests.labels('sms', 'success').inc()
+                return jsonify({
+                    'status': 'success',
+                    'message': '短信发送成功',
+                    'alert': alert_info
+                })
+            else:
+                webhook_requests.labels('sms', 'failed').inc()
+                return jsonify({
+                    'status': 'failed',
+                    'message': '短信发送失败',
+                    'alert': alert_info
+                }), 500
 
     except Exception as e:
+        webhook_requests.labels('sms', 'error').inc()
         logger.error(f"处理 webhook 异常: {str(e)}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
+    finally:
+        stage_duration.labels('webhook_total').observe(time.perf_counter() - started)
 
 
 @app.route('/webhook/default', methods=['POST'])
@@ -201,6 +306,8 @@ def webhook_default():
     try:
         payload = request.get_json()
         alert_info = parse_alertmanager_payload(payload)
+        webhook_alerts_per_payload.labels('default').observe(alert_info['count'])
+        webhook_requests.labels('default', 'logged').inc()
         logger.info(f"收到默认 webhook: {alert_info}")
 
         return jsonify({
@@ -209,6 +316,7 @@ def webhook_default():
         })
 
     except Exception as e:
+        webhook_requests.labels('default', 'error').inc()
         logger.error(f"处理默认 webhook 异常: {str(e)}")
         return jsonify({
             'status': 'error',
@@ -216,13 +324,28 @@ def webhook_default():
         }), 500
 
 
+# 诊断端点仅在显式开启时导入和注册
+if os.getenv('DEBUG_ENDPOINTS', 'false').lower() == 'true':
+    from common.debug_endpoints import register_debug_routes
+    register_debug_routes(app)
+
+
 if __name__ == '__main__':
     # 检查必要的环境变量
     if not ALERT_PHONE:
         logger.warning("未配置 ALERT_PHONE 环境变量")
 
-    if not all([ALIYUN_ACCESS_KEY, ALIYUN_ACCESS_SECRET, ALIYUN_SMS_SIGN, ALIYUN_SMS_TEMPLATE]):
+    if sms_provider.name == 'aliyun' and \
+            not all([ALIYUN_ACCESS_KEY, ALIYUN_ACCESS_SECRET, ALIYUN_SMS_SIGN, ALIYUN_SMS_TEMPLATE]):
         logger.warning("阿里云短信配置不完整,短信功能将不可用")
+    elif not sms_provider.configured():
+        logger.warning(f"短信服务商 {sms_provider.name} 未配置,短信功能将不可用")
+
+    prober.start()
+
+    # 后台预热 SDK,不阻塞服务启动
+    if SMS_WARMUP:
+        threading.Thread(target=warm_up, name='sms-warmup', daemon=True).start()
 
     # 启动 Flask 应用
     app.run(host='0.0.0.0', port=5000, debug=False)
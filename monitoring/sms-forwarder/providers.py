@@ -0,0 +1,246 @@
+"""
+短信服务商适配层
+
+每个服务商实现 SMSProvider 接口,由 SMS_PROVIDER 环境变量选择:
+  - aliyun: 阿里云短信(默认),SDK 在首次发送时才导入
+  - http:   通用 HTTP JSON 接口,用于本地模拟短信服务器和压测
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+logger = logging.getLogger(__name__)
+
+
+class SendResult:
+    """一次发送的结果"""
+
+    __slots__ = ('success', 'code', 'message')
+
+    def __init__(self, success, code, message=''):
+        self.success = success
+        self.code = code
+        self.message = message
+
+    def __bool__(self):
+        return self.success
+
+
+class SMSProvider:
+    """短信服务商接口"""
+
+    name = 'base'
+
+    def configured(self):
+        """是否具备发送所需的配置(不触发 SDK 导入或网络请求)"""
+        raise NotImplementedError
+
+    def loaded(self):
+        """客户端是否已初始化"""
+        return True
+
+    def warm_up(self):
+        """预热: 提前完成 SDK 导入、连接建立等一次性开销"""
+        return self.configured()
+
+    def endpoint(self):
+        """服务商接口地址 (host, port),用于可达性探测"""
+        return None
+
+    def probe(self, timeout=3.0):
+        """
+        检查服务商是否可达: 只建立 TCP 连接,不发送短信也不消耗调用额度
+
+        Returns:
+            'host:port'
+
+        Raises:
+            未配置或连接失败时抛出异常
+        """
+        if not self.configured():
+            raise RuntimeError(f"短信服务商 {self.name} 未配置")
+
+        host, port = self.endpoint()
+        with socket.create_connection((host, port), timeout=timeout):
+            pass
+        return f"{host}:{port}"
+
+    def send(self, phone, template_param, template=None):
+        """
+        发送短信
+
+        Args:
+            phone: 手机号
+            template_param: 模板参数字典
+            template: 模板编号,默认使用服务商配置的模板
+
+        Returns:
+            SendResult
+        """
+        raise NotImplementedError
+
+
+class AliyunSMSProvider(SMSProvider):
+    """阿里云短信,客户端在首次发送时才创建,避免每个 worker 启动时都导入 SDK"""
+
+    name = 'aliyun'
+
+    def __init__(self, access_key, access_secret, sign_name, template_code, region='cn-hangzhou'):
+        self.access_key = access_key
+        self.access_secret = access_secret
+        self.sign_name = sign_name
+        self.template_code = template_code
+        self.region = region
+        self._client = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def configured(self):
+        return bool(self.access_key and self.access_secret)
+
+    def loaded(self):
+        return self._client is not None
+
+    def endpoint(self):
+        return 'dysmsapi.aliyuncs.com', 443
+
+    def _get_client(self):
+        if self._client is not None or self._load_failed:
+            return self._client
+
+        if not self.configured():
+            return None
+
+        with self._lock:
+            if self._client is None and not self._load_failed:
+                try:
+                    from aliyunsdkcore.client import AcsClient
+                except ImportError:
+                    self._load_failed = True
+                    logger.warning("阿里云 SDK 未安装,短信功能将不可用")
+                    return None
+
+                self._client = AcsClient(self.access_key, self.access_secret, self.region)
+                logger.info("阿里云短信客户端初始化成功")
+
+        return self._client
+
+    def warm_up(self):
+        client = self._get_client()
+        if client is not None:
+            from aliyunsdkcore.request import CommonRequest  # noqa: F401
+        return client is not None
+
+    def send(self, phone, template_param, template=None):
+        client = self._get_client()
+        if not client:
+            logger.error("阿里云客户端未初始化")
+            return SendResult(False, 'not_configured')
+
+        from aliyunsdkcore.request import CommonRequest
+
+        request = CommonRequest()
+        request.set_accept_format('json')
+        request.set_domain('dysmsapi.aliyuncs.com')
+        request.set_method('POST')
+        request.set_protocol_type('https')
+        request.set_version('2017-05-25')
+        request.set_action_name('SendSms')
+
+        request.add_query_param('PhoneNumbers', phone)
+        request.add_query_param('SignName', self.sign_name)
+        request.add_query_param('TemplateCode', template or self.template_code)
+        request.add_query_param('TemplateParam', json.dumps(template_param))
+
+        response = client.do_action_with_exception(request)
+        result = json.loads(response)
+
+        code = result.get('Code', 'unknown')
+        return SendResult(code == 'OK', code, result.get('Message', ''))
+
+
+class HTTPSMSProvider(SMSProvider):
+    """
+    通用 HTTP 短信接口
+
+    POST JSON {"phone": ..., "template": ..., "template_param": {...}} 到 url,
+    响应格式与阿里云一致: {"Code": "OK", "Message": "..."}
+    """
+
+    name = 'http'
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def configured(self):
+        return bool(self.url)
+
+    def endpoint(self):
+        url = urllib.parse.urlsplit(self.url)
+        return url.hostname, url.port or (443 if url.scheme == 'https' else 80)
+
+    def send(self, phone, template_param, template=None):
+        if not self.url:
+            logger.error("未配置 SMS_PROVIDER_URL")
+            return SendResult(False, 'not_configured')
+
+        body = json.dumps({
+            'phone': phone,
+            'template': template,
+            'template_param': template_param
+        }).encode('utf-8')
+        req = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # 限流等错误也按 JSON 返回 Code,尽量保留原始错误码
+            try:
+                result = json.loads(e.read())
+            except ValueError:
+                return SendResult(False, f'http_{e.code}', str(e))
+
+        code = result.get('Code', 'unknown')
+        return SendResult(code == 'OK', code, result.get('Message', ''))
+
+
+def create_provider(name=None):
+    """
+    根据环境变量创建短信服务商
+
+    Args:
+        name: 服务商名称,默认读取 SMS_PROVIDER
+
+    Returns:
+        SMSProvider 实例
+    """
+    name = (name or os.getenv('SMS_PROVIDER', 'aliyun')).lower()
+
+    if name == 'aliyun':
+        return AliyunSMSProvider(
+            access_key=os.getenv('ALIYUN_ACCESS_KEY', ''),
+            access_secret=os.getenv('ALIYUN_ACCESS_SECRET', ''),
+            sign_name=os.getenv('ALIYUN_SMS_SIGN', ''),
+            template_code=os.getenv('ALIYUN_SMS_TEMPLATE', '')
+        )
+    if name == 'http':
+        return HTTPSMSProvider(
+            url=os.getenv('SMS_PROVIDER_URL', ''),
+            timeout=float(os.getenv('SMS_PROVIDER_TIMEOUT', '5'))
+        )
+
+    raise ValueError(f"Unknown SMS provider: {name}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 共享模块位于仓库根目录的 common 包（镜像中为 /app/common）
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
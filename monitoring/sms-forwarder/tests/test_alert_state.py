@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import main
+from alert_state import AlertStateTable, alert_fingerprint, format_resolved
+
+
+def make_alert(fingerprint, status='firing', severity='critical'):
+    return {
+        'status': status,
+        'fingerprint': fingerprint,
+        'labels': {'alertname': 'HighCPU', 'instance': f'{fingerprint}:9100', 'severity': severity},
+        'annotations': {'summary': 'CPU 使用率过高'},
+        'startsAt': '2026-01-01T00:00:00Z',
+        'endsAt': '2026-01-01T00:10:00Z' if status == 'resolved' else '0001-01-01T00:00:00Z'
+    }
+
+
+def payload(alerts, status):
+    return {'status': status, 'receiver': 'sms', 'alerts': alerts}
+
+
+def test_max_size_bound_and_lru_eviction():
+    table = AlertStateTable(max_size=2)
+
+    assert table.mark_notified([make_alert('a'), make_alert('b')]) == 0
+    # 再次通知 a 使其成为最近使用
+    table.mark_notified([make_alert('a')])
+    assert table.mark_notified([make_alert('c')]) == 1
+
+    assert len(table) == 2
+    assert table.evictions == 1
+    assert table.resolve([make_alert('b', 'resolved')]) == []
+    assert len(table.resolve([make_alert('a', 'resolved'), make_alert('c', 'resolved')])) == 2
+
+
+def test_resolve_keeps_state_until_discarded():
+    table = AlertStateTable()
+    table.mark_notified([make_alert('a')])
+
+    resolved = table.resolve([make_alert('a', 'resolved')])
+    assert len(resolved) == 1
+    assert len(table) == 1
+    assert format_resolved(resolved)['summary'] == '已恢复,持续 10 分钟'
+
+    table.discard(resolved)
+    assert len(table) == 0
+    assert table.resolve([make_alert('a', 'resolved')]) == []
+
+
+def test_fingerprint_from_labels():
+    alert = make_alert('x')
+    del alert['fingerprint']
+    assert alert_fingerprint(alert) == alert_fingerprint(dict(alert))
+
+
+def test_webhook_firing_resolved_retry(monkeypatch):
+    monkeypatch.setattr(main, 'alert_state', AlertStateTable())
+    client = main.app.test_client()
+
+    with patch.object(main, 'send_sms', return_value=True):
+        response = client.post('/webhook/sms', json=payload([make_alert('a')], 'firing'))
+    assert response.json['status'] == 'success'
+    assert len(main.alert_state) == 1
+
+    # 恢复短信发送失败: 返回 500 且保留状态，AlertManager 重试时仍会发送
+    resolved = payload([make_alert('a', 'resolved')], 'resolved')
+    with patch.object(main, 'send_sms', return_value=False):
+        response = client.post('/webhook/sms', json=resolved)
+    assert response.status_code == 500
+    assert len(main.alert_state) == 1
+
+    with patch.object(main, 'send_sms', return_value=True) as send:
+        response = client.post('/webhook/sms', json=resolved)
+    assert response.json['status'] == 'resolved_sent'
+    assert send.call_args.args[1]['summary'].startswith('已恢复')
+    assert len(main.alert_state) == 0
+
+    with patch.object(main, 'send_sms') as send:
+        response = client.post('/webhook/sms', json=resolved)
+    assert response.json['status'] == 'skipped'
+    send.assert_not_called()
@@ -0,0 +1,43 @@
+import main
+from common.health_probes import BackgroundProber
+
+
+def unreachable():
+    raise ConnectionError('provider unreachable')
+
+
+def make_prober(critical):
+    prober = BackgroundProber(interval=30, timeout=1)
+    prober.add('provider', unreachable, critical=critical)
+    return prober
+
+
+def test_health_starting_before_first_probe(monkeypatch):
+    monkeypatch.setattr(main, 'prober', make_prober(critical=True))
+
+    response = main.app.test_client().get('/health')
+    assert response.status_code == 200
+    assert response.json['status'] == 'starting'
+
+
+def test_health_503_when_critical_probe_fails(monkeypatch):
+    prober = make_prober(critical=True)
+    prober.run_once()
+    monkeypatch.setattr(main, 'prober', prober)
+
+    response = main.app.test_client().get('/health')
+    assert response.status_code == 503
+    assert response.json['status'] == 'unhealthy'
+
+
+def test_health_ignores_non_critical_probe(monkeypatch):
+    # 服务商不可达只影响 /ready
+    prober = make_prober(critical=False)
+    prober.run_once()
+    monkeypatch.setattr(main, 'prober', prober)
+    client = main.app.test_client()
+
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.json['status'] == 'healthy'
+    assert client.get('/ready').status_code == 503
@@ -0,0 +1,111 @@
+from unittest.mock import patch
+
+from prometheus_client.parser import text_string_to_metric_families
+
+import main
+from alert_state import AlertStateTable
+from providers import SendResult
+
+
+def make_alert(fingerprint, status='firing', severity='critical'):
+    return {
+        'status': status,
+        'fingerprint': fingerprint,
+        'labels': {'alertname': 'HighCPU', 'instance': f'{fingerprint}:9100', 'severity': severity},
+        'annotations': {'summary': 'CPU 使用率过高'},
+        'startsAt': '2026-01-01T00:00:00Z'
+    }
+
+
+def payload(alerts, status):
+    return {'status': status, 'receiver': 'sms', 'alerts': alerts}
+
+
+def scrape(client):
+    """抓取 /metrics，返回 {(样本名, 标签): 值}"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    samples = {}
+    for family in text_string_to_metric_families(response.get_data(as_text=True)):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return samples
+
+
+def delta(before, after, name, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+
+def send_delta(before, after, code):
+    return delta(before, after, 'sms_send_total', provider=main.sms_provider.name, code=code)
+
+
+def stage_count(before, after, stage):
+    return delta(before, after, 'sms_stage_duration_seconds_count', stage=stage)
+
+
+def test_metrics_on_skipped(monkeypatch):
+    monkeypatch.setattr(main, 'alert_state', AlertStateTable())
+    client = main.app.test_client()
+    before = scrape(client)
+
+    with patch.object(main.sms_provider, 'send') as send:
+        client.post('/webhook/sms', json=payload([make_alert('a', severity='warning')], 'firing'))
+        client.post('/webhook/sms', json=payload([make_alert('b', 'resolved')], 'resolved'))
+    send.assert_not_called()
+
+    after = scrape(client)
+    assert delta(before, after, 'sms_webhook_requests_total', endpoint='sms', outcome='skipped') == 2
+    assert delta(before, after, 'sms_webhook_skipped_total', reason='not_critical') == 1
+    assert delta(before, after, 'sms_webhook_skipped_total', reason='resolved') == 1
+    assert stage_count(before, after, 'webhook_parse') == 2
+    assert stage_count(before, after, 'webhook_total') == 2
+    assert stage_count(before, after, 'webhook_send') == 0
+
+
+def test_metrics_on_failed(monkeypatch):
+    monkeypatch.setattr(main, 'alert_state', AlertStateTable())
+    client = main.app.test_client()
+    before = scrape(client)
+
+    result = SendResult(False, 'isv.BUSINESS_LIMIT_CONTROL', '触发流控')
+    with patch.object(main.sms_provider, 'send', return_value=result):
+        response = client.post('/webhook/sms', json=payload([make_alert('a')], 'firing'))
+    assert response.status_code == 500
+
+    # 服务商抛出异常时按 exception 计数
+    with patch.object(main.sms_provider, 'send', side_effect=OSError('connection reset')):
+        response = client.post('/webhook/sms', json=payload([make_alert('b')], 'firing'))
+    assert response.status_code == 500
+
+    after = scrape(client)
+    assert delta(before, after, 'sms_webhook_requests_total', endpoint='sms', outcome='failed') == 2
+    assert send_delta(before, after, 'isv.BUSINESS_LIMIT_CONTROL') == 1
+    assert send_delta(before, after, 'exception') == 1
+    assert send_delta(before, after, 'OK') == 0
+    assert stage_count(before, after, 'webhook_send') == 2
+    assert stage_count(before, after, 'send_provider_call') == 2
+    assert len(main.alert_state) == 0
+
+
+def test_metrics_on_success(monkeypatch):
+    monkeypatch.setattr(main, 'alert_state', AlertStateTable())
+    client = main.app.test_client()
+    before = scrape(client)
+
+    with patch.object(main.sms_provider, 'send', return_value=SendResult(True, 'OK')):
+        response = client.post('/webhook/sms', json=payload([make_alert('a')], 'firing'))
+        assert response.json['status'] == 'success'
+        response = client.post('/webhook/sms', json=payload([make_alert('a', 'resolved')], 'resolved'))
+        assert response.json['status'] == 'resolved_sent'
+
+    after = scrape(client)
+    assert delta(before, after, 'sms_webhook_requests_total', endpoint='sms', outcome='success') == 1
+    assert delta(before, after, 'sms_webhook_requests_total', endpoint='sms', outcome='resolved_sent') == 1
+    assert send_delta(before, after, 'OK') == 2
+    assert stage_count(before, after, 'webhook_parse') == 2
+    assert stage_count(before, after, 'webhook_send') == 2
+    assert stage_count(before, after, 'send_provider_call') == 2
+    assert stage_count(before, after, 'webhook_total') == 2
+    assert delta(before, after, 'sms_stage_duration_seconds_sum', stage='webhook_total') > 0
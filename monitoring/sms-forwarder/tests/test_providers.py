@@ -0,0 +1,176 @@
+import io
+import json
+import sys
+import threading
+import types
+import urllib.error
+from unittest.mock import patch
+
+import pytest
+
+from loadtest.mock_sms_server import MockSMSServer
+from providers import AliyunSMSProvider, HTTPSMSProvider, create_provider
+
+
+@pytest.fixture
+def sms_server():
+    server = MockSMSServer(('127.0.0.1', 0), seed=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def server_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/send"
+
+
+def test_http_provider_sends(sms_server):
+    provider = HTTPSMSProvider(server_url(sms_server))
+
+    result = provider.send('13800000000', {'alert': 'HighCPU'})
+
+    assert result
+    assert result.code == 'OK'
+    assert sms_server.counts['OK'] == 1
+
+
+def test_http_provider_keeps_error_code(sms_server):
+    sms_server.error_rate = 1.0
+    provider = HTTPSMSProvider(server_url(sms_server))
+
+    result = provider.send('13800000000', {'alert': 'HighCPU'})
+
+    # 5xx 响应体中的 Code 原样保留
+    assert not result
+    assert result.code == 'isp.SYSTEM_ERROR'
+
+
+def test_http_provider_non_json_error():
+    provider = HTTPSMSProvider('http://sms.invalid/send')
+    error = urllib.error.HTTPError(provider.url, 502, 'Bad Gateway', {}, io.BytesIO(b'<html>bad gateway</html>'))
+
+    with patch('providers.urllib.request.urlopen', side_effect=error):
+        result = provider.send('13800000000', {})
+
+    assert not result
+    assert result.code == 'http_502'
+
+
+def test_http_provider_not_configured():
+    provider = HTTPSMSProvider('')
+
+    assert not provider.configured()
+    assert provider.send('13800000000', {}).code == 'not_configured'
+    with pytest.raises(RuntimeError):
+        provider.probe()
+
+
+def test_http_provider_endpoint_and_probe(sms_server):
+    assert HTTPSMSProvider('https://sms.example.com/send').endpoint() == ('sms.example.com', 443)
+    assert HTTPSMSProvider('http://sms.example.com/send').endpoint() == ('sms.example.com', 80)
+
+    provider = HTTPSMSProvider(server_url(sms_server))
+    assert provider.probe(timeout=1) == f"127.0.0.1:{sms_server.server_address[1]}"
+    # 探测只建立连接，不发送短信
+    assert sum(sms_server.counts.values()) == 0
+
+
+def fake_aliyun_sdk(response):
+    """伪造 aliyunsdkcore 的 client / request 模块"""
+    sent = []
+
+    class AcsClient:
+        def __init__(self, key, secret, region):
+            self.args = (key, secret, region)
+
+        def do_action_with_exception(self, request):
+            sent.append(request)
+            return json.dumps(response).encode()
+
+    class CommonRequest:
+        def __init__(self):
+            self.query = {}
+
+        def add_query_param(self, name, value):
+            self.query[name] = value
+
+        def __getattr__(self, name):
+            return lambda *args: None
+
+    client_module = types.ModuleType('aliyunsdkcore.client')
+    client_module.AcsClient = AcsClient
+    request_module = types.ModuleType('aliyunsdkcore.request')
+    request_module.CommonRequest = CommonRequest
+    modules = {
+        'aliyunsdkcore': types.ModuleType('aliyunsdkcore'),
+        'aliyunsdkcore.client': client_module,
+        'aliyunsdkcore.request': request_module,
+    }
+    return modules, sent
+
+
+def aliyun_provider():
+    return AliyunSMSProvider('key', 'secret', '运维告警', 'SMS_001')
+
+
+def test_aliyun_provider_sends():
+    modules, sent = fake_aliyun_sdk({'Code': 'OK', 'Message': 'OK'})
+    provider = aliyun_provider()
+
+    with patch.dict(sys.modules, modules):
+        assert not provider.loaded()
+        result = provider.send('13800000000', {'alert': 'HighCPU'}, template='SMS_002')
+        provider.send('13800000000', {'alert': 'HighCPU'})
+
+    assert result
+    assert provider.loaded()
+    assert sent[0].query == {
+        'PhoneNumbers': '13800000000',
+        'SignName': '运维告警',
+        'TemplateCode': 'SMS_002',
+        'TemplateParam': json.dumps({'alert': 'HighCPU'}),
+    }
+    assert sent[1].query['TemplateCode'] == 'SMS_001'
+
+
+def test_aliyun_provider_error_code():
+    modules, _ = fake_aliyun_sdk({'Code': 'isv.BUSINESS_LIMIT_CONTROL', 'Message': '触发分钟级流控'})
+
+    with patch.dict(sys.modules, modules):
+        result = aliyun_provider().send('13800000000', {})
+
+    assert not result
+    assert result.code == 'isv.BUSINESS_LIMIT_CONTROL'
+    assert result.message == '触发分钟级流控'
+
+
+def test_aliyun_provider_without_sdk():
+    provider = aliyun_provider()
+
+    # None 使导入失败
+    with patch.dict(sys.modules, {'aliyunsdkcore': None, 'aliyunsdkcore.client': None}):
+        assert provider.send('13800000000', {}).code == 'not_configured'
+        assert provider.warm_up() is False
+
+
+def test_aliyun_provider_not_configured():
+    provider = AliyunSMSProvider('', '', '', '')
+
+    assert not provider.configured()
+    assert provider.send('13800000000', {}).code == 'not_configured'
+    assert provider.endpoint() == ('dysmsapi.aliyuncs.com', 443)
+
+
+def test_create_provider(monkeypatch):
+    monkeypatch.setenv('SMS_PROVIDER', 'http')
+    monkeypatch.setenv('SMS_PROVIDER_URL', 'http://127.0.0.1:8025/send')
+    monkeypatch.setenv('SMS_PROVIDER_TIMEOUT', '2')
+
+    provider = create_provider()
+    assert isinstance(provider, HTTPSMSProvider)
+    assert provider.timeout == 2.0
+    assert isinstance(create_provider('aliyun'), AliyunSMSProvider)
+    with pytest.raises(ValueError):
+        create_provider('carrier-pigeon')
@@ -39,9 +39,16 @@ echo ""
 echo -e "${YELLOW}[1/5] 备份 PostgreSQL 数据库...${NC}"
 
 if docker ps --format '{{.Names}}' | grep -q "^postgres$"; then
-    docker exec -t postgres pg_dumpall -c -U ${POSTGRES_USER} | gzip > "${BACKUP_DIR}/postgres_all.sql.gz"
-    echo -e "${GREEN}✓ PostgreSQL 备份完成${NC}"
-    echo "  文件: $(du -h ${BACKUP_DIR}/postgres_all.sql.gz | cut -f1)"
+    # 按数据库并行导出，独立维护索引和保留策略（见 core/postgres/backup.py）
+    if POSTGRES_USER=${POSTGRES_USER} python3 core/postgres/backup.py \
+        --backup-dir "${BACKUP_ROOT}/postgres" \
+        --retention-days ${RETENTION_DAYS} \
+        --metrics-file ./data/node-exporter/textfile/pg_backup.prom; then
+        echo -e "${GREEN}✓ PostgreSQL 备份完成${NC}"
+        echo "  目录: ${BACKUP_ROOT}/postgres"
+    else
+        echo -e "${RED}✗ PostgreSQL 备份失败${NC}"
+    fi
 else
     echo -e "${RED}✗ PostgreSQL 容器未运行,跳过备份${NC}"
 fi
@@ -103,7 +110,8 @@ echo "  文件: $(du -h ${BACKUP_DIR}/configs.tar.gz | cut -f1)"
 echo ""
 echo -e "${YELLOW}清理 ${RETENTION_DAYS} 天前的旧备份...${NC}"
 
-find "${BACKUP_ROOT}" -maxdepth 1 -type d -mtime +${RETENTION_DAYS} -exec rm -rf {} \; 2>/dev/null || true
+# postgres 目录由 backup.py 按索引清理
+find "${BACKUP_ROOT}" -mindepth 1 -maxdepth 1 -type d ! -name postgres -mtime +${RETENTION_DAYS} -exec rm -rf {} \; 2>/dev/null || true
 
 # 备份摘要
 echo ""